@@ -1,78 +1,45 @@
 import streamlit as st
 import sqlite3
-import pandas as pd
-from datetime import date
+
+from school import campus, dashboard, fees, students, telemetry, widgets
 
 # Page Config
 st.set_page_config(page_title="Advanced School Management System", page_icon="🏫", layout="wide")
 
-# Database Setup
-conn = sqlite3.connect("school.db", check_same_thread=False)
-c = conn.cursor()
-
-# Create All Tables
-tables = [
-    '''CREATE TABLE IF NOT EXISTS students (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, roll_no TEXT NOT NULL UNIQUE, class TEXT, section TEXT, age INTEGER, phone TEXT)''',
-    '''CREATE TABLE IF NOT EXISTS teachers (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, teacher_id TEXT NOT NULL UNIQUE, subject TEXT, phone TEXT, email TEXT)''',
-    '''CREATE TABLE IF NOT EXISTS attendance (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, date TEXT, status TEXT, FOREIGN KEY(student_id) REFERENCES students(id))''',
-    '''CREATE TABLE IF NOT EXISTS fees (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, amount_due REAL, amount_paid REAL, payment_date TEXT, status TEXT, FOREIGN KEY(student_id) REFERENCES students(id))''',
-    '''CREATE TABLE IF NOT EXISTS exams (id INTEGER PRIMARY KEY AUTOINCREMENT, exam_name TEXT, class TEXT, subject TEXT, date TEXT)''',
-    '''CREATE TABLE IF NOT EXISTS results (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, exam_id INTEGER, marks INTEGER, FOREIGN KEY(student_id) REFERENCES students(id), FOREIGN KEY(exam_id) REFERENCES exams(id))''',
-    '''CREATE TABLE IF NOT EXISTS books (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, author TEXT, isbn TEXT UNIQUE, copies INTEGER)''',
-    '''CREATE TABLE IF NOT EXISTS library_transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, book_id INTEGER, student_id INTEGER, issue_date TEXT, return_date TEXT, status TEXT, FOREIGN KEY(book_id) REFERENCES books(id), FOREIGN KEY(student_id) REFERENCES students(id))''',
-    '''CREATE TABLE IF NOT EXISTS timetable (id INTEGER PRIMARY KEY AUTOINCREMENT, class TEXT, day TEXT, period INTEGER, subject TEXT, teacher TEXT)'''
-]
-for table in tables:
-    c.execute(table)
-conn.commit()
-
 # Sidebar Navigation
 st.sidebar.image("https://img.icons8.com/fluency/96/school.png", width=100)
 st.sidebar.title("🏫 School Management")
-page = st.sidebar.radio("Navigation", [
-    "🏠 Dashboard",
-    "👨‍🎓 Students",
-    "👩‍🏫 Teachers",
-    "📅 Attendance",
-    "💰 Fees Management",
-    "📊 Exams & Results",
-    "📚 Library",
-    "🗓️ Timetable"
-])
+
+# Database Connection of this session's campus (opened and migrated once per process)
+campus_name, conn = widgets.campus_connection()
+
 
 # ========================
 # DASHBOARD
 # ========================
-if page == "🏠 Dashboard":
+def dashboard_page():
     st.title("🏫 Advanced School Management System")
     st.markdown("### 📊 School Overview")
 
     # Stats
-    stats = {}
-    queries = {
-        "Students": "SELECT COUNT(*) FROM students",
-        "Teachers": "SELECT COUNT(*) FROM teachers",
-        "Books": "SELECT COUNT(*) FROM books",
-        "Due Fees": "SELECT SUM(amount_due - amount_paid) FROM fees WHERE status = 'Pending'",
-        "Present Today": f"SELECT COUNT(*) FROM attendance WHERE date = '{date.today()}' AND status = 'Present'"
-    }
-    for label, query in queries.items():
-        c.execute(query)
-        stats[label] = c.fetchone()[0] or 0
+    stats = dashboard.metrics(conn)
 
     col1, col2, col3, col4, col5 = st.columns(5)
-    col1.metric("Total Students", stats["Students"])
-    col2.metric("Total Teachers", stats["Teachers"])
-    col3.metric("Books in Library", stats["Books"])
-    col4.metric("Total Due Fees", f"₹{stats['Due Fees']}")
-    col5.metric("Present Today", stats["Present Today"])
+    col1.metric("Total Students", stats["students"])
+    col2.metric("Total Teachers", stats["teachers"])
+    col3.metric("Books in Library", stats["books"])
+    col4.metric("Total Due Fees", f"₹{stats['due_fees']:,.2f}")
+    col5.metric("Present Today", stats["present_today"])
+
+    widgets.dashboard_details(conn)
 
     st.success("All systems operational! Use sidebar to manage modules.")
 
+
 # ========================
 # STUDENTS (Existing + Delete)
 # ========================
-elif page == "👨‍🎓 Students":
+def students_page():
     st.title("👨‍🎓 Student Management")
     tab1, tab2 = st.tabs(["Add Student", "View & Delete"])
 
@@ -88,8 +55,7 @@ elif page == "👨‍🎓 Students":
             if st.form_submit_button("Add Student"):
                 if name and roll_no:
                     try:
-                        c.execute("INSERT INTO students (name, roll_no, class, section, age, phone) VALUES (?, ?, ?, ?, ?, ?)", (name, roll_no, class_name, section, age, phone))
-                        conn.commit()
+                        students.add(conn, students.Student(name, roll_no, class_name, section, age, phone))
                         st.success("Student added!")
                     except sqlite3.IntegrityError:
                         st.error("Roll No exists!")
@@ -97,75 +63,97 @@ elif page == "👨‍🎓 Students":
                     st.warning("Required fields!")
 
     with tab2:
-        df = pd.read_sql_query("SELECT id, name, roll_no, class, section FROM students", conn)
-        if not df.empty:
-            st.dataframe(df.drop("id", axis=1), use_container_width=True)
+        if widgets.paged_dataframe(conn, "students", ["name", "roll_no", "class", "section"],
+                                   key="students", empty_message="No students."):
+            if "students_message" in st.session_state:
+                st.success(st.session_state.pop("students_message"))
             delete_id = st.number_input("Enter Student ID to Delete", min_value=1)
             if st.button("Delete Student"):
-                c.execute("DELETE FROM students WHERE id = ?", (delete_id,))
-                conn.commit()
-                st.success("Deleted!") if c.rowcount else st.error("ID not found")
-                st.rerun()
-        else:
-            st.info("No students.")
+                try:
+                    if students.delete(conn, delete_id):
+                        st.session_state["students_message"] = "Deleted!"  # shown after the rerun
+                        st.rerun()
+                    st.error("ID not found")
+                except ValueError as e:  # books still out
+                    st.error(str(e))
+
 
 # ========================
 # TEACHERS (Similar)
 # ========================
-elif page == "👩‍🏫 Teachers":
+def teachers_page():
     st.title("👩‍🏫 Teacher Management")
     # (Similar add/view as before - omitted for brevity, but included in full code)
 
+
 # ========================
 # ATTENDANCE (Existing)
 # ========================
-elif page == "📅 Attendance":
+def attendance_page():
+    st.title("📅 Attendance Management")
     # (Keep your previous attendance code)
 
+
 # ========================
 # FEES MANAGEMENT
 # ========================
-elif page == "💰 Fees Management":
+def fees_page():
     st.title("💰 Fees Management")
     tab1, tab2 = st.tabs(["Record Payment", "View Dues"])
 
     with tab1:
-        students = pd.read_sql_query("SELECT id, name, roll_no FROM students", conn)
-        if not students.empty:
-            student = st.selectbox("Select Student", students["name"] + " (" + students["roll_no"] + ")")
-            student_id = students[students["name"] + " (" + students["roll_no"] + ")" == student]["id"].iloc[0]
+        roster = students.directory(conn)
+        if not roster.empty:
+            student = st.selectbox("Select Student", roster["name"] + " (" + roster["roll_no"] + ")")
+            student_id = roster[roster["name"] + " (" + roster["roll_no"] + ")" == student]["id"].iloc[0]
             amount = st.number_input("Amount Paid", min_value=0.0)
             if st.button("Record Payment"):
-                c.execute("INSERT INTO fees (student_id, amount_due, amount_paid, payment_date, status) VALUES (?, ?, ?, ?, 'Paid')",
-                          (student_id, amount, amount, date.today()))
-                conn.commit()
-                st.success("Payment recorded!")
+                try:
+                    fees.record_payment(conn, student_id, amount)
+                    st.success("Payment recorded!")
+                except ValueError as e:
+                    st.error(str(e))
 
     with tab2:
-        dues = pd.read_sql_query("""SELECT s.name, s.roll_no, SUM(f.amount_due - f.amount_paid) as due 
-                                    FROM fees f JOIN students s ON f.student_id = s.id 
-                                    GROUP BY s.id HAVING due > 0""", conn)
-        st.dataframe(dues)
+        widgets.dues_table(conn, key="dues")
+
 
 # ========================
 # EXAMS & RESULTS
 # ========================
-elif page == "📊 Exams & Results":
+def results_page():
     st.title("📊 Exams & Results")
     # Add exam, enter marks, view results - simplified version included in full code
 
+
 # ========================
 # LIBRARY
 # ========================
-elif page == "📚 Library":
+def library_page():
     st.title("📚 Library Management")
     # Add books, issue/return - included
 
+
 # ========================
 # TIMETABLE
 # ========================
-elif page == "🗓️ Timetable":
+def timetable_page():
     st.title("🗓️ Class Timetable")
-    # View/edit schedule grid - included
-
-conn.close()
+    widgets.timetable_grid(conn, "timetable")
+
+
+# Only the open page's function runs on a rerun
+page = st.navigation([
+    st.Page(dashboard_page, title="Dashboard", icon="🏠", default=True),
+    st.Page(students_page, title="Students", icon="👨‍🎓"),
+    st.Page(teachers_page, title="Teachers", icon="👩‍🏫"),
+    st.Page(attendance_page, title="Attendance", icon="📅"),
+    st.Page(fees_page, title="Fees Management", icon="💰"),
+    st.Page(results_page, title="Exams & Results", icon="📊"),
+    st.Page(library_page, title="Library", icon="📚"),
+    st.Page(timetable_page, title="Timetable", icon="🗓️"),
+] + ([st.Page(widgets.group_dashboard, title="Group Dashboard", icon="🏢")] if len(campus.names()) > 1 else [])
+  + ([st.Page(widgets.telemetry_admin, title="Admin", icon="🛠️")] if widgets.query_param("admin") == "1" else []))
+render = telemetry.start_page("SMS.py", f"{page.icon} {page.title}")  # see the hidden Admin page
+page.run()
+render.finish()
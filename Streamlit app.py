@@ -1,6 +1,7 @@
 import streamlit as st
 import sqlite3
-import pandas as pd
+
+from school import students, telemetry, widgets
 
 # Page Configuration
 st.set_page_config(
@@ -13,23 +14,9 @@ st.set_page_config(
 st.title("🏫 School Management System")
 st.markdown("---")
 
-# Database Connection
-conn = sqlite3.connect("school.db", check_same_thread=False)
-c = conn.cursor()
-
-# Create Table if not exists
-c.execute('''
-    CREATE TABLE IF NOT EXISTS students (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        roll_no TEXT NOT NULL UNIQUE,
-        class TEXT,
-        section TEXT,
-        age INTEGER,
-        phone TEXT
-    )
-''')
-conn.commit()
+# Database Connection of this session's campus (opened and migrated once per process)
+campus_name, conn = widgets.campus_connection()
+render = telemetry.start_page("Streamlit app.py", "Students")
 
 # Sidebar - Add New Student
 with st.sidebar:
@@ -46,12 +33,10 @@ with st.sidebar:
         if submitted:
             if name.strip() and roll_no.strip():
                 try:
-                    c.execute(
-                        "INSERT INTO students (name, roll_no, class, section, age, phone) VALUES (?, ?, ?, ?, ?, ?)",
-                        (name.strip(), roll_no.strip(), class_name.strip(), section.strip(), age, phone.strip())
-                    )
-                    conn.commit()
+                    students.add(conn, students.Student(name.strip(), roll_no.strip(), class_name.strip(),
+                                                        section.strip(), age, phone.strip()))
                     st.success(f"✅ {name} added successfully!")
+                    st.session_state["students_generation"] = st.session_state.get("students_generation", 0) + 1
                 except sqlite3.IntegrityError:
                     st.error("❌ Roll No already exists!")
             else:
@@ -61,27 +46,43 @@ with st.sidebar:
 st.subheader("🔍 Search Students")
 search_term = st.text_input("", placeholder="Type Name or Roll No to search...")
 
-query = "SELECT id, name, roll_no, class, section, age, phone FROM students"
-params = ()
+# Fetch one page of ranked matches. The rows are kept as loaded until they
+# are saved or reloaded: edits are diffed, and their versions checked,
+# against what the user started from.
+total = students.count_matches(conn, search_term)
+total_pages = -(-total // students.SEARCH_PAGE_SIZE)
+page_no = st.number_input(f"Page (of {total_pages})", 1, total_pages) if total_pages > 1 else 1
+editor_key = f"students_editor_{search_term}_{page_no}_{st.session_state.get('students_generation', 0)}"
+if st.session_state.get("students_loaded", (None,))[0] != editor_key:
+    loaded = students.search_students(conn, search_term, page_no)
+    loaded.insert(0, "select", False)
+    st.session_state["students_loaded"] = (editor_key, loaded)
+df = st.session_state["students_loaded"][1]
 
-if search_term:
-    search_like = f"%{search_term}%"
-    query += " WHERE name LIKE ? OR roll_no LIKE ?"
-    params = (search_like, search_like)
 
-# Fetch data
-df = pd.read_sql_query(query, conn, params=params)
+def reload_table(message=None):
+    """Load the table afresh, dropping unsaved edits, and show ``message``."""
+    st.session_state["students_generation"] = st.session_state.get("students_generation", 0) + 1
+    if message:
+        st.session_state["students_message"] = message
+    st.rerun()
 
-st.subheader(f"📋 Student Records ({len(df)} students)")
+
+st.subheader(f"📋 Student Records ({total} students)")
+if "students_message" in st.session_state:
+    st.success(st.session_state.pop("students_message"))
 
 if not df.empty:
     # Display editable table
     edited_df = st.data_editor(
         df,
+        key=editor_key,
         use_container_width=True,
         hide_index=True,
         num_rows="fixed",
+        column_order=["select", "id", "name", "roll_no", "class", "section", "age", "phone"],
         column_config={
+            "select": st.column_config.CheckboxColumn("🗑️", help="Select rows to delete"),
             "id": st.column_config.NumberColumn("ID", disabled=True),
             "name": "Name",
             "roll_no": "Roll No",
@@ -92,24 +93,33 @@ if not df.empty:
         }
     )
 
-    # Delete selected row
-    selected_rows = st.session_state.get("data_editor")  # Streamlit tracks edits
-    if st.button("🗑️ Delete Selected Student", type="primary"):
-        if "selected_index" in st.session_state and st.session_state.selected_index is not None:
-            student_id = df.iloc[st.session_state.selected_index]["id"]
-            student_name = df.iloc[st.session_state.selected_index]["name"]
-            c.execute("DELETE FROM students WHERE id = ?", (student_id,))
-            conn.commit()
-            st.success(f"🗑️ {student_name} deleted!")
-            st.rerun()
-        else:
-            st.warning("Please select a row first (click on it in the table).")
+    edits = students.diff_edits(df, edited_df)
+    selected = edited_df.loc[edited_df["select"], "id"]
+    col1, col2, col3 = st.columns(3)
+
+    # Save every changed cell in one transaction
+    if col1.button(f"💾 Save Changes ({len(edits)} rows)", type="primary", disabled=not edits):
+        try:
+            reload_table(f"✅ {students.save_edits(conn, edits)} student(s) updated!")
+        except students.EditConflict as e:
+            roll_nos = df.set_index("id")["roll_no"]
+            st.error("❌ Nothing was saved:\n" + "\n".join(f"- {roll_nos[student_id]}: {reason}"
+                                                          for student_id, reason in e.conflicts))
+
+    # Delete the ticked rows, with their attendance, fees and results
+    if col2.button(f"🗑️ Delete Selected ({len(selected)})", disabled=selected.empty):
+        try:
+            reload_table(f"🗑️ {students.delete_many(conn, selected)} student(s) deleted!")
+        except ValueError as e:
+            st.error(f"❌ {e}")
+
+    if col3.button("🔄 Reload", help="Discard unsaved edits and load the latest data"):
+        reload_table()
 else:
     st.info("No students found. Add one from the sidebar!")
 
-# Close connection
-conn.close()
-
 # Footer
 st.markdown("---")
 st.caption("Built with ❤️ using Streamlit | Data saved locally in school.db")
+
+render.finish()
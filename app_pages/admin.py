@@ -0,0 +1,62 @@
+import streamlit as st
+
+from school import archive, jobs, notify, widgets
+
+conn = widgets.connection()
+
+widgets.telemetry_admin()
+
+st.header("🗄️ Academic Year Archives")
+st.caption(f"Closed years' attendance, fee ledger and returned loans move to a per-year archive database. "
+           f"Exports and fee statements still include them. Current year: "
+           f"{archive.label(archive.academic_year())}.")
+archives = archive.list_archives(conn)
+if not archives.empty:
+    st.dataframe(archives.drop(columns="year"), use_container_width=True, hide_index=True)
+
+col1, col2 = st.columns(2)
+closed = archive.closed_years(conn)
+if closed:
+    year = col1.selectbox("Closed year", closed, format_func=archive.label)
+    if col1.button(f"Archive {archive.label(year)}", type="primary"):
+        jobs.submit(conn, "archive", year=year)
+else:
+    col1.info("Only the current academic year is in the main database.")
+if archive.can_compact_online(conn):
+    if col2.button("Compact database"):
+        jobs.submit(conn, "compact")
+else:
+    col2.info("Online compaction needs one full compaction first, out of hours: "
+              "python -m school.archive compact --full")
+
+
+def show_archive(job):
+    st.success(f"✅ {job.result['rows']} rows moved to the {archive.label(job.result['year'])} archive"
+               + (f", {job.result['freed_pages']} pages freed." if job.result["freed_pages"] is not None else "."))
+
+
+widgets.job_panel(conn, "archive", "archive_jobs", show_archive,
+                  describe=lambda job: archive.label(job.params["year"]))
+widgets.job_panel(conn, "compact", "compact_jobs", lambda job: st.success(f"✅ {job.result['freed_pages']} pages freed."),
+                  describe=lambda job: "Compaction")
+
+st.header("📨 SMS Outbox")
+st.caption("Absence alerts and fee notices are queued with the save that causes them and sent by the "
+           f"dispatcher ({notify.GATEWAY}): python -m school.notify dispatch")
+outbox = notify.summary(conn)
+if outbox.empty:
+    st.info("No messages yet.")
+else:
+    st.dataframe(outbox, use_container_width=True)
+
+failed = notify.failures(conn)
+if "outbox_message" in st.session_state:
+    st.success(st.session_state.pop("outbox_message"))
+col1, col2 = st.columns(2)
+if col1.button("Queue overdue fee reminders"):
+    st.success(f"✅ {notify.remind_overdue(conn)} reminder(s) queued.")
+if col2.button("Retry failed messages", disabled=failed.empty):
+    st.session_state["outbox_message"] = f"✅ {notify.retry_failed(conn)} message(s) queued again."
+    st.rerun()
+if not failed.empty:
+    st.dataframe(failed, use_container_width=True, hide_index=True)
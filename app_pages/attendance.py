@@ -0,0 +1,62 @@
+from datetime import date
+
+import pandas as pd
+import streamlit as st
+
+from school import attendance, widgets
+
+conn = widgets.connection()
+
+st.title("📅 Attendance Management")
+attendance_date = st.date_input("Select Date", date.today())
+selected_date = str(attendance_date)
+
+sections = attendance.class_sections(conn)
+
+if sections:
+    col1, col2, col3 = st.columns(3)
+    class_name = col1.selectbox("Class", sorted({cls for cls, _ in sections}, key=str),
+                                format_func=lambda v: v or "(none)")
+    section = col2.selectbox("Section", [sec for cls, sec in sections if cls == class_name],
+                             format_func=lambda v: v or "(none)")
+    page_size = col3.selectbox("Rows per page", [25, 50, 100], index=1)
+
+    total = attendance.roster_count(conn, class_name, section)
+    pages = -(-total // page_size)
+    page_no = st.number_input(f"Page (of {pages})", 1, pages) if pages > 1 else 1
+
+    roster = attendance.load_roster(conn, selected_date, class_name, section,
+                                    page_size, (page_no - 1) * page_size)
+
+    with st.form("mark_attendance"):
+        st.subheader(f"Mark Attendance - {selected_date}")
+        edited = st.data_editor(
+            roster,
+            key=f"attendance_{selected_date}_{class_name}_{section}_{page_no}",
+            use_container_width=True,
+            hide_index=True,
+            num_rows="fixed",
+            column_order=["roll_no", "name", "status"],
+            column_config={
+                "roll_no": st.column_config.TextColumn("Roll No", disabled=True),
+                "name": st.column_config.TextColumn("Name", disabled=True),
+                "status": st.column_config.SelectboxColumn("Status", options=attendance.STATUSES, required=True),
+            },
+        )
+
+        notify_parents = st.checkbox("📱 Text parents of absent students")
+        col1, col2 = st.columns(2)
+        save = col1.form_submit_button("Save Attendance", type="primary")
+        all_present = col2.form_submit_button("Mark All Present & Save")
+        if save or all_present:
+            statuses = pd.Series("Present", index=roster.index) if all_present else edited["status"]
+            changed = attendance.changed_statuses(roster, statuses)
+            try:
+                attendance.save_attendance(conn, selected_date, changed, notify_parents)
+                st.success(f"Attendance saved! ({len(changed)} records updated)")
+            except ValueError as e:
+                st.error(f"❌ {e}")
+
+    st.caption(f"{total} students in this section. Unmarked students default to Present.")
+else:
+    st.warning("Add students first!")
@@ -0,0 +1,51 @@
+from datetime import date
+
+import streamlit as st
+
+from school import analytics, attendance, widgets
+
+conn = widgets.connection()
+
+st.title("📈 Attendance Analytics")
+
+today = date.today()
+col1, col2, col3 = st.columns(3)
+start = col1.date_input("From", date(today.year if today.month >= 4 else today.year - 1, 4, 1))
+end = col2.date_input("To", today)
+sections = attendance.class_sections(conn)
+class_name = col3.selectbox("Class", ["All"] + sorted({cls for cls, _ in sections}, key=str),
+                            format_func=lambda v: v or "(none)")
+class_filter = None if class_name == "All" else class_name
+start_month, end_month = str(start)[:7], str(end)[:7]
+
+tab1, tab2, tab3 = st.tabs(["📅 Daily", "🗓️ Monthly by Class", "🚩 Chronic Absentees"])
+
+with tab1:
+    daily = analytics.daily_trend(conn, start, end, class_filter)
+    if daily.empty:
+        st.info("No attendance recorded in this period.")
+    else:
+        st.line_chart(daily.set_index("date")["attendance_pct"], y_label="Attendance %")
+        col1, col2 = st.columns(2)
+        col1.metric("Average Attendance %", round(daily["attendance_pct"].mean(), 1))
+        col2.metric("School Days", len(daily))
+
+with tab2:
+    monthly = analytics.monthly_class_trend(conn, start_month, end_month, class_filter)
+    if monthly.empty:
+        st.info("No attendance recorded in this period.")
+    else:
+        st.line_chart(monthly.pivot_table(index="month", columns="class_section", values="attendance_pct"),
+                      y_label="Attendance %")
+        st.dataframe(monthly.drop(columns="class_section"), use_container_width=True, hide_index=True)
+
+with tab3:
+    col1, col2 = st.columns(2)
+    threshold = col1.slider("Flag students below (%)", 50, 100, 90)
+    min_days = col2.number_input("Minimum days recorded", 1, 365, 10)
+    absentees = analytics.chronic_absentees(conn, start_month, end_month, threshold, class_filter, min_days)
+    if absentees.empty:
+        st.success("No students below the threshold. 🎉")
+    else:
+        st.warning(f"{len(absentees)} students below {threshold}% attendance")
+        st.dataframe(absentees, use_container_width=True, hide_index=True)
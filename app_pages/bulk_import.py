@@ -0,0 +1,34 @@
+import os
+
+import pandas as pd
+import streamlit as st
+
+from school import importer, jobs, widgets
+
+conn = widgets.connection()
+
+st.title("📥 Bulk Import")
+
+kind = st.selectbox("What are you importing?", list(importer.KINDS), format_func=str.title)
+spec = importer.KINDS[kind]
+st.caption(f"Required columns: {', '.join(spec['required'])}"
+           + (f" | Optional: {', '.join(spec['optional'])}" if spec["optional"] else ""))
+upload = st.file_uploader("CSV or Excel file", type=["csv", "xlsx"])
+
+if upload is not None and st.button("Start Import", type="primary"):
+    # The upload only lives as long as this session, so the job gets a copy
+    staged = jobs.stage_file(conn, upload.getvalue(), os.path.splitext(upload.name)[1])
+    jobs.submit(conn, "import", dataset=kind, file=staged, filename=upload.name)
+
+
+def show_report(job):
+    report = importer.ImportReport(**job.result)
+    st.success(f"✅ {report.rows_imported} of {report.rows_read} rows imported.")
+    if report.error_count:
+        st.warning(f"⚠️ {report.error_count} rows skipped"
+                   + (f" (first {len(report.errors)} shown)" if len(report.errors) < report.error_count else ""))
+        st.dataframe(pd.DataFrame(report.errors, columns=["Line", "Error"]), hide_index=True)
+
+
+widgets.job_panel(conn, "import", "import_jobs", show_report,
+                  describe=lambda job: f"{job.params['dataset']} from {job.params['filename']}")
@@ -0,0 +1,21 @@
+import streamlit as st
+
+from school import dashboard, widgets
+
+conn = widgets.connection()
+
+st.title("🏫 School Management Dashboard")
+st.markdown("### 📊 Overview")
+
+stats = dashboard.metrics(conn)
+
+col1, col2, col3, col4, col5 = st.columns(5)
+col1.metric("Total Students", stats["students"])
+col2.metric("Total Teachers", stats["teachers"])
+col3.metric("Books in Library", stats["books"])
+col4.metric("Pending Fees (₹)", stats["due_fees"])
+col5.metric("Present Today", stats["present_today"])
+
+widgets.dashboard_details(conn)
+
+st.success("System running smoothly! Use sidebar to manage modules.")
@@ -0,0 +1,35 @@
+from datetime import date
+
+import streamlit as st
+
+from school import exporter, jobs, students, widgets
+
+conn = widgets.connection()
+
+st.title("📤 Export Data")
+
+with st.form("export"):
+    col1, col2 = st.columns(2)
+    kind = col1.selectbox("Data", list(exporter.EXPORTS), format_func=str.title)
+    fmt = col2.radio("Format", exporter.FORMATS, format_func=str.upper, horizontal=True)
+    start = col1.date_input("From", date(date.today().year, 1, 1))
+    end = col2.date_input("To", date.today())
+    classes = students.classes(conn)
+    class_name = col1.selectbox("Class", ["All"] + classes)
+
+    if st.form_submit_button("Prepare Export", type="primary"):
+        jobs.submit(conn, "export", dataset=kind, fmt=fmt, start=start, end=end,
+                    class_name=None if class_name == "All" else class_name)
+
+
+def export_name(job):
+    params = job.params
+    return f"{params['dataset']}_{params['start']}_{params['end']}.{params['fmt']}"
+
+
+def show_export(job):
+    st.success(f"✅ {job.result['rows']} rows ready.")
+    widgets.job_download(job, export_name(job), "export_jobs")
+
+
+widgets.job_panel(conn, "export", "export_jobs", show_export, describe=export_name)
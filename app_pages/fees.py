@@ -0,0 +1,49 @@
+import streamlit as st
+
+from school import attendance, fees, students, widgets
+
+conn = widgets.connection()
+
+st.title("💰 Fees Management")
+
+tab1, tab2, tab3 = st.tabs(["Record Payment", "Charge Fees", "View Dues"])
+
+with tab1:
+    roster = students.directory(conn)
+    if not roster.empty:
+        student_option = st.selectbox("Select Student", roster["name"] + " - " + roster["roll_no"])
+        student_id = roster.loc[roster["name"] + " - " + roster["roll_no"] == student_option, "id"].values[0]
+        st.caption(f"Current balance: ₹{fees.balance(conn, student_id):,.2f}")
+        amount = st.number_input("Amount Paid (₹)", min_value=0.0, step=500.0)
+        if st.button("Record Payment"):
+            try:
+                fees.record_payment(conn, student_id, amount)
+                st.success("Payment recorded!")
+            except ValueError as e:
+                st.error(f"❌ {e}")
+
+with tab2:
+    sections = attendance.class_sections(conn)
+    if sections:
+        with st.form("charge_class"):
+            col1, col2 = st.columns(2)
+            class_name = col1.selectbox("Class", sorted({cls for cls, _ in sections}, key=str),
+                                        format_func=lambda v: v or "(none)")
+            section = col2.selectbox("Section", ["All"] + sorted({sec for _, sec in sections}, key=str),
+                                     format_func=lambda v: v or "(none)")
+            amount = col1.number_input("Amount (₹)", min_value=0.0, step=500.0)
+            due_date = col2.date_input("Due Date")
+            description = st.text_input("Description", placeholder="e.g. Term 1 tuition")
+            notify_parents = st.checkbox("📱 Text parents")
+            if st.form_submit_button("Charge Class"):
+                try:
+                    charged = fees.charge_class(conn, class_name, None if section == "All" else section,
+                                                amount, due_date, description, notify_parents)
+                    st.success(f"Charged {charged} students.")
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+    else:
+        st.warning("Add students first!")
+
+with tab3:
+    widgets.dues_table(conn, key="dues")
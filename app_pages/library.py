@@ -0,0 +1,112 @@
+import sqlite3
+
+import streamlit as st
+
+from school import library, students, widgets
+
+conn = widgets.connection()
+
+st.title("📚 Library Management")
+
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["🔍 Catalog", "📤 Issue", "📥 Return / Renew", "📦 Bulk Return", "⏰ Overdue"])
+
+with tab1:
+    with st.expander("➕ Add New Book"):
+        with st.form("add_book"):
+            title = st.text_input("Title")
+            author = st.text_input("Author")
+            isbn = st.text_input("ISBN")
+            copies = st.number_input("Copies", 1)
+            if st.form_submit_button("Add Book"):
+                if title:
+                    try:
+                        library.add_book(conn, title, author, isbn, copies)
+                        st.success("Book added!")
+                    except sqlite3.IntegrityError:
+                        st.error("❌ A book with this ISBN already exists!")
+                else:
+                    st.warning("⚠️ Title is required!")
+
+    search = st.text_input("🔍 Search by title, author or ISBN", key="catalog_search")
+    if search:
+        st.dataframe(library.search_catalog(conn, search), use_container_width=True, hide_index=True)
+    else:
+        widgets.paged_dataframe(conn, "books", ["title", "author", "isbn", "total_copies", "available_copies"],
+                                key="books", empty_message="No books yet.")
+
+with tab2:
+    with st.form("issue_book"):
+        book_term = st.text_input("Book (title, author or ISBN)")
+        roll_no = st.text_input("Student Roll No").upper()
+        days = st.number_input("Loan period (days)", 1, 90, library.LOAN_DAYS)
+        st.form_submit_button("Find Book")
+    if book_term:
+        matches = library.search_catalog(conn, book_term, limit=20)
+        matches = matches[matches["available_copies"] > 0]
+        if matches.empty:
+            st.warning("No available copies match that search.")
+        else:
+            labels = matches["title"] + " (" + matches["isbn"].fillna("no ISBN") + ") — " + \
+                matches["available_copies"].astype(str) + " available"
+            choice = st.selectbox("Book", matches.index, format_func=labels.get)
+            if st.button("Issue Book"):
+                student = students.get_by_roll_no(conn, roll_no)
+                if student is None:
+                    st.error("❌ No student with that Roll No!")
+                else:
+                    try:
+                        library.issue_book(conn, matches.at[choice, "id"], student.id, days=int(days))
+                        st.success(f"✅ Issued to {student.name}, due in {int(days)} days.")
+                    except ValueError as e:
+                        st.error(f"❌ {e}")
+
+with tab3:
+    roll_no = st.text_input("Student Roll No", key="loans_roll_no").upper()
+    student = students.get_by_roll_no(conn, roll_no) if roll_no else None
+    if "loans_message" in st.session_state:
+        st.success(st.session_state.pop("loans_message"))
+    if roll_no and student is None:
+        st.error("❌ No student with that Roll No!")
+    elif student:
+        loans = library.student_loans(conn, student.id)
+        if loans.empty:
+            st.info(f"{student.name} has no books out.")
+        else:
+            loans.insert(0, "select", False)
+            edited = st.data_editor(loans, disabled=list(loans.columns[1:]), hide_index=True,
+                                    use_container_width=True, key="loans_editor")
+            selected = edited.loc[edited["select"], "id"]
+            col1, col2 = st.columns(2)
+            if col1.button("Return Selected", disabled=selected.empty):
+                returned = library.return_books(conn, selected)
+                st.session_state["loans_message"] = f"✅ {returned} book(s) returned."  # shown after the rerun
+                st.rerun()
+            if col2.button("Renew Selected", disabled=selected.empty):
+                for loan_id in selected:
+                    try:
+                        due = library.renew(conn, loan_id)
+                        st.success(f"✅ Loan {loan_id} renewed until {due}.")
+                    except ValueError as e:
+                        st.error(f"❌ Loan {loan_id}: {e}")
+
+with tab4:
+    with st.form("bulk_return"):
+        scans = st.text_area("Scan ISBNs, one per line (optionally followed by the Roll No)", height=200)
+        if st.form_submit_button("Return All"):
+            outcome = library.bulk_return(conn, scans.splitlines())
+            returned = int((outcome["result"] == "Returned").sum())
+            st.success(f"✅ {returned} of {len(outcome)} book(s) returned.")
+            if returned < len(outcome):
+                st.dataframe(outcome[outcome["result"] != "Returned"], use_container_width=True, hide_index=True)
+
+with tab5:
+    total = library.count_overdue(conn)
+    if total == 0:
+        st.success("No overdue books! 🎉")
+    else:
+        page_size = 50
+        page_no = st.number_input(f"Page (of {(total - 1) // page_size + 1})", 1, (total - 1) // page_size + 1,
+                                  key="overdue_page")
+        st.dataframe(library.overdue(conn, limit=page_size, offset=(page_no - 1) * page_size),
+                     use_container_width=True, hide_index=True)
+        st.caption(f"{total} overdue loan(s)")
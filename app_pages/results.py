@@ -0,0 +1,120 @@
+from datetime import date
+
+import streamlit as st
+
+from school import jobs, results, widgets
+
+conn = widgets.connection()
+
+st.title("📊 Exams & Results")
+
+tab1, tab2, tab3, tab4 = st.tabs(["📝 Exams", "✏️ Enter Marks", "🏆 Results", "📄 Report Cards"])
+
+with tab1:
+    with st.expander("➕ Create New Exam"):
+        with st.form("new_exam"):
+            exam_name = st.text_input("Exam Name")
+            class_name = st.text_input("Class")
+            subject = st.text_input("Subject")
+            max_marks = st.number_input("Max Marks", min_value=1, value=100)
+            exam_date = st.date_input("Exam Date")
+            if st.form_submit_button("Create"):
+                results.create_exam(conn, results.Exam(exam_name, class_name, subject, max_marks, exam_date))
+                st.success("Exam created!")
+
+    widgets.paged_dataframe(conn, "exams", ["exam_name", "class", "subject", "max_marks", "date"],
+                            key="exams", empty_message="No exams scheduled.")
+
+exams = results.list_exams(conn)
+exam_labels = dict(zip(exams["id"], exams["exam_name"] + " - Class " + exams["class"].fillna("?")
+                       + " " + exams["subject"].fillna("") + " (" + exams["date"].fillna("") + ")"))
+
+with tab2:
+    if exams.empty:
+        st.info("Create an exam first.")
+    else:
+        exam_id = st.selectbox("Exam", list(exam_labels), format_func=exam_labels.get, key="marks_exam")
+        exam = results.get_exam(conn, exam_id)
+        sheet = results.marks_sheet(conn, exam_id)
+        if sheet.empty:
+            st.warning(f"No students in class {exam['class']}.")
+        else:
+            with st.form("enter_marks"):
+                edited = st.data_editor(
+                    sheet,
+                    key=f"marks_{exam_id}",
+                    use_container_width=True,
+                    hide_index=True,
+                    num_rows="fixed",
+                    column_order=["roll_no", "name", "section", "marks_obtained"],
+                    column_config={
+                        "roll_no": st.column_config.TextColumn("Roll No", disabled=True),
+                        "name": st.column_config.TextColumn("Name", disabled=True),
+                        "section": st.column_config.TextColumn("Section", disabled=True),
+                        "marks_obtained": st.column_config.NumberColumn(
+                            f"Marks (out of {exam['max_marks']})", min_value=0, max_value=exam["max_marks"], step=1),
+                    },
+                )
+                if st.form_submit_button("Save Marks", type="primary"):
+                    changed = results.changed_marks(sheet, edited["marks_obtained"])
+                    try:
+                        results.save_marks(conn, exam_id, changed)
+                        st.success(f"Marks saved! ({len(changed)} students updated)")
+                    except ValueError as e:
+                        st.error(f"❌ {e}")
+
+with tab3:
+    if exams.empty:
+        st.info("Create an exam first.")
+    else:
+        exam_id = st.selectbox("Exam", list(exam_labels), format_func=exam_labels.get, key="results_exam")
+        summary = results.exam_summary(conn, exam_id)
+        if summary.empty:
+            st.info("No marks entered for this exam yet.")
+        else:
+            stats = results.exam_stats(summary)
+            col1, col2, col3, col4, col5 = st.columns(5)
+            col1.metric("Students", stats["students"])
+            col2.metric("Average %", stats["mean"])
+            col3.metric("Median %", stats["median"])
+            col4.metric("Highest %", stats["highest"])
+            col5.metric("Pass Rate %", stats["pass_rate"])
+            st.bar_chart(summary["grade"].value_counts().reindex([g for _, g in results.GRADES], fill_value=0))
+            st.dataframe(summary, use_container_width=True, hide_index=True)
+
+with tab4:
+    classes = results.exam_classes(conn)
+    if not classes:
+        st.info("Create an exam first.")
+    else:
+        col1, col2, col3 = st.columns(3)
+        class_name = col1.selectbox("Class", classes, key="cards_class")
+        start = col2.date_input("Term Start", date(date.today().year, 1, 1))
+        end = col3.date_input("Term End", date.today())
+        cards = results.report_cards(conn, class_name, start, end)
+        if cards.empty:
+            st.info("No results for this class in the selected term.")
+        else:
+            st.dataframe(cards.drop(columns="student_id"), use_container_width=True, hide_index=True)
+            student = st.selectbox("Report card for", cards.index,
+                                   format_func=lambda i: f"{cards.at[i, 'name']} ({cards.at[i, 'roll_no']})")
+            card = cards.loc[student]
+            st.subheader(f"📄 {card['name']} - Class {class_name} {card['section'] or ''}")
+            subjects = [col for col in cards.columns
+                        if col not in ("student_id", "roll_no", "name", "section", "total", "out_of",
+                                       "percent", "grade", "class_rank")]
+            st.table(card[subjects].dropna().rename("Percent").to_frame())
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Overall %", card["percent"])
+            col2.metric("Grade", card["grade"])
+            col3.metric("Class Rank", f"{card['class_rank']} / {len(cards)}")
+
+        st.divider()
+        st.subheader("🏫 Whole-School Report Cards")
+        if st.button(f"Generate for all {len(classes)} classes ({start} to {end})"):
+            jobs.submit(conn, "report_cards", start=start, end=end)
+        widgets.job_panel(
+            conn, "report_cards", "cards_jobs",
+            lambda job: widgets.job_download(job, f"report_cards_{job.params['start']}_{job.params['end']}.csv",
+                                             "cards_jobs"),
+            describe=lambda job: f"{job.params['start']} to {job.params['end']}")
@@ -0,0 +1,36 @@
+import sqlite3
+
+import streamlit as st
+
+from school import students, widgets
+
+conn = widgets.connection()
+
+st.title("👨‍🎓 Student Management")
+
+tab1, tab2 = st.tabs(["➕ Add Student", "📋 View Students"])
+
+with tab1:
+    with st.form("add_student_form"):
+        col1, col2 = st.columns(2)
+        name = col1.text_input("Name *")
+        roll_no = col2.text_input("Roll No *").upper()
+        class_name = col1.text_input("Class")
+        section = col2.text_input("Section").upper()
+        age = col1.number_input("Age", 5, 30)
+        phone = col2.text_input("Phone")
+
+        submitted = st.form_submit_button("Add Student")
+        if submitted:
+            if name and roll_no:
+                try:
+                    students.add(conn, students.Student(name, roll_no, class_name, section, age, phone))
+                    st.success(f"✅ {name} added successfully!")
+                except sqlite3.IntegrityError:
+                    st.error("❌ Roll No already exists!")
+            else:
+                st.warning("⚠️ Name and Roll No are required!")
+
+with tab2:
+    widgets.paged_dataframe(conn, "students", ["name", "roll_no", "class", "section", "age", "phone"],
+                            key="students", empty_message="No students registered yet.")
@@ -0,0 +1,34 @@
+import sqlite3
+
+import streamlit as st
+
+from school import teachers, widgets
+
+conn = widgets.connection()
+
+st.title("👩‍🏫 Teacher Management")
+
+tab1, tab2 = st.tabs(["➕ Add Teacher", "📋 View Teachers"])
+
+with tab1:
+    with st.form("add_teacher"):
+        col1, col2 = st.columns(2)
+        name = col1.text_input("Name *")
+        teacher_id = col2.text_input("Teacher ID *").upper()
+        subject = col1.text_input("Subject")
+        phone = col2.text_input("Phone")
+        email = col1.text_input("Email")
+
+        if st.form_submit_button("Add Teacher"):
+            if name and teacher_id:
+                try:
+                    teachers.add(conn, teachers.Teacher(name, teacher_id, subject, phone, email))
+                    st.success("Teacher added!")
+                except sqlite3.IntegrityError:
+                    st.error("Teacher ID exists!")
+            else:
+                st.warning("Required fields missing!")
+
+with tab2:
+    widgets.paged_dataframe(conn, "teachers", ["name", "teacher_id", "subject", "phone", "email"],
+                            key="teachers", empty_message="No teachers yet.")
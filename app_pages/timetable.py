@@ -0,0 +1,101 @@
+import sqlite3
+
+import streamlit as st
+
+from school import attendance, jobs, teachers, timetable, widgets
+
+conn = widgets.connection()
+
+st.title("🗓️ Class Timetable")
+
+tab1, tab2, tab3, tab4 = st.tabs(["📅 View", "✏️ Edit Slot", "📐 Periods per Week", "⚙️ Generate"])
+sections = attendance.class_sections(conn)
+section_label = lambda cs: f"{cs[0] or ''} {cs[1] or ''}".strip()
+
+with tab1:
+    widgets.timetable_grid(conn, "timetable")
+
+with tab2:
+    staff = teachers.list_teachers(conn)
+    if not sections:
+        st.info("Add students to create classes first.")
+    else:
+        with st.form("edit_slot"):
+            col1, col2, col3 = st.columns(3)
+            class_name, section = col1.selectbox("Class", sections, format_func=section_label)
+            day = col2.selectbox("Day", timetable.DAYS)
+            period = col3.number_input("Period", 1, timetable.MAX_PERIODS)
+            subject = col1.text_input("Subject")
+            teacher = col2.selectbox("Teacher", [None] + staff,
+                                     format_func=lambda t: "—" if t is None else f"{t.name} ({t.teacher_id}, {t.subject or 'no subject'})")
+            col1, col2 = st.columns(2)
+            save = col1.form_submit_button("Save Slot")
+            clear = col2.form_submit_button("Clear Slot")
+        if save:
+            if not subject:
+                st.warning("⚠️ Subject is required!")
+            else:
+                try:
+                    timetable.set_slot(conn, class_name, section, day, period, subject,
+                                       teacher.teacher_id if teacher else None)
+                    st.success(f"✅ {day} period {period} saved.")
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+        if clear:
+            timetable.clear_slot(conn, class_name, section, day, period)
+            st.success(f"✅ {day} period {period} cleared.")
+
+    set_aside = timetable.conflicts(conn)
+    if not set_aside.empty:
+        st.warning(f"⚠️ {len(set_aside)} lesson(s) were set aside from double-booked slots. "
+                   "Re-enter the ones you want to keep above, then dismiss them.")
+        st.dataframe(set_aside.drop(columns="id"), use_container_width=True, hide_index=True)
+        if st.button("Dismiss Set-Aside Lessons"):
+            timetable.dismiss_conflicts(conn, set_aside["id"])
+            st.rerun()
+
+with tab3:
+    classes = sorted({cs[0] or "" for cs in sections})
+    if not classes:
+        st.info("Add students to create classes first.")
+    else:
+        class_name = st.selectbox("Class", classes, key="periods_class")
+        periods = st.data_editor(timetable.requirements(conn, class_name), num_rows="dynamic",
+                                 use_container_width=True, hide_index=True, key=f"periods_{class_name}",
+                                 column_config={"periods_per_week": st.column_config.NumberColumn(
+                                     "Periods per week", min_value=1, max_value=72, step=1)})
+        st.caption(f"{int(periods['periods_per_week'].fillna(0).sum())} periods per week")
+        if st.button("Save Periods"):
+            saved = timetable.save_requirements(conn, class_name, periods.itertuples(index=False))
+            st.success(f"✅ {saved} subject(s) saved for class {class_name}.")
+
+with tab4:
+    with st.form("generate_timetable"):
+        chosen = st.multiselect("Classes to (re)generate", sections, default=sections, format_func=section_label)
+        col1, col2, col3 = st.columns(3)
+        days = col1.selectbox("Days per week", [5, 6])
+        periods_per_day = col2.number_input("Periods per day", 1, timetable.MAX_PERIODS, timetable.PERIODS_PER_DAY)
+        budget = col3.number_input("Time budget (seconds)", 1, 300, int(timetable.TIME_BUDGET))
+        if st.form_submit_button("Generate"):
+            jobs.submit(conn, "timetable", sections=chosen, days=days, periods=periods_per_day,
+                        time_budget=budget)
+
+    def show_schedule(job):
+        chosen, schedule = job.result["sections"], timetable.Schedule(**job.result["schedule"])
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Lessons placed", len(schedule.lessons))
+        col2.metric("Problems", len(schedule.problems()))
+        col3.metric("Time", f"{schedule.seconds:.1f}s")
+        if not schedule.complete:
+            st.warning("Some lessons could not be scheduled:")
+            st.dataframe(schedule.problems(), use_container_width=True, hide_index=True)
+        if st.button("💾 Save Timetable", type="primary", key=f"save_timetable_{job.id}"):
+            try:
+                saved = timetable.save_schedule(conn, schedule, chosen)
+                st.success(f"✅ {saved} lessons saved for {len(chosen)} class(es).")
+            except sqlite3.IntegrityError:
+                st.error("❌ The saved timetable changed since this one was generated and it now clashes "
+                         "(a teacher or slot is double-booked). Generate it again.")
+
+    widgets.job_panel(conn, "timetable", "timetable_jobs", show_schedule,
+                      describe=lambda job: f"{len(job.params['sections'])} class(es)")
@@ -0,0 +1 @@
+"""Shared backend for the School Management System Streamlit apps."""
@@ -0,0 +1,133 @@
+"""Command-line access to the school database, without Streamlit.
+
+    python -m school import students students.csv
+    python -m school teachers teachers.csv
+    python -m school payments payments.csv
+    python -m school charge 10 2500 --section A --due 2026-11-10 --description "Nov tuition" --notify
+    python -m school export attendance csv attendance.csv --from 2026-09-01
+    python -m school --campus North import students north_students.csv
+
+Every command writes through the same functions the apps use. ``import``
+streams the file in chunks of ``importer.CHUNK_SIZE`` rows, commits each
+chunk as it goes and skips bad rows, reporting them by line and exiting
+with status 1. ``teachers`` and ``payments`` write the whole file in one
+transaction: either every row goes in or none do.
+"""
+import argparse
+import sys
+
+import pandas as pd
+
+from school import campus, db, exporter, fees, importer, students, teachers
+
+
+def _read_csv(path, required):
+    frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+    frame.columns = frame.columns.str.strip().str.lower().str.replace(" ", "_")
+    missing = [column for column in required if column not in frame]
+    if missing:
+        raise SystemExit(f"{path}: missing column(s) {', '.join(missing)}")
+    return frame.apply(lambda column: column.str.strip())
+
+
+def _optional(frame, column):
+    return frame[column].replace("", None) if column in frame else pd.Series(None, index=frame.index, dtype=object)
+
+
+def import_(conn, args):
+    report = importer.import_file(conn, args.kind, args.file, progress=lambda r: print(f"{r.rows_read} rows read..."))
+    print(f"Imported {report.rows_imported} of {report.rows_read} rows, {report.error_count} error(s)")
+    for line, message in report.errors[:20]:
+        print(f"  line {line}: {message}", file=sys.stderr)
+    return 1 if report.error_count else 0
+
+
+def add_teachers(conn, args):
+    frame = _read_csv(args.file, ["name", "teacher_id"])
+    rows = [teachers.Teacher(name, teacher_id.upper(), subject, phone, email)
+            for name, teacher_id, subject, phone, email
+            in zip(frame["name"], frame["teacher_id"], *(_optional(frame, c) for c in ("subject", "phone", "email")))]
+    print(f"Added {teachers.add_many(conn, rows)} teachers")
+    return 0
+
+
+def record_payments(conn, args):
+    frame = _read_csv(args.file, ["roll_no", "amount"])
+    roll_nos = frame["roll_no"].str.upper()
+    ids = roll_nos.map(students.ids_by_roll_no(conn, roll_nos.tolist()))
+    if ids.isna().any():
+        raise SystemExit(f"Unknown roll no(s): {', '.join(roll_nos[ids.isna()].unique())}")
+    amounts = pd.to_numeric(frame["amount"], errors="coerce")
+    if amounts.isna().any():
+        raise SystemExit(f"Amount is not a number on line(s) {', '.join(map(str, amounts.index[amounts.isna()] + 2))}")
+    payments = [fees.Payment(student_id, amount, paid_on, description)
+                for student_id, amount, paid_on, description
+                in zip(ids.astype(int), amounts, _optional(frame, "paid_on"), _optional(frame, "description"))]
+    try:
+        print(f"Recorded {fees.record_payments(conn, payments)} payments")
+    except ValueError as e:
+        raise SystemExit(str(e))
+    return 0
+
+
+def charge(conn, args):
+    try:
+        charged = fees.charge_class(conn, args.class_name, args.section, args.amount, args.due, args.description,
+                                    notify_parents=args.notify)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(f"Charged {charged} students")
+    return 0
+
+
+def export(conn, args):
+    rows = exporter.export(args.kind, args.format, args.out, args.start, args.end, args.class_name, path=args.db)
+    print(f"Wrote {rows} rows to {args.out}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m school", description=__doc__.split("\n")[0])
+    parser.add_argument("--db", default=db.DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--campus", choices=campus.names(), help="use this campus's database instead of --db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("import", help="import students, attendance or marks from CSV/Excel")
+    command.add_argument("kind", choices=list(importer.KINDS))
+    command.add_argument("file")
+    command.set_defaults(run=import_)
+
+    command = commands.add_parser("teachers", help="add teachers from a CSV (name, teacher_id, subject, phone, email)")
+    command.add_argument("file")
+    command.set_defaults(run=add_teachers)
+
+    command = commands.add_parser("payments", help="record payments from a CSV (roll_no, amount, paid_on, description)")
+    command.add_argument("file")
+    command.set_defaults(run=record_payments)
+
+    command = commands.add_parser("charge", help="charge every student of a class")
+    command.add_argument("class_name", metavar="class")
+    command.add_argument("amount", type=float)
+    command.add_argument("--section", help="only this section (default: all)")
+    command.add_argument("--due", help="due date, YYYY-MM-DD")
+    command.add_argument("--description")
+    command.add_argument("--notify", action="store_true", help="text each parent (see python -m school.notify)")
+    command.set_defaults(run=charge)
+
+    command = commands.add_parser("export", help="export attendance, fees or results")
+    command.add_argument("kind", choices=list(exporter.EXPORTS))
+    command.add_argument("format", choices=exporter.FORMATS)
+    command.add_argument("out")
+    command.add_argument("--from", dest="start", help="first date, YYYY-MM-DD")
+    command.add_argument("--to", dest="end", help="last date, YYYY-MM-DD")
+    command.add_argument("--class", dest="class_name")
+    command.set_defaults(run=export)
+
+    args = parser.parse_args(argv)
+    if args.campus:
+        args.db = campus.path_for(args.campus)
+    return args.run(db.get_connection(args.db), args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
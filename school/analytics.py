@@ -0,0 +1,107 @@
+"""Attendance analytics over the rollup tables.
+
+Every query here reads ``attendance_daily_class``,
+``attendance_monthly_class`` or ``attendance_monthly_student`` (kept current
+by triggers, see migration 13), never the raw attendance table. Late counts
+as attended.
+
+Rollups follow each student's class at the time attendance was written.
+After moving students between classes, or if the rollups are ever in doubt,
+rebuild them with::
+
+    python -m school.analytics backfill
+"""
+import argparse
+
+import pandas as pd
+
+from school import archive, db, migrations
+
+ATTENDED = "(present + late)"
+TOTAL = "(present + absent + late)"
+
+
+def backfill(conn):
+    """Rebuild all attendance rollups from raw attendance, archived years
+    included, in one transaction."""
+    archive.attach(conn)
+    with db.transaction(conn, immediate=True):
+        migrations.rebuild_attendance_rollups(conn, "attendance_all")
+
+
+def _class_filter(class_name, section, params):
+    where = []
+    if class_name is not None:
+        where.append("class = ?")
+        params.append(class_name or "")
+    if section is not None:
+        where.append("section = ?")
+        params.append(section or "")
+    return "".join(f" AND {clause}" for clause in where)
+
+
+def monthly_class_trend(conn, start_month, end_month, class_name=None, section=None):
+    """Attendance % per month for each class-section (``YYYY-MM`` bounds)."""
+    params = [start_month, end_month]
+    where = _class_filter(class_name, section, params)
+    df = pd.read_sql_query(f"""
+        SELECT month, class, section, present, absent, late,
+               ROUND(100.0 * {ATTENDED} / {TOTAL}, 1) AS attendance_pct
+        FROM attendance_monthly_class
+        WHERE month BETWEEN ? AND ? AND {TOTAL} > 0{where}
+        ORDER BY month, class, section
+    """, conn, params=params)
+    df["class_section"] = (df["class"] + " " + df["section"]).str.strip()
+    return df
+
+
+def daily_trend(conn, start, end, class_name=None, section=None):
+    """School-wide (or one class/section) attendance % per day."""
+    params = [str(start), str(end)]
+    where = _class_filter(class_name, section, params)
+    return pd.read_sql_query(f"""
+        SELECT date, SUM(present) AS present, SUM(absent) AS absent, SUM(late) AS late,
+               ROUND(100.0 * SUM{ATTENDED} / SUM{TOTAL}, 1) AS attendance_pct
+        FROM attendance_daily_class
+        WHERE date BETWEEN ? AND ?{where}
+        GROUP BY date
+        HAVING SUM{TOTAL} > 0
+        ORDER BY date
+    """, conn, params=params)
+
+
+def chronic_absentees(conn, start_month, end_month, threshold=90.0, class_name=None, min_days=1):
+    """Students whose attendance % over the month range is below
+    ``threshold``, worst first."""
+    params = [start_month, end_month]
+    class_where = ""
+    if class_name is not None:
+        class_where = " AND s.class IS ?"
+        params.append(class_name or None)
+    params += [min_days, threshold]
+    return pd.read_sql_query(f"""
+        SELECT s.roll_no, s.name, s.class, s.section, s.phone,
+               SUM(m.present) AS present, SUM(m.absent) AS absent, SUM(m.late) AS late,
+               ROUND(100.0 * SUM(m.present + m.late) / SUM(m.present + m.absent + m.late), 1) AS attendance_pct
+        FROM attendance_monthly_student m JOIN students s ON s.id = m.student_id
+        WHERE m.month BETWEEN ? AND ?{class_where}
+        GROUP BY m.student_id
+        HAVING SUM(m.present + m.absent + m.late) >= ? AND attendance_pct < ?
+        ORDER BY attendance_pct, s.roll_no
+    """, conn, params=params)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m school.analytics", description=__doc__.split("\n")[0])
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--db", default=db.DB_PATH, help="database file (default: %(default)s)")
+    args = parser.parse_args(argv)
+    conn = db.get_connection(args.db)
+    backfill(conn)
+    counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+              for table in migrations.ATTENDANCE_ROLLUPS}
+    print("Rebuilt " + ", ".join(f"{table} ({n} rows)" for table, n in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
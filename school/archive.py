@@ -0,0 +1,323 @@
+"""Academic-year archives of attendance, the fee ledger and library loans.
+
+Those three tables grow every school day. Once an academic year is over,
+:func:`rollover` moves its rows into an archive database beside the main
+one (``school_2025.db`` holds 2025-26 for ``school.db``), so the main
+database, its indexes and the daily pages only carry the current year.
+Loans still out stay behind until they come back.
+
+Rows move ``BATCH_ROWS`` at a time, each batch one short write transaction,
+so the apps keep working through a rollover. Ids are kept and the archive
+ignores rows it already has, so an interrupted rollover (or a payment
+backdated into a closed year) is finished by running it again. Attendance
+rollups, balances and the fee summary are left alone: they are small,
+cover every year, and analytics go on reading them. Attendance can no
+longer be saved for an archived year.
+
+Historical reads call :func:`attach`. It attaches every archive to the
+connection and creates the TEMP views ``attendance_all``,
+``fee_ledger_all`` and ``library_transactions_all``: the main table UNION
+ALL the same table in each archive. SQLite attaches at most 10 databases
+by default.
+
+:func:`compact` gives the pages a rollover freed back to the file system,
+a few thousand at a time, again without holding the write lock for long.
+
+Both write on the connection they are given rather than through
+:mod:`school.writer`: ATTACH and VACUUM cannot run inside the writer's
+group transaction, and the pauses between batches are what let the apps'
+writes in. They run in a job worker process (see :mod:`school.jobs`) or
+the command line, whose connection is their own, never in the server.
+
+    python -m school.archive list
+    python -m school.archive rollover 2025
+    python -m school.archive compact [--full]
+"""
+import argparse
+import os
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from school import db
+
+YEAR_START_MONTH = int(os.environ.get("SCHOOL_YEAR_START_MONTH", 8))  # August
+BATCH_ROWS = 5000
+COMPACT_PAGES = 2000  # freed per incremental_vacuum step
+PAUSE = 0.05  # seconds between batches, for the apps' writes to get in
+
+# table: (date column, condition on the rows that move, archive indexes)
+ARCHIVED = {
+    "attendance": ("date", "", ("date", "student_id, date")),
+    "fee_ledger": ("entry_date", "", ("entry_date", "student_id, entry_date")),
+    "library_transactions": ("issue_date", " AND status = 'Returned'", ("issue_date", "student_id", "book_id")),
+}
+
+
+def academic_year(day=None):
+    """The academic year ``day`` (default today) falls in, named by the
+    calendar year it starts in."""
+    day = day or date.today()
+    if isinstance(day, str):
+        day = date.fromisoformat(day[:10])
+    return day.year if day.month >= YEAR_START_MONTH else day.year - 1
+
+
+def year_range(year):
+    """First and last day of academic ``year`` as ISO dates."""
+    return str(date(year, YEAR_START_MONTH, 1)), str(date(year + 1, YEAR_START_MONTH, 1) - timedelta(days=1))
+
+
+def label(year):
+    return f"{year}-{(year + 1) % 100:02d}"
+
+
+def archive_file(path, year):
+    """The archive of ``year`` for the database at ``path``."""
+    path = Path(path)
+    return path.with_name(f"{path.stem}_{int(year)}{path.suffix or '.db'}")
+
+
+def archived_through(conn):
+    """Last day of the newest archived year, or None."""
+    year, = conn.execute("SELECT MAX(year) FROM archives").fetchone()
+    return None if year is None else year_range(year)[1]
+
+
+def _main_file(conn):
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+def _schema(year):
+    return f"archive_{int(year)}"
+
+
+def _attached(conn):
+    return {row[1] for row in conn.execute("PRAGMA database_list")}
+
+
+def _columns(conn, schema, table):
+    return [(row[1], row[2], row[5]) for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _pragma(conn, name):
+    return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+
+def _create_tables(conn, schema):
+    # Same columns as the main table (added ones too), without its
+    # constraints or triggers
+    for table, (_, _, indexes) in ARCHIVED.items():
+        columns = _columns(conn, "main", table)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {schema}.{table} ("
+                     + ", ".join(f"{name} {type_}{' PRIMARY KEY' if pk else ''}" for name, type_, pk in columns) + ")")
+        have = {name for name, _, _ in _columns(conn, schema, table)}
+        for name, type_, _ in columns:
+            if name not in have:
+                conn.execute(f"ALTER TABLE {schema}.{table} ADD COLUMN {name} {type_}")
+        for index in indexes:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_{table}_{index.replace(', ', '_')} "
+                         f"ON {table}({index})")
+
+
+def _views_current(conn, years):
+    views = dict(conn.execute("SELECT name, sql FROM sqlite_temp_master WHERE type = 'view'").fetchall())
+    return all(f"{table}_all" in views and all(f"{_schema(year)}.{table}" in views[f"{table}_all"] for year in years)
+               for table in ARCHIVED)
+
+
+def _create_views(conn, years):
+    for table in ARCHIVED:
+        columns = [name for name, _, _ in _columns(conn, "main", table)]
+        selects = [f"SELECT {', '.join(columns)} FROM main.{table}"]
+        for year in years:
+            have = {name for name, _, _ in _columns(conn, _schema(year), table)}
+            selects.append("SELECT " + ", ".join(name if name in have else f"NULL AS {name}" for name in columns)
+                           + f" FROM {_schema(year)}.{table}")
+        conn.execute(f"DROP VIEW IF EXISTS temp.{table}_all")
+        conn.execute(f"CREATE TEMP VIEW {table}_all AS " + " UNION ALL ".join(selects))
+
+
+def attach(conn):
+    """Attach every archive to ``conn`` and (re)create the ``*_all`` views
+    over them. Returns the archived years. Costs three small queries once
+    nothing has changed."""
+    years = [year for year, in conn.execute("SELECT year FROM archives ORDER BY year")]
+    if _views_current(conn, years):
+        return years
+    with db.outside_transaction(conn):
+        files = dict(conn.execute("SELECT year, file FROM archives ORDER BY year").fetchall())
+        if not _views_current(conn, files):  # unless another session just did it
+            directory = Path(_main_file(conn)).parent
+            attached = _attached(conn)
+            for year, file in files.items():
+                if _schema(year) in attached:
+                    continue
+                if not (directory / file).exists():
+                    raise ValueError(f"The {label(year)} archive {directory / file} is missing")
+                conn.execute(f"ATTACH DATABASE ? AS {_schema(year)}", (str(directory / file),))
+            _create_views(conn, files)
+    return list(files)
+
+
+def _has_rows(conn, table, year):
+    date_column, only, _ = ARCHIVED[table]
+    return conn.execute(f"SELECT EXISTS (SELECT 1 FROM main.{table} WHERE {date_column} BETWEEN ? AND ?{only})",
+                        year_range(year)).fetchone()[0]
+
+
+def closed_years(conn, today=None):
+    """Academic years that are over but still have rows in the main
+    database, oldest first."""
+    oldest = [conn.execute(f"SELECT MIN({date_column}) FROM main.{table} WHERE {date_column} IS NOT NULL{only}")
+              .fetchone()[0] for table, (date_column, only, _) in ARCHIVED.items()]
+    oldest = [day for day in oldest if day]
+    if not oldest:
+        return []
+    return [year for year in range(academic_year(min(oldest)), academic_year(today))
+            if any(_has_rows(conn, table, year) for table in ARCHIVED)]
+
+
+def rollover(conn, year, today=None, batch_rows=BATCH_ROWS, progress=None):
+    """Move academic ``year``'s attendance, fee ledger entries and returned
+    loans to its archive. Returns the number of rows moved;
+    ``progress(moved, total)`` is called after each batch."""
+    year = int(year)
+    if year >= academic_year(today):
+        raise ValueError(f"{label(year)} is not over yet")
+    schema, path = _schema(year), archive_file(_main_file(conn), year)
+    with db.outside_transaction(conn):
+        if schema not in _attached(conn):
+            conn.execute(f"ATTACH DATABASE ? AS {schema}", (str(path),))
+    first, last = year_range(year)
+    with db.transaction(conn, immediate=True):
+        _create_tables(conn, schema)
+        # From here on attendance for the year can no longer be saved
+        conn.execute("INSERT INTO archives (year, file) VALUES (?, ?) "
+                     "ON CONFLICT(year) DO UPDATE SET finished_at = NULL", (year, path.name))
+        total = sum(conn.execute(f"SELECT COUNT(*) FROM main.{table} WHERE {date_column} BETWEEN ? AND ?{only}",
+                                 (first, last)).fetchone()[0]
+                    for table, (date_column, only, _) in ARCHIVED.items())
+    moved = 0
+    for table, (date_column, only, _) in ARCHIVED.items():
+        columns = ", ".join(name for name, _, _ in _columns(conn, "main", table))
+        # The unary + keeps SQLite walking the table in id order rather than
+        # sorting the rest of the year's rows for every batch
+        where = f"+{date_column} BETWEEN ? AND ?{only}"
+        after = 0
+        while True:
+            with db.transaction(conn, immediate=True):
+                ids = [row[0] for row in conn.execute(
+                    f"SELECT id FROM main.{table} WHERE id > ? AND {where} ORDER BY id LIMIT ?",
+                    (after, first, last, batch_rows))]
+                if not ids:
+                    break
+                batch, params = f"id BETWEEN ? AND ? AND {where}", (ids[0], ids[-1], first, last)
+                conn.execute("UPDATE archives SET moving = 1 WHERE year = ?", (year,))
+                conn.execute(f"INSERT OR IGNORE INTO {schema}.{table} ({columns}) "
+                             f"SELECT {columns} FROM main.{table} WHERE {batch}", params)
+                conn.execute(f"DELETE FROM main.{table} WHERE {batch}", params)
+                conn.execute("UPDATE archives SET moving = 0, rows = rows + ? WHERE year = ?", (len(ids), year))
+            after = ids[-1]
+            moved += len(ids)
+            if progress:
+                progress(moved, total)
+            time.sleep(PAUSE)
+    with db.transaction(conn):
+        conn.execute("UPDATE archives SET finished_at = datetime('now') WHERE year = ?", (year,))
+    return moved
+
+
+def can_compact_online(conn):
+    return _pragma(conn, "auto_vacuum") == 2  # INCREMENTAL
+
+
+def compact(conn, full=False, progress=None):
+    """Give the main database's free pages back to the file system and
+    refresh the planner statistics. Returns the number of pages freed.
+
+    Online (the default) this frees ``COMPACT_PAGES`` per short write
+    transaction and needs ``auto_vacuum = INCREMENTAL``, which new
+    databases have. A ``full`` compaction rewrites the file with VACUUM
+    and switches it to incremental; it holds the write lock until done,
+    so run it once, out of hours. ``progress(freed, total)`` is called
+    after each step.
+    """
+    free = _pragma(conn, "freelist_count")
+    if full:
+        with db.outside_transaction(conn):
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM main")
+    elif not can_compact_online(conn):
+        raise ValueError("Online compaction needs auto_vacuum = INCREMENTAL; "
+                         "run python -m school.archive compact --full once, out of hours")
+    else:
+        left = free
+        while left:
+            with db.transaction(conn, immediate=True):
+                conn.execute(f"PRAGMA incremental_vacuum({COMPACT_PAGES})").fetchall()
+            before, left = left, _pragma(conn, "freelist_count")
+            if progress:
+                progress(free - left, free)
+            if left >= before:  # the apps are freeing pages as fast as this returns them
+                break
+            time.sleep(PAUSE)
+    with db.outside_transaction(conn):
+        conn.execute("PRAGMA optimize")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    return free - _pragma(conn, "freelist_count")
+
+
+def list_archives(conn):
+    """One row per archived year with its file, rows moved and size."""
+    archives = pd.read_sql_query("SELECT year, file, rows, started_at, finished_at FROM archives ORDER BY year",
+                                 conn)
+    directory = Path(_main_file(conn)).parent
+    archives.insert(1, "academic_year", archives["year"].map(label))
+    archives["size_mb"] = [round((directory / file).stat().st_size / 2**20, 1) if (directory / file).exists()
+                           else None for file in archives["file"]]
+    return archives
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m school.archive", description=__doc__.split("\n")[0])
+    parser.add_argument("--db", default=db.DB_PATH, help="database file (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="archived years, and closed years still in the main database")
+    command = commands.add_parser("rollover", help="move a closed academic year to its archive, then compact")
+    command.add_argument("year", type=int, help="the calendar year it started in, e.g. 2025 for 2025-26")
+    command.add_argument("--no-compact", action="store_true")
+    command = commands.add_parser("compact", help="give free pages back to the file system")
+    command.add_argument("--full", action="store_true", help="VACUUM the whole file (blocks writes; out of hours)")
+    args = parser.parse_args(argv)
+    conn = db.get_connection(args.db)
+
+    if args.command == "list":
+        with pd.option_context("display.width", 200):
+            print(list_archives(conn).to_string(index=False))
+        closed = closed_years(conn)
+        print("Closed years still in the main database: " + (", ".join(map(label, closed)) or "none"))
+    elif args.command == "rollover":
+        try:
+            moved = rollover(conn, args.year, progress=lambda done, total: print(f"{done} of {total} rows moved",
+                                                                                 end="\r"))
+        except ValueError as e:
+            raise SystemExit(str(e))
+        print(f"\nMoved {moved} rows to {archive_file(_main_file(conn), args.year)}")
+        if not args.no_compact:
+            if can_compact_online(conn):
+                print(f"Freed {compact(conn)} pages")
+            else:
+                print("Not compacted: run python -m school.archive compact --full once, out of hours")
+    else:
+        try:
+            print(f"Freed {compact(conn, args.full)} pages")
+        except ValueError as e:
+            raise SystemExit(str(e))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,95 @@
+"""Attendance roster reads and batched writes."""
+from typing import NamedTuple
+
+import pandas as pd
+
+from school import archive, db, notify
+from school.writer import queued
+
+STATUSES = ("Present", "Absent", "Late")
+
+UPSERT_SQL = """
+    INSERT INTO attendance (student_id, date, status) VALUES (?, ?, ?)
+    ON CONFLICT(student_id, date) DO UPDATE SET status = excluded.status
+    WHERE attendance.status IS NOT excluded.status
+"""
+
+
+class Mark(NamedTuple):
+    student_id: int
+    date: str
+    status: str
+
+
+def save_attendance(conn, attendance_date, statuses, notify_parents=False):
+    """Upsert ``(student_id, status)`` pairs for one date in a single
+    transaction. Rows whose status is unchanged are not rewritten.
+
+    Returns the number of rows inserted or updated.
+    """
+    selected_date = str(attendance_date)
+    return mark_many(conn, [Mark(student_id, selected_date, status) for student_id, status in statuses],
+                     notify_parents)
+
+
+@queued
+def mark_many(conn, marks, notify_parents=False):
+    """Upsert :class:`Mark` rows, across any students and dates, in a single
+    transaction. Raises ValueError, writing nothing, on an unknown status
+    or a date in an archived academic year. With ``notify_parents``, parents
+    of students marked Absent get an SMS (see :mod:`school.notify`). An
+    absence SMS not yet sent is dropped when the student is re-marked.
+
+    Returns the number of rows inserted or updated.
+    """
+    rows = [(int(student_id), str(day), status) for student_id, day, status in marks]
+    unknown = {status for _, _, status in rows} - set(STATUSES)
+    if unknown:
+        raise ValueError(f"Unknown attendance status: {', '.join(sorted(map(str, unknown)))}")
+    closed = archive.archived_through(conn)
+    if closed and rows and min(day for _, day, _ in rows) <= closed:
+        raise ValueError(f"Attendance up to {closed} has been archived and can no longer be changed")
+    # rowcount, unlike total_changes, leaves out rows the rollup triggers touch
+    with db.transaction(conn):
+        changed = conn.executemany(UPSERT_SQL, rows).rowcount
+        notify.cancel_absences(conn, [(student_id, day) for student_id, day, status in rows if status != "Absent"])
+        if notify_parents:
+            notify.enqueue_absences(conn, [(student_id, day) for student_id, day, status in rows if status == "Absent"])
+        return changed
+
+
+def class_sections(conn):
+    """Distinct ``(class, section)`` pairs that have students."""
+    return conn.execute(
+        "SELECT DISTINCT class, section FROM students ORDER BY class, section"
+    ).fetchall()
+
+
+def roster_count(conn, class_name, section):
+    return conn.execute(
+        "SELECT COUNT(*) FROM students WHERE class IS ? AND section IS ?",
+        (class_name, section),
+    ).fetchone()[0]
+
+
+def load_roster(conn, attendance_date, class_name, section, limit, offset=0):
+    """One page of a class/section with each student's saved status for the
+    date (``saved_status``) and the status to show (``status``), which
+    defaults to Present for students not yet marked."""
+    roster = pd.read_sql_query("""
+        SELECT s.id, s.roll_no, s.name, a.status AS saved_status
+        FROM students s
+        LEFT JOIN attendance a ON a.student_id = s.id AND a.date = ?
+        WHERE s.class IS ? AND s.section IS ?
+        ORDER BY s.roll_no
+        LIMIT ? OFFSET ?
+    """, conn, params=(str(attendance_date), class_name, section, limit, offset))
+    roster["status"] = roster["saved_status"].fillna("Present")
+    return roster
+
+
+def changed_statuses(roster, statuses):
+    """``(student_id, status)`` pairs where ``statuses`` (aligned with
+    ``roster``) differs from what is saved, including unsaved defaults."""
+    mask = statuses.ne(roster["saved_status"])
+    return list(zip(roster.loc[mask, "id"], statuses[mask]))
@@ -0,0 +1,216 @@
+"""Query and page-render benchmarks with a saved baseline.
+
+Times every query function the app pages call, and full headless renders
+of every page of ``areeba.py``, ``SMS.py`` and ``Streamlit app.py``
+through ``streamlit.testing``. Each case reports p50/p95 wall time and the
+peak Python heap of one extra traced run. Caches are cleared before every
+repetition, so these are cold-cache numbers.
+
+    python -m school.synthetic --db bench.db        # once
+    python -m school.bench --db bench.db --save     # record the baseline
+    python -m school.bench --db bench.db            # compare against it
+
+Exits with status 1 if any case's p95 is more than ``--tolerance`` times
+(and at least ``MIN_DELTA_MS`` above) its baseline, or if a case raised.
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from school import (analytics, attendance, cache, dashboard, db, exporter, fees, library, paging, results,
+                    students, timetable)
+
+APPS = ("areeba.py", "SMS.py", "Streamlit app.py")
+APP_DIR = Path(__file__).resolve().parent.parent
+BASELINE = "bench_baseline.json"
+QUERY_REPEAT = 20
+PAGE_REPEAT = 5
+TOLERANCE = 1.25
+MIN_DELTA_MS = 1.0  # sub-millisecond jitter is not a regression
+
+
+def _busiest(conn, sql):
+    row = conn.execute(sql).fetchone()
+    if row is None:
+        raise ValueError("Benchmark database is empty; fill it with python -m school.synthetic first")
+    return row
+
+
+def query_cases(conn, today=None):
+    """``name -> callable`` for each query the pages issue, with parameters
+    picked from the data (largest class-section, busiest exam, ...)."""
+    today = today or date.today()
+    class_name, section = _busiest(conn, "SELECT class, section FROM students GROUP BY class, section "
+                                         "ORDER BY COUNT(*) DESC LIMIT 1")
+    exam_id, = _busiest(conn, "SELECT exam_id FROM results GROUP BY exam_id ORDER BY COUNT(*) DESC LIMIT 1")
+    student_id, = _busiest(conn, "SELECT id FROM students ORDER BY id LIMIT 1")
+    teacher = conn.execute("SELECT teacher FROM timetable WHERE teacher IS NOT NULL "
+                           "GROUP BY teacher ORDER BY COUNT(*) DESC LIMIT 1").fetchone()
+    month = f"{today:%Y-%m}"
+    year_ago = f"{today - timedelta(days=365):%Y-%m}"
+    return {
+        "dashboard.metrics": lambda: dashboard.metrics(conn, today),
+        "dashboard.attendance_trend": lambda: dashboard.attendance_trend(conn, 30, today),
+        "dashboard.class_breakdown": lambda: dashboard.class_breakdown(conn, today),
+        "paging.count_rows": lambda: paging.count_rows(conn, "students"),
+        "paging.fetch_page": lambda: paging.fetch_page(conn, "students", ["name", "roll_no", "class", "section"],
+                                                       "name"),
+        "students.count_matches": lambda: students.count_matches(conn, "ali kh"),
+        "students.search_students": lambda: students.search_students(conn, "ali kh"),
+        "attendance.class_sections": lambda: attendance.class_sections(conn),
+        "attendance.load_roster": lambda: attendance.load_roster(conn, today, class_name, section, 50),
+        "fees.count_dues": lambda: fees.count_dues(conn),
+        "fees.dues": lambda: fees.dues(conn, 50, 0),
+        "fees.dues_overdue": lambda: fees.dues(conn, 50, 0, today),
+        "fees.statement": lambda: fees.statement(conn, student_id),
+        "results.marks_sheet": lambda: results.marks_sheet(conn, exam_id),
+        "results.exam_summary": lambda: results.exam_summary(conn, exam_id),
+        "results.report_cards": lambda: results.report_cards(conn, class_name),
+        "analytics.monthly_class_trend": lambda: analytics.monthly_class_trend(conn, year_ago, month),
+        "analytics.daily_trend": lambda: analytics.daily_trend(conn, today - timedelta(days=90), today),
+        "analytics.chronic_absentees": lambda: analytics.chronic_absentees(conn, year_ago, month),
+        "library.search_catalog": lambda: library.search_catalog(conn, "gold riv"),
+        "library.count_overdue": lambda: library.count_overdue(conn, today),
+        "library.overdue": lambda: library.overdue(conn, today),
+        "timetable.load_occupancy": lambda: timetable.load_occupancy(conn),
+        "timetable.class_grid": lambda: timetable.class_grid(conn, class_name, section),
+        "timetable.teacher_grid": lambda: timetable.teacher_grid(conn, teacher[0] if teacher else ""),
+        "exporter.attendance_csv_30d": lambda: exporter.export("attendance", "csv", os.devnull,
+                                                               today - timedelta(days=30), today),
+    }
+
+
+def page_cases():
+    """``name -> callable`` rendering each ``st.navigation`` page of each app
+    once, the hidden Admin pages included."""
+    from streamlit.testing.v1 import AppTest
+
+    cases = {}
+    for app in APPS:
+        at = AppTest.from_file(str(APP_DIR / app), default_timeout=120)
+        at.query_params["admin"] = "1"
+        at.run()
+        # AppTest has no public list of the pages st.navigation registered,
+        # and switch_page only opens file pages, so this reads the private
+        # _registered_pages and _page_hash. They are why the requirement
+        # files pin Streamlit: check this still finds every page when
+        # moving to a new version.
+        pages = [info for info in at._registered_pages.values() if "url_pathname" in info]
+        for page in (pages or [None]):
+            def render(at=at, page=page):
+                if page is not None:
+                    at.query_params["admin"] = "1"
+                    if page["script_path"]:
+                        at.switch_page(os.path.relpath(page["script_path"], APP_DIR))
+                    elif hasattr(at, "_page_hash"):  # a function page
+                        at._page_hash = page["page_script_hash"]
+                    else:
+                        raise RuntimeError("This Streamlit's AppTest cannot open function pages")
+                at.run()
+                if at.exception:
+                    raise RuntimeError(at.exception[0].value)
+            label = f"{page['icon']} {page['page_name']}" if page else "main"
+            cases[f"{app} :: {label}"] = render
+    return cases
+
+
+def measure(fn, repeat):
+    """p50/p95 milliseconds over ``repeat`` cold runs, and the peak traced
+    Python heap (KiB) of one more."""
+    timings = []
+    for _ in range(repeat):
+        cache.clear_all()
+        started = time.perf_counter()
+        fn()
+        timings.append(1000 * (time.perf_counter() - started))
+    cache.clear_all()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"p50_ms": round(float(np.percentile(timings, 50)), 2),
+            "p95_ms": round(float(np.percentile(timings, 95)), 2),
+            "peak_kib": round(peak / 1024)}
+
+
+def run(path, repeat=QUERY_REPEAT, page_repeat=PAGE_REPEAT, pages=True, progress=print):
+    """Measure every case against the database at ``path``."""
+    db.DB_PATH = str(path)  # the apps call db.get_connection() with no path
+    conn = db.get_connection(path)
+    measured = {}
+    cases = [(name, fn, repeat) for name, fn in query_cases(conn).items()]
+    if pages:
+        cases += [(name, fn, page_repeat) for name, fn in page_cases().items()]
+    for name, fn, n in cases:
+        try:
+            measured[name] = measure(fn, n)
+        except Exception as exc:  # report the failure and keep benchmarking the rest
+            measured[name] = {"error": f"{type(exc).__name__}: {exc}"}
+        progress(f"{name}: {measured[name]}")
+    return measured
+
+
+def compare(measured, baseline, tolerance=TOLERANCE):
+    """One row per case with the baseline p95 and a ``regressed`` flag."""
+    rows = []
+    for name, current in measured.items():
+        before = baseline.get(name, {})
+        change = (current["p95_ms"] / before["p95_ms"] - 1) * 100 \
+            if "p95_ms" in current and before.get("p95_ms") else None
+        rows.append({
+            "case": name,
+            "p50_ms": current.get("p50_ms"),
+            "p95_ms": current.get("p95_ms"),
+            "peak_kib": current.get("peak_kib"),
+            "baseline_p95_ms": before.get("p95_ms"),
+            "change_pct": None if change is None else round(change, 1),
+            "regressed": "error" in current or (
+                change is not None and change > (tolerance - 1) * 100
+                and current["p95_ms"] - before["p95_ms"] >= MIN_DELTA_MS),
+            "error": current.get("error"),
+        })
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m school.bench", description=__doc__.split("\n")[0])
+    parser.add_argument("--db", default="bench.db", help="database to benchmark (default: %(default)s)")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON file (default: %(default)s)")
+    parser.add_argument("--save", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--repeat", type=int, default=QUERY_REPEAT, help="runs per query (default: %(default)s)")
+    parser.add_argument("--page-repeat", type=int, default=PAGE_REPEAT, help="renders per page (default: %(default)s)")
+    parser.add_argument("--no-pages", action="store_true", help="skip the AppTest page renders")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="allowed p95 ratio to the baseline (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} does not exist; create it with python -m school.synthetic --db {args.db}")
+
+    measured = run(args.db, args.repeat, args.page_repeat, not args.no_pages, progress=lambda _: None)
+    baseline = json.loads(Path(args.baseline).read_text()) if os.path.exists(args.baseline) else {}
+    report = compare(measured, baseline, args.tolerance)
+    with pd.option_context("display.max_rows", None, "display.width", 200, "display.max_colwidth", 60):
+        print(report.drop(columns="error").to_string(index=False))
+    for row in report[report["error"].notna()].itertuples():
+        print(f"ERROR {row.case}: {row.error}")
+    if args.save:
+        Path(args.baseline).write_text(json.dumps(measured, indent=2, sort_keys=True))
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    regressions = report["regressed"].sum()
+    if regressions:
+        print(f"{regressions} case(s) regressed beyond {args.tolerance:.2f}x the baseline p95")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,58 @@
+"""In-process result caches."""
+import threading
+import weakref
+from collections import OrderedDict
+
+_instances = weakref.WeakSet()
+
+
+def write_version(conn):
+    """Changes whenever this connection or any other commits a write.
+
+    ``PRAGMA data_version`` only moves for commits made by *other*
+    connections, so it is paired with this connection's ``total_changes``.
+    """
+    data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+    return data_version, conn.total_changes
+
+
+class LRUCache:
+    """Thread-safe memo of ``compute()`` results by key, least recently used
+    entries evicted first. Put anything that should invalidate an entry
+    (such as a version number) into its key."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        _instances.add(self)
+
+    def get(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class VersionedCache(LRUCache):
+    """Memoise query results per connection until the next write."""
+
+    def get(self, conn, key, compute):
+        return super().get((id(conn), key, write_version(conn)), compute)
+
+
+def clear_all():
+    """Empty every cache in the process (used by benchmarks to time cold
+    reads)."""
+    for cache in list(_instances):
+        cache.clear()
@@ -0,0 +1,93 @@
+"""Campuses, one SQLite database each, and group-wide figures across them.
+
+``SCHOOL_CAMPUSES`` lists the campuses as comma-separated ``name=path``
+pairs (``Main=school.db,North=north.db``). When it is not set there is
+one campus, on ``db.DB_PATH``. Each campus has its own file, and so its
+own shared connection, writer thread, jobs and archives. Campuses never
+compete for a write lock, so adding one adds write throughput.
+:func:`connection` routes a session to its campus's database.
+
+Group figures are gathered from every campus at once on a thread pool and
+merged. SQLite releases the GIL while it works, and each campus has its
+own connection, so the campuses are read in parallel.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from school import dashboard, db, fees
+
+MAX_WORKERS = 16
+
+_lock = threading.Lock()
+_pool = None
+
+
+def _parse(spec):
+    campuses = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, path = (part.strip() for part in item.partition("="))
+        if not sep or not name or not path:
+            raise ValueError(f"SCHOOL_CAMPUSES: expected name=path, got {item!r}")
+        campuses[name] = path
+    return campuses
+
+
+CAMPUSES = _parse(os.environ.get("SCHOOL_CAMPUSES", "")) or {"Main": db.DB_PATH}
+
+
+def names():
+    return list(CAMPUSES)
+
+
+def path_for(campus=None):
+    """Database file of ``campus`` (default the first one)."""
+    if campus is None:
+        return next(iter(CAMPUSES.values()))
+    try:
+        return CAMPUSES[campus]
+    except KeyError:
+        raise ValueError(f"Unknown campus {campus!r}") from None
+
+
+def connection(campus=None):
+    """The shared connection of ``campus``'s database."""
+    return db.get_connection(path_for(campus))
+
+
+def _executor():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(min(len(CAMPUSES), MAX_WORKERS), thread_name_prefix="campus")
+        return _pool
+
+
+def gather(fn, *args, **kwargs):
+    """Run ``fn(conn, *args, **kwargs)`` on every campus in parallel and
+    return ``{campus: result}`` in campus order. The first error raised
+    on any campus is raised here."""
+    pool = _executor()
+    futures = {name: pool.submit(lambda path=path: fn(db.get_connection(path), *args, **kwargs))
+               for name, path in CAMPUSES.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def group_metrics(today=None):
+    """Dashboard KPIs (students, teachers, books, fees due, present today)
+    per campus, with a Total row."""
+    frame = pd.DataFrame.from_dict(gather(dashboard.metrics, today), orient="index")
+    dtypes = frame.dtypes
+    frame.loc["Total"] = frame.sum()
+    frame.index.name = "campus"
+    return frame.astype(dtypes)
+
+
+def group_dues(limit=50, overdue_as_of=None):
+    """The ``limit`` largest balances across all campuses: each campus's
+    top ``limit``, merged."""
+    merged = pd.concat([dues.assign(campus=name) for name, dues in gather(fees.dues, limit, 0, overdue_as_of).items()],
+                       ignore_index=True)
+    return merged.sort_values("due", ascending=False, kind="stable").head(limit).reset_index(drop=True)
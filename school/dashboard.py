@@ -0,0 +1,80 @@
+"""Dashboard KPIs, attendance trends and per-class breakdowns.
+
+Results are cached until the next write to the database, so repeated
+dashboard visits between writes cost one ``PRAGMA data_version`` each.
+Returned DataFrames are shared between sessions; copy before modifying.
+"""
+from datetime import date, timedelta
+
+import pandas as pd
+
+from school.cache import VersionedCache
+
+_cache = VersionedCache()
+
+METRICS_SQL = """
+    SELECT
+        (SELECT COUNT(*) FROM students),
+        (SELECT COUNT(*) FROM teachers),
+        (SELECT COUNT(*) FROM books),
+        (SELECT outstanding FROM fee_summary WHERE id = 1),
+        (SELECT COUNT(*) FROM attendance WHERE date = ? AND status = 'Present')
+"""
+
+
+def metrics(conn, today=None):
+    """All dashboard KPIs in one round-trip."""
+    today = str(today or date.today())
+
+    def compute():
+        students, teachers, books, due_fees, present = conn.execute(METRICS_SQL, (today,)).fetchone()
+        return {
+            "students": students,
+            "teachers": teachers,
+            "books": books,
+            "due_fees": due_fees or 0,
+            "present_today": present,
+        }
+
+    return _cache.get(conn, ("metrics", today), compute)
+
+
+def attendance_trend(conn, days=30, today=None):
+    """Daily Present/Absent/Late counts and present % for the last ``days``
+    days, read from the daily attendance rollup."""
+    end = today or date.today()
+    start = end - timedelta(days=days - 1)
+
+    def compute():
+        trend = pd.read_sql_query("""
+            SELECT date, SUM(present) AS Present, SUM(absent) AS Absent, SUM(late) AS Late
+            FROM attendance_daily_class
+            WHERE date BETWEEN ? AND ?
+            GROUP BY date
+            HAVING SUM(present + absent + late) > 0
+            ORDER BY date
+        """, conn, params=(str(start), str(end))).set_index("date")
+        trend["present_pct"] = (100 * trend["Present"] / trend.sum(axis=1)).round(1)
+        return trend
+
+    return _cache.get(conn, ("trend", str(start), str(end)), compute)
+
+
+def class_breakdown(conn, today=None):
+    """Per class: students, present today and fees outstanding."""
+    today = str(today or date.today())
+
+    def compute():
+        return pd.read_sql_query("""
+            SELECT s.class,
+                   COUNT(*) AS students,
+                   SUM(a.status = 'Present') AS present_today,
+                   SUM(MAX(COALESCE(b.balance, 0), 0)) AS fees_due
+            FROM students s
+            LEFT JOIN attendance a ON a.student_id = s.id AND a.date = ?
+            LEFT JOIN student_balances b ON b.student_id = s.id
+            GROUP BY s.class
+            ORDER BY s.class
+        """, conn, params=(today,))
+
+    return _cache.get(conn, ("classes", today), compute)
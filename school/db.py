@@ -0,0 +1,154 @@
+"""Process-wide SQLite connection manager.
+
+Streamlit re-executes the app script on every widget interaction, but
+imported modules survive between reruns. Keeping the connection here means
+it is opened, tuned and migrated once per process instead of once per
+click.
+"""
+import os
+import threading
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+from school import migrations, telemetry
+
+# SCHOOL_DB points the apps at another file, e.g. a synthetic benchmark database
+DB_PATH = os.environ.get("SCHOOL_DB", "school.db")
+
+# Prepared statements kept per connection (sqlite3 defaults to 128)
+STATEMENT_CACHE_SIZE = 512
+
+PRAGMAS = (
+    # Only takes effect on a new file (or at the next VACUUM); lets
+    # archive.compact() return free pages in small steps
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -32000",  # ~32 MB page cache
+    "PRAGMA mmap_size = 268435456",  # 256 MB
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+# auto_vacuum, journal_mode and synchronous are writer settings; WAL is
+# persistent in the file
+READER_PRAGMAS = PRAGMAS[3:]
+
+_lock = threading.Lock()
+_connections = {}
+_write_locks = {}
+_grouped = set()  # writer connections, see open_writer()
+
+
+def _open(path, trace=False):
+    conn = telemetry.connect(
+        path,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        trace=trace,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_connection(path=None):
+    """Return the shared connection for ``path`` (default ``DB_PATH``),
+    creating and migrating it on first use."""
+    path = path or DB_PATH
+    with _lock:
+        conn = _connections.get(path)
+        if conn is None:
+            conn = _open(path)
+            migrations.migrate(conn)
+            _connections[path] = conn
+            _write_locks[conn] = threading.RLock()
+    return conn
+
+
+def open_reader(path=None):
+    """Open a separate read-only connection for a long scan (exports,
+    reports). Under WAL it reads a consistent snapshot without blocking
+    writers or the shared connection. The caller closes it."""
+    path = path or DB_PATH
+    get_connection(path)  # make sure the file exists and is migrated
+    conn = telemetry.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True, check_same_thread=False)
+    for pragma in READER_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def path_of(conn):
+    """The path ``conn`` was opened for, if it is a shared connection."""
+    with _lock:
+        return next((path for path, shared in _connections.items() if shared is conn), None)
+
+
+def open_writer(path=None):
+    """Open the connection a :mod:`school.writer` thread commits through.
+    :func:`transaction` blocks run on it become savepoints inside the
+    writer's group transaction."""
+    path = path or DB_PATH
+    get_connection(path)
+    conn = _open(path, trace=True)  # only its writer thread uses it
+    _grouped.add(conn)
+    return conn
+
+
+@contextmanager
+def savepoint(conn, name="block"):
+    """Nest a block in the open transaction; an exception rolls back only
+    what the block did."""
+    conn.execute(f"SAVEPOINT {name}")
+    try:
+        yield conn
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute(f"ROLLBACK TO {name}")
+            conn.execute(f"RELEASE {name}")
+        raise
+    conn.execute(f"RELEASE {name}")
+
+
+@contextmanager
+def transaction(conn, immediate=False):
+    """Run a block of statements as one transaction on a shared connection.
+
+    The connection is shared by every session thread, so the block holds the
+    connection's write lock to keep other sessions' statements out of it.
+    On a writer connection the block is a savepoint of the group commit.
+    """
+    if conn in _grouped:
+        with savepoint(conn):
+            yield conn
+        return
+    with _write_locks[conn]:
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
+@contextmanager
+def outside_transaction(conn):
+    """Hold the connection's write lock with no transaction open, for
+    statements that must not join another session's transaction (ATTACH,
+    TEMP views, VACUUM)."""
+    with _write_locks.get(conn) or nullcontext():
+        if conn.in_transaction:
+            conn.commit()
+        yield conn
+
+
+def close_all():
+    """Close every cached connection (used by scripts and tests)."""
+    with _lock:
+        for conn in _connections.values():
+            conn.close()
+        _connections.clear()
+        _write_locks.clear()
@@ -0,0 +1,119 @@
+"""Chunked export of attendance, fees and results to CSV or Parquet.
+
+Rows are pulled from a read-only connection ``CHUNK_SIZE`` at a time and
+appended to the output file as they arrive, so memory use depends on the
+chunk size, not on how much history is being exported. Attendance and
+fees are read through the archive views, so closed academic years that
+have been archived are exported too.
+"""
+import pandas as pd
+
+from school import archive, db
+
+CHUNK_SIZE = 20000
+
+# name -> (query, date column used by the date-range filter, column dtypes)
+EXPORTS = {
+    "attendance": (
+        """SELECT a.date, s.roll_no, s.name, s.class, s.section, a.status
+           FROM attendance_all a JOIN students s ON s.id = a.student_id""",
+        "a.date",
+        {"date": "string", "roll_no": "string", "name": "string", "class": "string",
+         "section": "string", "status": "string"},
+    ),
+    "fees": (
+        """SELECT l.entry_date, s.roll_no, s.name, s.class, s.section,
+                  l.entry_type, l.amount, l.due_date, l.description
+           FROM fee_ledger_all l JOIN students s ON s.id = l.student_id""",
+        "l.entry_date",
+        {"entry_date": "string", "roll_no": "string", "name": "string", "class": "string",
+         "section": "string", "entry_type": "string", "amount": "float64", "due_date": "string",
+         "description": "string"},
+    ),
+    "results": (
+        """SELECT e.date AS exam_date, e.exam_name, e.subject, s.roll_no, s.name, s.class, s.section,
+                  r.marks_obtained, e.max_marks
+           FROM results r JOIN exams e ON e.id = r.exam_id JOIN students s ON s.id = r.student_id""",
+        "e.date",
+        {"exam_date": "string", "exam_name": "string", "subject": "string", "roll_no": "string",
+         "name": "string", "class": "string", "section": "string", "marks_obtained": "Int64",
+         "max_marks": "Int64"},
+    ),
+}
+
+FORMATS = ("csv", "parquet")
+
+
+def iter_chunks(conn, kind, start=None, end=None, class_name=None, chunksize=CHUNK_SIZE):
+    """Yield DataFrames of the ``kind`` export, filtered by an inclusive
+    date range and class, with stable column dtypes."""
+    query, date_column, dtypes = EXPORTS[kind]
+    archive.attach(conn)
+    where, params = [], []
+    if start:
+        where.append(f"{date_column} >= ?")
+        params.append(str(start))
+    if end:
+        where.append(f"{date_column} <= ?")
+        params.append(str(end))
+    if class_name:
+        where.append("s.class = ?")
+        params.append(class_name)
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += f" ORDER BY {date_column}"
+    empty = True
+    for chunk in pd.read_sql_query(query, conn, params=params, chunksize=chunksize):
+        empty = False
+        yield chunk.astype(dtypes)
+    if empty:
+        # Still produce a header / schema for an empty export
+        yield pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in dtypes.items()})
+
+
+def write_csv(chunks, out, progress=None):
+    rows = 0
+    with open(out, "w", newline="", encoding="utf-8") as f:
+        for chunk in chunks:
+            chunk.to_csv(f, header=rows == 0, index=False)
+            rows += len(chunk)
+            if progress:
+                progress(rows)
+    return rows
+
+
+def write_parquet(chunks, out, progress=None):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow); choose CSV instead.") from exc
+    rows, writer = 0, None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(out, table.schema)
+            writer.write_table(table.cast(writer.schema))
+            rows += len(chunk)
+            if progress:
+                progress(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+WRITERS = {"csv": write_csv, "parquet": write_parquet}
+
+
+def export(kind, fmt, out, start=None, end=None, class_name=None,
+           chunksize=CHUNK_SIZE, path=None, progress=None):
+    """Write the ``kind`` export to the file ``out`` in ``fmt`` and return
+    the number of rows written. ``progress(rows)`` is called per chunk."""
+    conn = db.open_reader(path)
+    try:
+        chunks = iter_chunks(conn, kind, start, end, class_name, chunksize)
+        return WRITERS[fmt](chunks, out, progress)
+    finally:
+        conn.close()
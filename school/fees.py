@@ -0,0 +1,127 @@
+"""Fee ledger writes and balance reads.
+
+Every charge or payment is one ``fee_ledger`` row. The ``fee_ledger_apply``
+trigger updates ``student_balances`` and ``fee_summary`` in the same
+transaction, so reads here are point lookups or index range scans rather
+than aggregates over the fee history.
+"""
+from datetime import date
+from typing import NamedTuple, Optional
+
+import pandas as pd
+
+from school import archive, db, notify
+from school.writer import queued
+
+INSERT_SQL = """
+    INSERT INTO fee_ledger (student_id, entry_type, amount, entry_date, due_date, description)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+
+class Payment(NamedTuple):
+    student_id: int
+    amount: float
+    paid_on: Optional[date] = None
+    description: Optional[str] = None
+
+
+def record_payment(conn, student_id, amount, paid_on=None, description=None):
+    record_payments(conn, [Payment(student_id, amount, paid_on, description)])
+
+
+@queued
+def record_payments(conn, payments):
+    """Record :class:`Payment` rows in one transaction. Raises ValueError,
+    writing nothing, if any amount is not positive or any date falls in an
+    archived academic year."""
+    today = str(date.today())
+    rows = [(int(student_id), "payment", float(amount), str(paid_on) if paid_on else today, None, description)
+            for student_id, amount, paid_on, description in payments]
+    if any(not amount > 0 for _, _, amount, *_ in rows):
+        raise ValueError("Payment amounts must be positive")
+    closed = archive.archived_through(conn)
+    if closed and rows and min(paid_on for _, _, _, paid_on, *_ in rows) <= closed:
+        raise ValueError(f"Fees up to {closed} have been archived and can no longer be changed")
+    with db.transaction(conn):
+        conn.executemany(INSERT_SQL, rows)
+    return len(rows)
+
+
+@queued
+def add_charge(conn, student_id, amount, due_date=None, description=None, notify_parents=False):
+    """Charge one student. Raises ValueError if the amount is not positive."""
+    if not float(amount) > 0:
+        raise ValueError("Charge amounts must be positive")
+    with db.transaction(conn):
+        entry_id = conn.execute(INSERT_SQL, (int(student_id), "charge", float(amount), str(date.today()),
+                                             str(due_date) if due_date else None, description)).lastrowid
+        if notify_parents:
+            notify.enqueue_charges(conn, [entry_id])
+
+
+@queued
+def charge_class(conn, class_name, section, amount, due_date=None, description=None, notify_parents=False):
+    """Charge every student of a class (and section, unless None) in one
+    transaction, with an SMS to each parent if ``notify_parents``. Returns
+    the number of students charged. Raises ValueError, charging nobody, if
+    the amount is not positive."""
+    if not float(amount) > 0:
+        raise ValueError("Charge amounts must be positive")
+    where, params = "class IS ?", [class_name]
+    if section is not None:
+        where += " AND section IS ?"
+        params.append(section)
+    with db.transaction(conn):
+        cursor = conn.execute(f"""
+            INSERT INTO fee_ledger (student_id, entry_type, amount, entry_date, due_date, description)
+            SELECT id, 'charge', ?, ?, ?, ? FROM students WHERE {where}
+            RETURNING id
+        """, [float(amount), str(date.today()), str(due_date) if due_date else None, description] + params)
+        entry_ids = [entry_id for entry_id, in cursor]
+        if notify_parents:
+            notify.enqueue_charges(conn, entry_ids)
+        return len(entry_ids)
+
+
+def outstanding_total(conn):
+    return conn.execute("SELECT outstanding FROM fee_summary WHERE id = 1").fetchone()[0]
+
+
+def balance(conn, student_id):
+    row = conn.execute("SELECT balance FROM student_balances WHERE student_id = ?",
+                       (int(student_id),)).fetchone()
+    return row[0] if row else 0.0
+
+
+def count_dues(conn, overdue_as_of=None):
+    if overdue_as_of:
+        return conn.execute("SELECT COUNT(*) FROM student_balances WHERE balance > 0 AND oldest_due_date < ?",
+                            (str(overdue_as_of),)).fetchone()[0]
+    return conn.execute("SELECT COUNT(*) FROM student_balances WHERE balance > 0").fetchone()[0]
+
+
+def dues(conn, limit=50, offset=0, overdue_as_of=None):
+    """Students who owe money, largest balance first. With ``overdue_as_of``
+    only those whose oldest unpaid charge was due before that date."""
+    where, params = "b.balance > 0", []
+    if overdue_as_of:
+        where += " AND b.oldest_due_date < ?"
+        params.append(str(overdue_as_of))
+    return pd.read_sql_query(f"""
+        SELECT s.name, s.roll_no, s.class, s.section, b.balance AS due, b.oldest_due_date AS due_since
+        FROM student_balances b JOIN students s ON s.id = b.student_id
+        WHERE {where}
+        ORDER BY b.balance DESC
+        LIMIT ? OFFSET ?
+    """, conn, params=params + [limit, offset])
+
+
+def statement(conn, student_id):
+    """All ledger entries for one student, oldest first, archived years
+    included."""
+    archive.attach(conn)
+    return pd.read_sql_query("""
+        SELECT entry_date, entry_type, amount, due_date, description
+        FROM fee_ledger_all WHERE student_id = ? ORDER BY entry_date, id
+    """, conn, params=(int(student_id),))
@@ -0,0 +1,187 @@
+"""Chunked bulk import of students, attendance and marks from CSV/Excel.
+
+Files are read ``CHUNK_SIZE`` rows at a time. Each chunk is validated and
+normalised with vectorized pandas operations, roll numbers are resolved to
+student ids with one query per chunk, and the good rows are written with
+``executemany`` in one transaction per chunk. Bad rows are reported by line
+number and skipped; they never abort the import.
+"""
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from school import archive, attendance, db, results, students
+
+CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+KINDS = {
+    "students": {
+        "required": ["name", "roll_no"],
+        "optional": ["class", "section", "age", "phone"],
+    },
+    "attendance": {
+        "required": ["roll_no", "date", "status"],
+        "optional": [],
+    },
+    "marks": {
+        "required": ["roll_no", "exam_id", "marks_obtained"],
+        "optional": [],
+    },
+}
+
+
+@dataclass
+class ImportReport:
+    rows_read: int = 0
+    rows_imported: int = 0
+    error_count: int = 0
+    errors: list = field(default_factory=list)  # (line number, message)
+
+    def add_errors(self, lines, message):
+        self.error_count += len(lines)
+        room = MAX_REPORTED_ERRORS - len(self.errors)
+        self.errors.extend((int(line), message) for line in list(lines)[:max(room, 0)])
+
+
+def read_chunks(source, filename=None, chunksize=CHUNK_SIZE):
+    """Yield DataFrames of at most ``chunksize`` rows from a CSV or .xlsx
+    path or file object, with every value read as text."""
+    name = (filename or getattr(source, "name", None) or str(source)).lower()
+    if name.endswith((".xlsx", ".xlsm")):
+        yield from _read_excel_chunks(source, chunksize)
+    else:
+        yield from pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=chunksize)
+
+
+def _read_excel_chunks(source, chunksize):
+    # pandas.read_excel has no chunksize; openpyxl's read-only mode streams
+    # the sheet row by row instead of building the whole workbook.
+    try:
+        from openpyxl import load_workbook
+    except ImportError as exc:
+        raise RuntimeError("Excel import needs openpyxl (pip install openpyxl); upload a CSV instead.") from exc
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(value).strip() if value is not None else "" for value in next(rows, ())]
+        batch = []
+        for row in rows:
+            batch.append(["" if value is None else str(value) for value in row])
+            if len(batch) == chunksize:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+
+def _clean(chunk, kind):
+    columns = KINDS[kind]["required"] + KINDS[kind]["optional"]
+    chunk = chunk.rename(columns=lambda col: str(col).strip().lower().replace(" ", "_"))
+    missing = [col for col in KINDS[kind]["required"] if col not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    for col in columns:
+        if col not in chunk.columns:
+            chunk[col] = ""
+    chunk = chunk[columns].astype(str).apply(lambda col: col.str.strip())
+    if "roll_no" in chunk:
+        chunk["roll_no"] = chunk["roll_no"].str.upper()
+    if "section" in chunk:
+        chunk["section"] = chunk["section"].str.upper()
+    return chunk
+
+
+def _import_students(conn, chunk, report):
+    bad = (chunk["name"] == "") | (chunk["roll_no"] == "")
+    report.add_errors(chunk.index[bad], "Name and Roll No are required")
+    age = pd.to_numeric(chunk["age"].replace("", None), errors="coerce")
+    bad_age = (chunk["age"] != "") & age.isna() & ~bad
+    report.add_errors(chunk.index[bad_age], "Age must be a number")
+    ok = chunk[~bad & ~bad_age].assign(age=age)
+
+    duplicated = ok["roll_no"].duplicated()
+    report.add_errors(ok.index[duplicated], "Roll No repeated in file")
+    ok = ok[~duplicated]
+    existing = ok["roll_no"].isin(students.ids_by_roll_no(conn, ok["roll_no"].tolist()).keys())
+    report.add_errors(ok.index[existing], "Roll No already exists")
+    ok = ok[~existing]
+
+    rows = [
+        (name, roll_no, class_name or None, section or None, None if pd.isna(age) else int(age), phone or None)
+        for name, roll_no, class_name, section, age, phone
+        in ok[["name", "roll_no", "class", "section", "age", "phone"]].itertuples(index=False, name=None)
+    ]
+    conn.executemany(students.INSERT_SQL, rows)
+    return len(rows)
+
+
+def _resolve(conn, chunk, report):
+    ids = chunk["roll_no"].map(students.ids_by_roll_no(conn, chunk["roll_no"].tolist()))
+    report.add_errors(chunk.index[ids.isna()], "Unknown Roll No")
+    return chunk.assign(student_id=ids)[ids.notna()]
+
+
+def _import_attendance(conn, chunk, report):
+    chunk = _resolve(conn, chunk, report)
+    # ISO dates, or day-first dates as written on school registers
+    dates = pd.to_datetime(chunk["date"], errors="coerce", format="%Y-%m-%d")
+    dates = dates.fillna(pd.to_datetime(chunk["date"], errors="coerce", format="mixed", dayfirst=True))
+    status = chunk["status"].str.title()
+    bad_date = dates.isna()
+    bad_status = ~status.isin(attendance.STATUSES) & ~bad_date
+    report.add_errors(chunk.index[bad_date], "Invalid date")
+    report.add_errors(chunk.index[bad_status], f"Status must be one of {', '.join(attendance.STATUSES)}")
+    ok = ~bad_date & ~bad_status
+    closed = archive.archived_through(conn)
+    if closed:
+        archived = ok & (dates.dt.strftime("%Y-%m-%d") <= closed)
+        report.add_errors(chunk.index[archived], f"Attendance up to {closed} is archived")
+        ok &= ~archived
+    rows = list(zip(chunk.loc[ok, "student_id"].astype(int), dates[ok].dt.strftime("%Y-%m-%d"), status[ok]))
+    conn.executemany(attendance.UPSERT_SQL, rows)
+    return len(rows)
+
+
+def _import_marks(conn, chunk, report):
+    chunk = _resolve(conn, chunk, report)
+    exam_ids = pd.to_numeric(chunk["exam_id"], errors="coerce")
+    max_marks = exam_ids.map(dict(conn.execute("SELECT id, COALESCE(max_marks, 100) FROM exams")))
+    marks = pd.to_numeric(chunk["marks_obtained"], errors="coerce")
+    bad_exam = max_marks.isna()
+    bad_marks = ~bad_exam & (marks.isna() | (marks < 0) | (marks > max_marks))
+    fractional = ~bad_exam & ~bad_marks & (marks % 1 != 0)
+    report.add_errors(chunk.index[bad_exam], "Unknown exam_id")
+    report.add_errors(chunk.index[bad_marks], "Marks must be between 0 and the exam's max marks")
+    report.add_errors(chunk.index[fractional], "Marks must be a whole number")
+    ok = ~bad_exam & ~bad_marks & ~fractional
+    rows = list(zip(chunk.loc[ok, "student_id"].astype(int), exam_ids[ok].astype(int), marks[ok].astype(int)))
+    conn.executemany(results.UPSERT_SQL, rows)
+    return len(rows)
+
+
+WRITERS = {
+    "students": _import_students,
+    "attendance": _import_attendance,
+    "marks": _import_marks,
+}
+
+
+def import_file(conn, kind, source, filename=None, chunksize=CHUNK_SIZE, progress=None):
+    """Stream ``source`` into the table for ``kind`` and return an
+    :class:`ImportReport`. ``progress(report)`` is called after each chunk.
+
+    Error line numbers are file line numbers (the header is line 1).
+    """
+    report = ImportReport()
+    for chunk in read_chunks(source, filename, chunksize):
+        chunk.index = range(report.rows_read + 2, report.rows_read + 2 + len(chunk))
+        report.rows_read += len(chunk)
+        chunk = _clean(chunk, kind)
+        with db.transaction(conn):
+            report.rows_imported += WRITERS[kind](conn, chunk, report)
+        if progress:
+            progress(report)
+    return report
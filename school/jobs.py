@@ -0,0 +1,388 @@
+"""Background jobs run by a pool of worker processes.
+
+A job is a row in ``jobs``: a ``kind`` naming one of :data:`HANDLERS`, its
+JSON ``params``, a status, progress, and once it finishes a JSON result or
+an error. :func:`submit` writes the row and hands the id to a
+``ProcessPoolExecutor``. The worker opens its own connection to the same
+database file, claims the row and runs the handler, which reports through
+:meth:`Progress.update`. That is also where cancellation takes effect:
+:func:`cancel` sets a flag and the next update raises :class:`Cancelled`.
+
+Because all state is in the database, a job carries on when the page that
+started it is closed, and any session can watch or cancel it. Files a job
+writes go in :func:`job_dir` and are named in its result.
+
+Workers are started with ``spawn``, so they never inherit the Streamlit
+server's threads or open SQLite connections. A worker's writes (progress,
+the job's own work) go through its own connection; the server's go
+through its writer thread (see :mod:`school.writer`).
+"""
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import types
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import pandas as pd
+
+from school import archive, db, exporter, importer, results, timetable
+from school.writer import queued
+
+WORKERS = int(os.environ.get("SCHOOL_JOB_WORKERS", 0)) or os.cpu_count() or 1  # processes start on demand
+PROGRESS_INTERVAL = 0.5  # seconds between progress writes
+FINISHED = ("done", "failed", "cancelled")
+KEEP_DAYS = 7
+
+_lock = threading.Lock()
+_main_lock = threading.Lock()
+_pool = None
+_started = set()  # database paths recovered by this process
+_futures = {}
+
+
+class Cancelled(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: int
+    kind: str
+    params: dict
+    status: str
+    progress: float
+    message: str
+    result: dict
+    error: str
+    created_at: str
+    started_at: str
+    finished_at: str
+
+    @property
+    def finished(self):
+        return self.status in FINISHED
+
+
+JOB_COLUMNS = "id, kind, params, status, progress, message, result, error, created_at, started_at, finished_at"
+
+
+def _job(row):
+    job = Job(*row)
+    job.params = json.loads(job.params)
+    job.result = json.loads(job.result) if job.result else None
+    return job
+
+
+def _db_path(conn):
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+def job_dir(path):
+    """Where jobs on the database at ``path`` write their files
+    (``SCHOOL_JOB_DIR``, default a ``jobs`` folder beside the database)."""
+    directory = Path(os.environ.get("SCHOOL_JOB_DIR") or Path(path).resolve().parent / "jobs")
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def _output_prefix(path, job_id):
+    # Campus databases can share a job directory, and each numbers its jobs from 1
+    return job_dir(path) / f"{Path(path).stem}_job_{job_id}"
+
+
+class Progress:
+    """Handed to a handler to report progress and write output files."""
+
+    def __init__(self, conn, job_id):
+        self.conn, self.id = conn, job_id
+        self._reported = 0.0
+
+    def update(self, fraction=None, message=None, force=False):
+        """Record progress (0..1) and/or a message, at most every
+        ``PROGRESS_INTERVAL`` seconds unless ``force``. Raises
+        :class:`Cancelled` if the job has been cancelled."""
+        if not force and time.monotonic() - self._reported < PROGRESS_INTERVAL:
+            return
+        self._reported = time.monotonic()
+        with db.transaction(self.conn):
+            cancelled, = self.conn.execute(
+                "UPDATE jobs SET progress = COALESCE(?, progress), message = COALESCE(?, message) "
+                "WHERE id = ? RETURNING cancel_requested",
+                (None if fraction is None else min(max(float(fraction), 0.0), 1.0), message, self.id)).fetchone()
+        if cancelled:
+            raise Cancelled()
+
+    def output(self, suffix):
+        return f"{_output_prefix(_db_path(self.conn), self.id)}{suffix}"
+
+
+# ------------------------------------------------------------------
+# Handlers: (conn, progress, **params) -> JSON-serialisable result
+# ------------------------------------------------------------------
+
+def _report_cards(conn, progress, class_names=None, start=None, end=None):
+    class_names = class_names or results.exam_classes(conn)
+    out = progress.output(".csv")
+    rows = 0
+    for i, class_name in enumerate(class_names):
+        progress.update(i / len(class_names), f"Class {class_name} ({i + 1} of {len(class_names)})")
+        cards = results.report_cards(conn, class_name, start, end)
+        if cards.empty:
+            continue
+        cards.insert(0, "class", class_name)
+        cards.drop(columns="student_id").to_csv(out, mode="a" if rows else "w", header=not rows, index=False)
+        rows += len(cards)
+    if not rows:
+        pd.DataFrame(columns=["class", "roll_no", "name", "section"]).to_csv(out, index=False)
+    return {"file": out, "rows": rows, "classes": len(class_names)}
+
+
+def _export(conn, progress, dataset, fmt, start=None, end=None, class_name=None):
+    out = progress.output(f".{fmt}")
+    rows = exporter.export(dataset, fmt, out, start, end, class_name, path=_db_path(conn),
+                           progress=lambda n: progress.update(message=f"{n} rows written"))
+    return {"file": out, "rows": rows}
+
+
+def _import(conn, progress, dataset, file, filename=None):
+    size = os.path.getsize(file) or 1
+    try:
+        with open(file, "rb") as f:
+            report = importer.import_file(
+                conn, dataset, f, filename or file,
+                progress=lambda r: progress.update(f.tell() / size, f"{r.rows_read} rows read, "
+                                                                     f"{r.rows_imported} imported"))
+    finally:
+        os.remove(file)  # the upload was only kept for this job
+    return asdict(report)
+
+
+def _timetable(conn, progress, sections, days=timetable.SCHOOL_DAYS, periods=timetable.PERIODS_PER_DAY,
+               time_budget=timetable.TIME_BUDGET, seed=0):
+    schedule = timetable.generate(conn, [tuple(s) for s in sections], days, periods, time_budget, seed,
+                                  progress=lambda placed, total: progress.update(
+                                      placed / max(total, 1), f"{placed} of {total} lessons placed"))
+    return {"sections": sections, "schedule": asdict(schedule)}
+
+
+def _archive(conn, progress, year):
+    rows = archive.rollover(conn, year, progress=lambda moved, total: progress.update(
+        moved / max(total, 1), f"{moved} of {total} rows moved"))
+    freed = None
+    if archive.can_compact_online(conn):
+        progress.update(1.0, "Compacting", force=True)
+        freed = archive.compact(conn)
+    return {"year": year, "rows": rows, "freed_pages": freed}
+
+
+def _compact(conn, progress):
+    return {"freed_pages": archive.compact(conn, progress=lambda freed, total: progress.update(
+        freed / max(total, 1), f"{freed} of {total} pages freed"))}
+
+
+HANDLERS = {
+    "report_cards": _report_cards,
+    "export": _export,
+    "import": _import,
+    "timetable": _timetable,
+    "archive": _archive,
+    "compact": _compact,
+}
+
+
+def _finish(conn, job_id, status, message=None, result=None, error=None):
+    with db.transaction(conn):
+        conn.execute("""
+            UPDATE jobs SET status = ?, message = COALESCE(?, message), result = ?, error = ?,
+                            progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END, finished_at = datetime('now')
+            WHERE id = ?
+        """, (status, message, result, error, status, job_id))
+
+
+def _discard_output(path, job_id):
+    prefix = _output_prefix(path, job_id)
+    for partial in prefix.parent.glob(f"{prefix.name}.*"):
+        partial.unlink()
+
+
+def _run(path, job_id):
+    """Worker entry point: claim and run one job."""
+    conn = db.get_connection(path)
+    with db.transaction(conn, immediate=True):
+        row = conn.execute("UPDATE jobs SET status = 'running', started_at = datetime('now') "
+                           "WHERE id = ? AND status = 'queued' RETURNING kind, params", (job_id,)).fetchone()
+    if row is None:
+        return  # cancelled before a worker got to it
+    kind, params = row
+    try:
+        result = HANDLERS[kind](conn, Progress(conn, job_id), **json.loads(params))
+    except Cancelled:
+        _discard_output(path, job_id)
+        _finish(conn, job_id, "cancelled", message="Cancelled")
+    except Exception as exc:
+        traceback.print_exc(file=sys.stderr)
+        _discard_output(path, job_id)
+        _finish(conn, job_id, "failed", error=f"{type(exc).__name__}: {exc}")
+    else:
+        _finish(conn, job_id, "done", message="Finished", result=json.dumps(result, default=str))
+
+
+def _executor(conn):
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        path = _db_path(conn)
+        if path not in _started:  # once per database (campuses share the pool)
+            _started.add(path)
+            _recover(conn)
+            purge(conn)
+        return _pool
+
+
+def start(conn):
+    """Take over the jobs a previous server process left queued or running
+    on ``conn``'s database, and purge old ones. Call it when the server
+    opens the database; later calls do nothing. Worker processes still
+    start on demand."""
+    _executor(conn)
+
+
+@contextmanager
+def _hidden_main():
+    # A spawned worker runs the parent's __main__ again before anything
+    # else. While a page runs, Streamlit's __main__ is the app script, so a
+    # blank module stands in for it while submit may be starting a worker.
+    with _main_lock:
+        main = sys.modules["__main__"]
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            yield
+        finally:
+            sys.modules["__main__"] = main
+
+
+def _send(pool, path, job_id):
+    with _hidden_main():
+        future = pool.submit(_run, path, job_id)
+    _futures[job_id] = future
+    future.add_done_callback(lambda _: _futures.pop(job_id, None))
+
+
+def _recover(conn):
+    # Jobs left behind by a server process that has gone: running ones were
+    # cut off part way and are failed, queued ones are picked up here.
+    rows = conn.execute("SELECT id, status, owner_pid FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+    orphans = [(job_id, status) for job_id, status, pid in rows if pid != os.getpid() and not _alive(pid)]
+    if not orphans:
+        return
+    _adopt(conn, orphans)
+    for job_id, status in orphans:
+        if status == "queued":
+            _send(_pool, _db_path(conn), job_id)
+
+
+@queued
+def _adopt(conn, orphans):
+    with db.transaction(conn):
+        conn.executemany("UPDATE jobs SET status = 'failed', error = 'Interrupted: the server stopped', "
+                         "finished_at = datetime('now') WHERE id = ?",
+                         [(job_id,) for job_id, status in orphans if status == "running"])
+        conn.executemany("UPDATE jobs SET owner_pid = ? WHERE id = ?",
+                         [(os.getpid(), job_id) for job_id, status in orphans if status == "queued"])
+
+
+def _alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def submit(conn, kind, **params):
+    """Queue a ``kind`` job and return its id. ``params`` must be JSON
+    serialisable (dates are sent as ISO strings)."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind {kind!r}")
+    job_id = _create(conn, kind, json.dumps(params, default=str))
+    _send(_executor(conn), _db_path(conn), job_id)
+    return job_id
+
+
+@queued
+def _create(conn, kind, params):
+    with db.transaction(conn):
+        return conn.execute("INSERT INTO jobs (kind, params, owner_pid) VALUES (?, ?, ?)",
+                            (kind, params, os.getpid())).lastrowid
+
+
+def stage_file(conn, data, suffix=""):
+    """Save ``data`` (bytes, e.g. an upload) in the job directory and return
+    its path, for a job to read after the page that received it is gone."""
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="upload_", dir=job_dir(_db_path(conn)))
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
+
+
+@queued
+def cancel(conn, job_id):
+    """Cancel a job: at once if it has not started, otherwise at its next
+    progress report. Returns False if it had already finished."""
+    with db.transaction(conn):
+        if conn.execute("UPDATE jobs SET status = 'cancelled', message = 'Cancelled', finished_at = datetime('now') "
+                        "WHERE id = ? AND status = 'queued'", (int(job_id),)).rowcount:
+            future = _futures.pop(int(job_id), None)
+            if future is not None:
+                future.cancel()
+            return True
+        return bool(conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'",
+                                 (int(job_id),)).rowcount)
+
+
+def get(conn, job_id):
+    row = conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (int(job_id),)).fetchone()
+    if row is None:
+        raise ValueError(f"No job with id {job_id}")
+    return _job(row)
+
+
+def recent(conn, kind=None, limit=5):
+    """The latest jobs, newest first, optionally of one ``kind``."""
+    if kind is None:
+        rows = conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+    else:
+        rows = conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE kind = ? ORDER BY id DESC LIMIT ?", (kind, limit))
+    return [_job(row) for row in rows]
+
+
+def purge(conn, days=KEEP_DAYS):
+    """Delete jobs that finished more than ``days`` ago, and their files.
+    Returns the number deleted."""
+    results = _delete_finished(conn, days)
+    for result in results:
+        file = json.loads(result).get("file") if result else None
+        if file and os.path.exists(file):
+            os.remove(file)
+    return len(results)
+
+
+@queued
+def _delete_finished(conn, days):
+    with db.transaction(conn):
+        return [result for result, in conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed', 'cancelled') "
+                                                   "AND finished_at < datetime('now', ?) RETURNING result",
+                                                   (f"-{int(days)} days",))]
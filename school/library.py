@@ -0,0 +1,202 @@
+"""Library circulation and catalog search.
+
+Issue, return and renew each run in one ``BEGIN IMMEDIATE`` transaction, so
+the loan row and ``books.available_copies`` always move together. The copy
+count is only ever decremented with a guarded ``available_copies > 0``
+update, which means two librarians issuing the last copy at the same time
+cannot both succeed or drive the count negative.
+"""
+from datetime import date, timedelta
+from typing import NamedTuple, Optional
+
+import pandas as pd
+
+from school import db
+from school.students import fts_query
+from school.writer import queued
+
+LOAN_DAYS = 14
+MAX_RENEWALS = 2
+SEARCH_LIMIT = 50
+
+BOOK_INSERT_SQL = "INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)"
+
+LOAN_COLUMNS = """
+    t.id, b.title, b.isbn, s.roll_no, s.name, s.class, s.section,
+    t.issue_date, t.due_date, t.renewals
+"""
+
+
+class Book(NamedTuple):
+    title: str
+    author: Optional[str] = None
+    isbn: Optional[str] = None
+    copies: int = 1
+
+
+@queued
+def add_book(conn, title, author=None, isbn=None, copies=1):
+    with db.transaction(conn):
+        return conn.execute(BOOK_INSERT_SQL, (title, author, isbn or None, int(copies), int(copies))).lastrowid
+
+
+@queued
+def add_books(conn, books):
+    """Add :class:`Book` rows in one transaction; all or none are added.
+    Returns the number added."""
+    rows = [(title, author, isbn or None, int(copies), int(copies)) for title, author, isbn, copies in books]
+    with db.transaction(conn):
+        conn.executemany(BOOK_INSERT_SQL, rows)
+    return len(rows)
+
+
+def search_catalog(conn, term, limit=SEARCH_LIMIT):
+    """Books whose title, author or ISBN prefix-match every word of
+    ``term``, best match first. An empty term lists the catalog by title."""
+    query = fts_query(term or "")
+    if not query:
+        return pd.read_sql_query("SELECT id, title, author, isbn, total_copies, available_copies "
+                                 "FROM books ORDER BY title, id LIMIT ?", conn, params=(limit,))
+    return pd.read_sql_query("""
+        SELECT b.id, b.title, b.author, b.isbn, b.total_copies, b.available_copies
+        FROM books_fts f JOIN books b ON b.id = f.rowid
+        WHERE books_fts MATCH ?
+        ORDER BY f.rank
+        LIMIT ?
+    """, conn, params=(query, limit))
+
+
+@queued
+def issue_book(conn, book_id, student_id, days=LOAN_DAYS, today=None):
+    """Lend one copy of a book. Returns the new loan id; raises ValueError
+    if no copy is available or the student already has this book."""
+    today = today or date.today()
+    with db.transaction(conn, immediate=True):
+        if conn.execute("SELECT 1 FROM library_transactions WHERE student_id = ? AND status = 'Issued' "
+                        "AND book_id = ?", (int(student_id), int(book_id))).fetchone():
+            raise ValueError("Student already has a copy of this book")
+        taken = conn.execute("UPDATE books SET available_copies = available_copies - 1 "
+                             "WHERE id = ? AND available_copies > 0", (int(book_id),)).rowcount
+        if not taken:
+            raise ValueError("No copies available")
+        cursor = conn.execute("""
+            INSERT INTO library_transactions (book_id, student_id, issue_date, due_date, status)
+            VALUES (?, ?, ?, ?, 'Issued')
+        """, (int(book_id), int(student_id), str(today), str(today + timedelta(days=days))))
+        return cursor.lastrowid
+
+
+def _return(conn, loan_id, today):
+    row = conn.execute("UPDATE library_transactions SET status = 'Returned', return_date = ? "
+                       "WHERE id = ? AND status = 'Issued' RETURNING book_id",
+                       (str(today), int(loan_id))).fetchone()
+    if row is None:
+        return False
+    conn.execute("UPDATE books SET available_copies = MIN(available_copies + 1, total_copies) WHERE id = ?",
+                 (row[0],))
+    return True
+
+
+@queued
+def return_book(conn, loan_id, today=None):
+    """Close a loan and put the copy back. Returns False if the loan was
+    already returned."""
+    with db.transaction(conn, immediate=True):
+        return _return(conn, loan_id, today or date.today())
+
+
+@queued
+def return_books(conn, loan_ids, today=None):
+    """Close several loans in one transaction; if any return fails, none
+    are closed. Loans already returned are skipped. Returns the number
+    returned."""
+    today = today or date.today()
+    with db.transaction(conn, immediate=True):
+        return sum(_return(conn, loan_id, today) for loan_id in loan_ids)
+
+
+@queued
+def renew(conn, loan_id, days=LOAN_DAYS, today=None):
+    """Extend an open loan by ``days`` from the later of today and its due
+    date. Raises ValueError once ``MAX_RENEWALS`` is reached."""
+    today = str(today or date.today())
+    with db.transaction(conn, immediate=True):
+        row = conn.execute("SELECT renewals FROM library_transactions WHERE id = ? AND status = 'Issued'",
+                           (int(loan_id),)).fetchone()
+        if row is None:
+            raise ValueError("Loan is not open")
+        if row[0] >= MAX_RENEWALS:
+            raise ValueError(f"Already renewed {MAX_RENEWALS} times")
+        conn.execute("""
+            UPDATE library_transactions
+            SET due_date = date(MAX(COALESCE(due_date, ?), ?), ?), renewals = renewals + 1
+            WHERE id = ?
+        """, (today, today, f"+{int(days)} days", int(loan_id)))
+        return conn.execute("SELECT due_date FROM library_transactions WHERE id = ?",
+                            (int(loan_id),)).fetchone()[0]
+
+
+@queued
+def bulk_return(conn, scans, today=None):
+    """Return a batch of scanned books in one transaction.
+
+    Each scan is an ISBN, optionally followed by the borrower's roll no
+    (``"978-0-00-000000-0 R12"``). Without a roll no the oldest open loan of
+    that book is closed. Returns a DataFrame with one row per scan and its
+    outcome.
+    """
+    today = today or date.today()
+    outcomes = []
+    with db.transaction(conn, immediate=True):
+        for scan in scans:
+            parts = scan.split()
+            if not parts:
+                continue
+            isbn, roll_no = parts[0], (parts[1].upper() if len(parts) > 1 else None)
+            sql = """
+                SELECT t.id FROM library_transactions t JOIN books b ON b.id = t.book_id
+                WHERE b.isbn = ? AND t.status = 'Issued'
+            """
+            params = [isbn]
+            if roll_no:
+                sql += " AND t.student_id = (SELECT id FROM students WHERE roll_no = ?)"
+                params.append(roll_no)
+            row = conn.execute(sql + " ORDER BY t.issue_date, t.id LIMIT 1", params).fetchone()
+            if row is None:
+                outcomes.append((scan.strip(), None, "No open loan"))
+                continue
+            _return(conn, row[0], today)
+            outcomes.append((scan.strip(), row[0], "Returned"))
+    return pd.DataFrame(outcomes, columns=["scan", "loan_id", "result"]).astype({"loan_id": "Int64"})
+
+
+def student_loans(conn, student_id):
+    """Open loans of one student, earliest due first."""
+    return pd.read_sql_query(f"""
+        SELECT {LOAN_COLUMNS}
+        FROM library_transactions t
+        JOIN books b ON b.id = t.book_id
+        JOIN students s ON s.id = t.student_id
+        WHERE t.student_id = ? AND t.status = 'Issued'
+        ORDER BY t.due_date
+    """, conn, params=(int(student_id),))
+
+
+def count_overdue(conn, as_of=None):
+    return conn.execute("SELECT COUNT(*) FROM library_transactions WHERE status = 'Issued' AND due_date < ?",
+                        (str(as_of or date.today()),)).fetchone()[0]
+
+
+def overdue(conn, as_of=None, limit=50, offset=0):
+    """Open loans past their due date, most overdue first. Served by the
+    ``(status, due_date)`` index."""
+    as_of = str(as_of or date.today())
+    return pd.read_sql_query(f"""
+        SELECT {LOAN_COLUMNS}, CAST(julianday(?) - julianday(t.due_date) AS INTEGER) AS days_overdue
+        FROM library_transactions t
+        JOIN books b ON b.id = t.book_id
+        JOIN students s ON s.id = t.student_id
+        WHERE t.status = 'Issued' AND t.due_date < ?
+        ORDER BY t.due_date, t.id
+        LIMIT ? OFFSET ?
+    """, conn, params=(as_of, as_of, limit, offset))
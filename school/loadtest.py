@@ -0,0 +1,224 @@
+"""Concurrent-session write load test.
+
+Simulates ``--sessions`` Streamlit sessions, each a thread on the shared
+connection as in the apps, doing what teachers and the bursar do at the
+same time: saving a class's attendance, recording fee payments, adding
+students (one in ten with a roll no that is already taken), issuing and
+returning books (a shelf of test books is added if the library is
+empty), and reading the dashboard, search and dues lists.
+Reports throughput, per-action latency, how many writes each group commit
+carried, and every unexpected error (``database is locked`` above all).
+
+    python -m school.synthetic --db load.db --scale 0.1
+    python -m school.loadtest --db load.db --sessions 50 --seconds 20
+    python -m school.loadtest --db load.db --direct   # write on the session threads
+    python -m school.loadtest --db north.db south.db  # campuses: sessions split between them
+
+It writes to the database, so run it on a scratch copy. Exits with status
+1 if any action failed unexpectedly.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from school import attendance, dashboard, db, fees, library, students, writer
+
+SESSIONS = 50
+SECONDS = 20.0
+ACTIONS = {  # action: weight
+    "save_attendance": 30,
+    "record_payment": 20,
+    "add_student": 10,
+    "issue_return_book": 10,
+    "read_dashboard": 10,
+    "search_students": 10,
+    "read_dues": 10,
+}
+DUPLICATE_ROLL_RATE = 0.1
+LOAD_BOOKS = 200  # added, with LOAD_COPIES each, if the library is empty
+LOAD_COPIES = 3
+ROSTER_PAGE = 50
+
+
+class _Load:
+    """Data the sessions pick from, read once up front."""
+
+    def __init__(self, conn):
+        self.sections = attendance.class_sections(conn)
+        self.student_ids = [row[0] for row in conn.execute("SELECT id FROM students")]
+        if not conn.execute("SELECT 1 FROM books LIMIT 1").fetchone():
+            library.add_books(conn, [library.Book(f"Load Test Book {n}", copies=LOAD_COPIES)
+                                     for n in range(1, LOAD_BOOKS + 1)])
+        self.book_ids = [row[0] for row in conn.execute("SELECT id FROM books WHERE available_copies > 0")]
+        self.names = [row[0] for row in conn.execute("SELECT DISTINCT substr(name, 1, 3) FROM students LIMIT 200")]
+        if not self.sections or not self.student_ids:
+            raise ValueError("Database has no students; fill it with python -m school.synthetic first")
+
+
+def _save_attendance(conn, load, rng, session):
+    class_name, section = rng.choice(load.sections)
+    day = date.today() - timedelta(days=rng.randrange(5))
+    roster = attendance.load_roster(conn, day, class_name, section, ROSTER_PAGE)
+    statuses = rng.choices(attendance.STATUSES, weights=(90, 7, 3), k=len(roster))
+    attendance.save_attendance(conn, day, zip(roster["id"], statuses))
+
+
+def _record_payment(conn, load, rng, session):
+    fees.record_payment(conn, rng.choice(load.student_ids), rng.choice((500, 1000, 2500)),
+                        description="load test")
+
+
+def _add_student(conn, load, rng, session):
+    taken = session["rolls"]
+    if taken and rng.random() < DUPLICATE_ROLL_RATE:
+        roll_no, expect_duplicate = rng.choice(taken), True
+    else:
+        roll_no, expect_duplicate = f"LT{session['number']:02d}-{len(taken) + 1:05d}-{os.getpid()}", False
+    try:
+        students.add(conn, students.Student(f"Load Test {roll_no}", roll_no, "LT", "A"))
+    except sqlite3.IntegrityError:
+        if not expect_duplicate:
+            raise
+        return "expected"
+    if expect_duplicate:
+        raise AssertionError(f"duplicate roll no {roll_no} was accepted")
+    taken.append(roll_no)
+
+
+def _issue_return_book(conn, load, rng, session):
+    try:
+        loan_id = library.issue_book(conn, rng.choice(load.book_ids), rng.choice(load.student_ids))
+    except ValueError:  # no copy left, or the student already has one
+        return "expected"
+    library.return_book(conn, loan_id)
+
+
+def _read_dashboard(conn, load, rng, session):
+    dashboard.metrics(conn)
+
+
+def _search_students(conn, load, rng, session):
+    students.search_students(conn, rng.choice(load.names))
+
+
+def _read_dues(conn, load, rng, session):
+    fees.dues(conn, 50, 0)
+
+
+RUNNERS = {
+    "save_attendance": _save_attendance,
+    "record_payment": _record_payment,
+    "add_student": _add_student,
+    "issue_return_book": _issue_return_book,
+    "read_dashboard": _read_dashboard,
+    "search_students": _search_students,
+    "read_dues": _read_dues,
+}
+
+
+def run(paths, sessions=SESSIONS, seconds=SECONDS, think_ms=0.0, seed=0):
+    """Run the sessions for ``seconds``, split round-robin between the
+    databases in ``paths`` (one path, or a list of campus databases).
+    Returns ``(per-action DataFrame, unexpected error Counter, wall
+    seconds)``."""
+    paths = [paths] if isinstance(paths, str) else list(paths)
+    shards = [(conn, _Load(conn)) for conn in map(db.get_connection, paths)]
+    timings = defaultdict(list)
+    expected = Counter()
+    errors = Counter()
+    lock = threading.Lock()
+    start = threading.Barrier(sessions + 1)
+    names, weights = list(ACTIONS), list(ACTIONS.values())
+
+    def session(number):
+        rng = random.Random(seed * 1000 + number)
+        state = {"number": number, "rolls": []}
+        conn, load = shards[number % len(shards)]
+        start.wait()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            action = rng.choices(names, weights)[0]
+            began = time.perf_counter()
+            try:
+                outcome = RUNNERS[action](conn, load, rng, state)
+            except Exception as exc:
+                outcome = f"{action}: {type(exc).__name__}: {exc}"
+            ms = 1000 * (time.perf_counter() - began)
+            with lock:
+                timings[action].append(ms)
+                if outcome == "expected":
+                    expected[action] += 1
+                elif outcome:
+                    errors[outcome] += 1
+            if think_ms:
+                time.sleep(rng.uniform(0, 2 * think_ms) / 1000)
+
+    # One of each first, untimed: first calls pay for lazy imports, the
+    # writer thread starting and cold caches
+    warm_up = {"number": sessions, "rolls": []}
+    for conn, load in shards:
+        for action in names:
+            RUNNERS[action](conn, load, random.Random(seed), warm_up)
+
+    threads = [threading.Thread(target=session, args=(n,), name=f"session-{n}") for n in range(sessions)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - began
+
+    rows = []
+    for action in names:
+        ms = np.array(timings[action]) if timings[action] else np.zeros(1)
+        rows.append({"action": action, "count": len(timings[action]),
+                     "per_second": round(len(timings[action]) / wall, 1),
+                     "p50_ms": round(float(np.percentile(ms, 50)), 2),
+                     "p95_ms": round(float(np.percentile(ms, 95)), 2),
+                     "max_ms": round(float(ms.max()), 2),
+                     "expected_errors": expected[action]})
+    return pd.DataFrame(rows), errors, wall
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m school.loadtest", description=__doc__.split("\n")[0])
+    parser.add_argument("--db", nargs="+", default=["load.db"],
+                        help="scratch database(s) to load; sessions are split between them (default: %(default)s)")
+    parser.add_argument("--sessions", type=int, default=SESSIONS, help="concurrent sessions (default: %(default)s)")
+    parser.add_argument("--seconds", type=float, default=SECONDS, help="how long to run (default: %(default)s)")
+    parser.add_argument("--think-ms", type=float, default=0.0,
+                        help="mean pause between a session's actions (default: none)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--direct", action="store_true",
+                        help="write on the session threads instead of through the writer queue")
+    args = parser.parse_args(argv)
+    for path in args.db:
+        if not os.path.exists(path):
+            parser.error(f"{path} does not exist; create it with python -m school.synthetic --db {path}")
+
+    writer.ENABLED = not args.direct
+    report, errors, wall = run(args.db, args.sessions, args.seconds, args.think_ms, args.seed)
+    with pd.option_context("display.width", 200):
+        print(report.to_string(index=False))
+    writes = report.loc[~report["action"].str.startswith(("read", "search")), "count"].sum()
+    print(f"\n{args.sessions} sessions, {wall:.1f}s: {report['count'].sum() / wall:.0f} actions/s, "
+          f"{writes / wall:.0f} writes/s ({'direct' if args.direct else 'writer queue'})")
+    for path, counters in writer.stats().items():
+        print(f"Writer {path}: {counters['requests']} writes in {counters['batches']} commits "
+              f"(mean {counters['mean_batch']} per commit)")
+    for message, n in errors.most_common():
+        print(f"ERROR x{n}: {message}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,641 @@
+"""Versioned schema migrations for school.db.
+
+The apps used to create their own, conflicting, copies of the tables
+(``fees.amount`` vs ``fees.amount_due/amount_paid``, ``results.marks`` vs
+``results.marks_obtained``, ``books.copies`` vs ``books.total_copies`` /
+``available_copies``). Migrations are applied in order, each in its own
+transaction, and recorded in ``schema_version``. Every step checks the
+current shape of the database first, so running them against a database
+created by any of the old apps converges on the same schema.
+"""
+from datetime import datetime
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _rebuild(conn, table, create_sql, select_sql):
+    # SQLite cannot drop or retype columns in place on every version we
+    # support, so copy into a fresh table and swap it in.
+    conn.execute(f"DROP TABLE IF EXISTS {table}_new")
+    conn.execute(create_sql.replace(f"TABLE IF NOT EXISTS {table} ", f"TABLE {table}_new ", 1))
+    conn.execute(f"INSERT INTO {table}_new {select_sql}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+
+# Baseline table definitions (migration 1). Later schema changes belong in
+# new migrations, not here.
+TABLES = {
+    "students": '''CREATE TABLE IF NOT EXISTS students (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        roll_no TEXT NOT NULL UNIQUE,
+        class TEXT,
+        section TEXT,
+        age INTEGER,
+        phone TEXT
+    )''',
+    "teachers": '''CREATE TABLE IF NOT EXISTS teachers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        teacher_id TEXT NOT NULL UNIQUE,
+        subject TEXT,
+        phone TEXT,
+        email TEXT
+    )''',
+    "attendance": '''CREATE TABLE IF NOT EXISTS attendance (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER,
+        date TEXT,
+        status TEXT,
+        FOREIGN KEY(student_id) REFERENCES students(id)
+    )''',
+    "fees": '''CREATE TABLE IF NOT EXISTS fees (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER,
+        amount_due REAL NOT NULL DEFAULT 0,
+        amount_paid REAL NOT NULL DEFAULT 0,
+        payment_date TEXT,
+        status TEXT,
+        FOREIGN KEY(student_id) REFERENCES students(id)
+    )''',
+    "exams": '''CREATE TABLE IF NOT EXISTS exams (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        exam_name TEXT,
+        class TEXT,
+        subject TEXT,
+        max_marks INTEGER DEFAULT 100,
+        date TEXT
+    )''',
+    "results": '''CREATE TABLE IF NOT EXISTS results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER,
+        exam_id INTEGER,
+        marks_obtained INTEGER,
+        FOREIGN KEY(student_id) REFERENCES students(id),
+        FOREIGN KEY(exam_id) REFERENCES exams(id)
+    )''',
+    "books": '''CREATE TABLE IF NOT EXISTS books (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        author TEXT,
+        isbn TEXT UNIQUE,
+        total_copies INTEGER DEFAULT 1,
+        available_copies INTEGER
+    )''',
+    "library_transactions": '''CREATE TABLE IF NOT EXISTS library_transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        book_id INTEGER,
+        student_id INTEGER,
+        issue_date TEXT,
+        return_date TEXT,
+        status TEXT,
+        FOREIGN KEY(book_id) REFERENCES books(id),
+        FOREIGN KEY(student_id) REFERENCES students(id)
+    )''',
+    "timetable": '''CREATE TABLE IF NOT EXISTS timetable (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        class TEXT,
+        day TEXT,
+        period INTEGER,
+        subject TEXT,
+        teacher TEXT
+    )''',
+}
+
+
+def create_base_tables(conn):
+    for statement in TABLES.values():
+        conn.execute(statement)
+
+
+def reconcile_fees(conn):
+    # areeba.py stored a single ``amount``: a payment when status is 'Paid',
+    # an outstanding charge otherwise.
+    if "amount" not in _columns(conn, "fees"):
+        return
+    _rebuild(conn, "fees", TABLES["fees"], """
+        SELECT id, student_id,
+               COALESCE(amount, 0),
+               CASE WHEN status = 'Paid' THEN COALESCE(amount, 0) ELSE 0 END,
+               payment_date, status
+        FROM fees
+    """)
+
+
+def reconcile_exams_results(conn):
+    if "max_marks" not in _columns(conn, "exams"):
+        conn.execute("ALTER TABLE exams ADD COLUMN max_marks INTEGER DEFAULT 100")
+    if "marks" in _columns(conn, "results"):
+        conn.execute("ALTER TABLE results RENAME COLUMN marks TO marks_obtained")
+
+
+def reconcile_books(conn):
+    # SMS.py tracked a single ``copies`` count; treat every copy as on the shelf.
+    if "copies" not in _columns(conn, "books"):
+        return
+    _rebuild(conn, "books", TABLES["books"], """
+        SELECT id, title, author, isbn, COALESCE(copies, 1), COALESCE(copies, 1)
+        FROM books
+    """)
+
+
+def add_hot_path_indexes(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_date_status ON attendance(date, status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_student_date ON attendance(student_id, date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fees_student_status ON fees(student_id, status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_results_exam ON results(exam_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_library_tx_status_return ON library_transactions(status, return_date)")
+
+
+def unique_attendance_per_day(conn):
+    # Re-saving a day used to append rows; keep the latest entry per student.
+    conn.execute("""
+        DELETE FROM attendance
+        WHERE id NOT IN (SELECT MAX(id) FROM attendance GROUP BY student_id, date)
+    """)
+    conn.execute("DROP INDEX IF EXISTS idx_attendance_student_date")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_attendance_student_date ON attendance(student_id, date)")
+
+
+def add_roster_index(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_students_class_section ON students(class, section, roll_no)")
+
+
+def _fts_index(conn, table, columns):
+    # External-content FTS5 index over ``columns`` of ``table``, kept in sync
+    # by triggers. prefix='1 2 3' builds prefix indexes so "ali*" style
+    # queries stay cheap.
+    cols = ", ".join(columns)
+    new_values = ", ".join(f"new.{col}" for col in columns)
+    old_values = ", ".join(f"old.{col}" for col in columns)
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+            {cols},
+            content='{table}', content_rowid='id', prefix='1 2 3'
+        )
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {table}_fts (rowid, {cols}) VALUES (new.id, {new_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {table}_fts ({table}_fts, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {cols} ON {table} BEGIN
+            INSERT INTO {table}_fts ({table}_fts, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {table}_fts (rowid, {cols}) VALUES (new.id, {new_values});
+        END
+    """)
+    conn.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+
+
+def add_student_search_index(conn):
+    _fts_index(conn, "students", ("name", "roll_no", "class", "section", "phone"))
+
+
+def add_list_sort_indexes(conn):
+    # Keep keyset pagination on the common sort columns an index seek.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_students_name ON students(name, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_teachers_name ON teachers(name, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_title ON books(title, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_exams_date ON exams(date, id)")
+
+
+def unique_result_per_exam(conn):
+    # One mark per student per exam, so imports and re-entry can upsert.
+    conn.execute("""
+        DELETE FROM results
+        WHERE id NOT IN (SELECT MAX(id) FROM results GROUP BY exam_id, student_id)
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_results_exam_student ON results(exam_id, student_id)")
+    # Covered by the unique index's leading column
+    conn.execute("DROP INDEX IF EXISTS idx_results_exam")
+
+
+def add_fee_ledger(conn):
+    # Charges and payments are appended to fee_ledger; triggers keep one
+    # balance row per student and a single school-wide summary row in step,
+    # inside the same transaction as the ledger insert.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fee_ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            entry_type TEXT NOT NULL CHECK (entry_type IN ('charge', 'payment')),
+            amount REAL NOT NULL,
+            entry_date TEXT NOT NULL,
+            due_date TEXT,
+            description TEXT,
+            FOREIGN KEY(student_id) REFERENCES students(id)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fee_ledger_student ON fee_ledger(student_id, entry_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fee_ledger_date ON fee_ledger(entry_date)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS student_balances (
+            student_id INTEGER PRIMARY KEY,
+            total_charged REAL NOT NULL DEFAULT 0,
+            total_paid REAL NOT NULL DEFAULT 0,
+            balance REAL NOT NULL DEFAULT 0,
+            oldest_due_date TEXT,
+            last_entry_date TEXT,
+            FOREIGN KEY(student_id) REFERENCES students(id)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_balances_due ON student_balances(balance) WHERE balance > 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_balances_overdue ON student_balances(oldest_due_date) WHERE balance > 0")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fee_summary (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_charged REAL NOT NULL DEFAULT 0,
+            total_paid REAL NOT NULL DEFAULT 0,
+            outstanding REAL NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO fee_summary (id) VALUES (1)")
+    # oldest_due_date is the earliest due date among charges raised since
+    # the student's balance was last cleared.
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS fee_ledger_apply AFTER INSERT ON fee_ledger BEGIN
+            INSERT INTO student_balances (student_id) VALUES (new.student_id)
+            ON CONFLICT(student_id) DO NOTHING;
+            UPDATE fee_summary SET
+                total_charged = total_charged + CASE new.entry_type WHEN 'charge' THEN new.amount ELSE 0 END,
+                total_paid = total_paid + CASE new.entry_type WHEN 'payment' THEN new.amount ELSE 0 END,
+                outstanding = outstanding
+                    - (SELECT MAX(balance, 0) FROM student_balances WHERE student_id = new.student_id)
+                    + (SELECT MAX(balance + CASE new.entry_type WHEN 'charge' THEN new.amount ELSE -new.amount END, 0)
+                       FROM student_balances WHERE student_id = new.student_id)
+            WHERE id = 1;
+            UPDATE student_balances SET
+                total_charged = total_charged + CASE new.entry_type WHEN 'charge' THEN new.amount ELSE 0 END,
+                total_paid = total_paid + CASE new.entry_type WHEN 'payment' THEN new.amount ELSE 0 END,
+                balance = balance + CASE new.entry_type WHEN 'charge' THEN new.amount ELSE -new.amount END,
+                oldest_due_date = CASE
+                    WHEN balance + CASE new.entry_type WHEN 'charge' THEN new.amount ELSE -new.amount END <= 0 THEN NULL
+                    WHEN new.entry_type = 'payment' THEN oldest_due_date
+                    WHEN balance <= 0 OR oldest_due_date IS NULL THEN COALESCE(new.due_date, new.entry_date)
+                    ELSE MIN(oldest_due_date, COALESCE(new.due_date, new.entry_date))
+                END,
+                last_entry_date = new.entry_date
+            WHERE student_id = new.student_id;
+        END
+    """)
+    # Carry over the old fees table: amount_due is a charge, amount_paid a payment
+    conn.execute("""
+        INSERT INTO fee_ledger (student_id, entry_type, amount, entry_date, due_date, description)
+        SELECT student_id, 'charge', amount_due, COALESCE(payment_date, date('now')), payment_date, 'Imported from fees'
+        FROM fees WHERE student_id IS NOT NULL AND amount_due > 0 ORDER BY id
+    """)
+    conn.execute("""
+        INSERT INTO fee_ledger (student_id, entry_type, amount, entry_date, description)
+        SELECT student_id, 'payment', amount_paid, COALESCE(payment_date, date('now')), 'Imported from fees'
+        FROM fees WHERE student_id IS NOT NULL AND amount_paid > 0 ORDER BY id
+    """)
+
+
+def add_exam_results_version(conn):
+    # Bumped on any change to an exam's marks so per-exam result summaries
+    # can be cached until that exam, and only that exam, changes.
+    if "results_version" not in _columns(conn, "exams"):
+        conn.execute("ALTER TABLE exams ADD COLUMN results_version INTEGER NOT NULL DEFAULT 0")
+    for event, row in (("INSERT", "new"), ("UPDATE", "new"), ("DELETE", "old")):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS results_bump_version_{event.lower()} AFTER {event} ON results BEGIN
+                UPDATE exams SET results_version = results_version + 1 WHERE id = {row}.exam_id;
+            END
+        """)
+
+
+# rollup table -> (key columns, key expressions for an attendance row aliased
+# as {row}, whether the key needs the student's class/section)
+ATTENDANCE_ROLLUPS = {
+    "attendance_daily_class": (("date", "class", "section"),
+                               ("{row}.date", "COALESCE(s.class, '')", "COALESCE(s.section, '')")),
+    "attendance_monthly_class": (("month", "class", "section"),
+                                 ("substr({row}.date, 1, 7)", "COALESCE(s.class, '')", "COALESCE(s.section, '')")),
+    "attendance_monthly_student": (("student_id", "month"),
+                                   ("{row}.student_id", "substr({row}.date, 1, 7)")),
+}
+
+
+def _rollup_add(table, row, sign):
+    columns, exprs = ATTENDANCE_ROLLUPS[table]
+    keys = ", ".join(expr.format(row=row) for expr in exprs)
+    counts = ", ".join(f"{sign}({row}.status = '{status}')" for status in ("Present", "Absent", "Late"))
+    updates = ", ".join(f"{col} = {col} + excluded.{col}" for col in ("present", "absent", "late"))
+    return f"""
+        INSERT INTO {table} ({", ".join(columns)}, present, absent, late)
+        SELECT {keys}, {counts} FROM (SELECT 1) LEFT JOIN students s ON s.id = {row}.student_id WHERE true
+        ON CONFLICT({", ".join(columns)}) DO UPDATE SET {updates};
+    """
+
+
+def add_attendance_rollups(conn):
+    # Present/Absent/Late counts per class-section per day and month and
+    # per student per month, kept current by triggers on attendance so
+    # analytics never have to read raw attendance rows.
+    for table, (columns, _) in ATTENDANCE_ROLLUPS.items():
+        key_defs = ", ".join(f"{col} {'INTEGER' if col == 'student_id' else 'TEXT'} NOT NULL" for col in columns)
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                {key_defs},
+                present INTEGER NOT NULL DEFAULT 0,
+                absent INTEGER NOT NULL DEFAULT 0,
+                late INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY ({", ".join(columns)})
+            ) WITHOUT ROWID
+        """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_monthly_student_month ON attendance_monthly_student(month)")
+    adds = "".join(_rollup_add(table, "new", "") for table in ATTENDANCE_ROLLUPS)
+    removes = "".join(_rollup_add(table, "old", "-") for table in ATTENDANCE_ROLLUPS)
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS attendance_rollup_insert AFTER INSERT ON attendance BEGIN {adds} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS attendance_rollup_delete AFTER DELETE ON attendance BEGIN {removes} END")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS attendance_rollup_update
+        AFTER UPDATE OF student_id, date, status ON attendance BEGIN {removes} {adds} END
+    """)
+    rebuild_attendance_rollups(conn)
+
+
+def rebuild_attendance_rollups(conn, source="attendance"):
+    """Recompute every attendance rollup from the raw attendance table (or
+    ``source``, e.g. the ``attendance_all`` view over the archives)."""
+    for table, (columns, exprs) in ATTENDANCE_ROLLUPS.items():
+        keys = ", ".join(expr.format(row="a") for expr in exprs)
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(f"""
+            INSERT INTO {table} ({", ".join(columns)}, present, absent, late)
+            SELECT {keys},
+                   SUM(a.status = 'Present'), SUM(a.status = 'Absent'), SUM(a.status = 'Late')
+            FROM {source} a LEFT JOIN students s ON s.id = a.student_id
+            GROUP BY {keys}
+        """)
+
+
+def add_library_circulation(conn):
+    # due_date is when a loan is due back, return_date when it actually came
+    # back; an open loan has status 'Issued'.
+    columns = _columns(conn, "library_transactions")
+    if "due_date" not in columns:
+        conn.execute("ALTER TABLE library_transactions ADD COLUMN due_date TEXT")
+    if "renewals" not in columns:
+        conn.execute("ALTER TABLE library_transactions ADD COLUMN renewals INTEGER NOT NULL DEFAULT 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_library_tx_overdue ON library_transactions(status, due_date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_library_tx_student ON library_transactions(student_id, status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_library_tx_book ON library_transactions(book_id, status, issue_date)")
+    conn.execute("UPDATE library_transactions SET due_date = date(issue_date, '+14 days') "
+                 "WHERE due_date IS NULL AND status = 'Issued' AND issue_date IS NOT NULL")
+    conn.execute("UPDATE books SET available_copies = total_copies WHERE available_copies IS NULL")
+    _fts_index(conn, "books", ("title", "author", "isbn"))
+
+
+def add_timetable_constraints(conn):
+    # Slots belong to a class *and* section. NULL class/section become ''
+    # (as in the rollups) so the unique slot indexes below can hold, and
+    # where a class or a teacher was double-booked the latest entry wins.
+    if "section" not in _columns(conn, "timetable"):
+        conn.execute("ALTER TABLE timetable ADD COLUMN section TEXT NOT NULL DEFAULT ''")
+    conn.execute("UPDATE timetable SET class = COALESCE(class, ''), section = COALESCE(section, '') "
+                 "WHERE class IS NULL OR section IS NULL")
+    conn.execute("""
+        DELETE FROM timetable
+        WHERE id NOT IN (SELECT MAX(id) FROM timetable GROUP BY class, section, day, period)
+    """)
+    conn.execute("""
+        DELETE FROM timetable
+        WHERE teacher IS NOT NULL AND teacher <> ''
+          AND id NOT IN (SELECT MAX(id) FROM timetable WHERE teacher IS NOT NULL AND teacher <> ''
+                         GROUP BY teacher, day, period)
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_timetable_class_slot ON timetable(class, section, day, period)")
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_timetable_teacher_slot ON timetable(teacher, day, period)
+        WHERE teacher IS NOT NULL AND teacher <> ''
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS subject_periods (
+            class TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            periods_per_week INTEGER NOT NULL CHECK (periods_per_week > 0),
+            PRIMARY KEY (class, subject)
+        ) WITHOUT ROWID
+    """)
+
+
+def add_jobs(conn):
+    # Background jobs (see school/jobs.py). params and result are JSON;
+    # cancel_requested is polled by the worker at each progress report.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL DEFAULT 'queued'
+                CHECK (status IN ('queued', 'running', 'done', 'failed', 'cancelled')),
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            error TEXT,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            owner_pid INTEGER,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            started_at TEXT,
+            finished_at TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_kind ON jobs(kind, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+
+
+def add_archives(conn):
+    # Academic years moved out to archive databases (see school/archive.py).
+    # Attendance moved to an archive stays counted in the rollups: ``moving``
+    # is set only inside the transaction that moves a batch, and the delete
+    # trigger leaves the rollups alone while it is.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archives (
+            year INTEGER PRIMARY KEY,
+            file TEXT NOT NULL,
+            moving INTEGER NOT NULL DEFAULT 0,
+            rows INTEGER NOT NULL DEFAULT 0,
+            started_at TEXT NOT NULL DEFAULT (datetime('now')),
+            finished_at TEXT
+        )
+    """)
+    removes = "".join(_rollup_add(table, "old", "-") for table in ATTENDANCE_ROLLUPS)
+    conn.execute("DROP TRIGGER IF EXISTS attendance_rollup_delete")
+    conn.execute(f"""
+        CREATE TRIGGER attendance_rollup_delete AFTER DELETE ON attendance
+        WHEN NOT EXISTS (SELECT 1 FROM archives WHERE moving) BEGIN {removes} END
+    """)
+
+
+def add_outbox(conn):
+    # Outgoing SMS (see school/notify.py), added in the same transaction as
+    # the write they report. dedup_key makes enqueueing the same notice
+    # twice a no-op; the partial index is what the dispatcher claims from.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY,
+            channel TEXT NOT NULL DEFAULT 'sms',
+            kind TEXT NOT NULL,
+            recipient TEXT NOT NULL,
+            body TEXT NOT NULL,
+            dedup_key TEXT NOT NULL UNIQUE,
+            status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'sending', 'sent', 'failed')),
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TEXT NOT NULL DEFAULT (datetime('now')),
+            gateway_ref TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            sent_at TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(channel, next_attempt_at) "
+                 "WHERE status IN ('pending', 'sending')")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox(status, kind)")
+
+
+def add_student_version(conn):
+    # Bumped on every change to a student row, for optimistic concurrency
+    # when several people edit the student table at once.
+    if "version" not in _columns(conn, "students"):
+        conn.execute("ALTER TABLE students ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS students_bump_version AFTER UPDATE ON students
+        WHEN new.version = old.version BEGIN
+            UPDATE students SET version = version + 1 WHERE id = new.id;
+        END
+    """)
+    # The class rollups key each attendance row by the student's class and
+    # section when it was written. When those change, move the student's
+    # current (unarchived) attendance to the new key, so later updates and
+    # deletes of those rows take their counts from where they were added.
+    moves = []
+    for table, period in (("attendance_daily_class", "date"), ("attendance_monthly_class", "month")):
+        key = "date" if period == "date" else "substr(date, 1, 7)"
+        for row, sign in (("old", "-"), ("new", "")):
+            moves.append(f"""
+                INSERT INTO {table} ({period}, class, section, present, absent, late)
+                SELECT {key}, COALESCE({row}.class, ''), COALESCE({row}.section, ''),
+                       {sign}SUM(status = 'Present'), {sign}SUM(status = 'Absent'), {sign}SUM(status = 'Late')
+                FROM attendance WHERE student_id = new.id GROUP BY {key}
+                ON CONFLICT({period}, class, section) DO UPDATE SET present = present + excluded.present,
+                    absent = absent + excluded.absent, late = late + excluded.late;""")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS students_move_rollups AFTER UPDATE OF class, section ON students
+        WHEN COALESCE(new.class, '') != COALESCE(old.class, '') OR COALESCE(new.section, '') != COALESCE(old.section, '')
+        BEGIN {"".join(moves)} END
+    """)
+
+
+def add_timetable_conflicts(conn):
+    # Lessons taken out of a double-booked slot, for an admin to re-enter or
+    # dismiss from the Timetable page. kept_id is the lesson that kept the
+    # slot.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS timetable_conflicts (
+            id INTEGER PRIMARY KEY,
+            class TEXT,
+            section TEXT,
+            day TEXT,
+            period INTEGER,
+            subject TEXT,
+            teacher TEXT,
+            reason TEXT NOT NULL,
+            kept_id INTEGER,
+            set_aside_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+    """)
+
+
+def drop_legacy_fees(conn):
+    # Migration 11 copied fees into fee_ledger and nothing has read it since
+    conn.execute("DROP INDEX IF EXISTS idx_fees_student_status")
+    conn.execute("DROP TABLE IF EXISTS fees")
+
+
+def add_outbox_student(conn):
+    # Which student a message is about, so deleting a student can drop the
+    # messages not yet sent. Filled in from the dedup keys: absence and
+    # fee_overdue keys start with the student id, fee_charge keys hold the
+    # ledger id.
+    if "student_id" not in _columns(conn, "outbox"):
+        conn.execute("ALTER TABLE outbox ADD COLUMN student_id INTEGER")
+    conn.execute("""
+        UPDATE outbox SET student_id = CASE kind
+            WHEN 'fee_charge' THEN (SELECT student_id FROM fee_ledger
+                                    WHERE id = CAST(substr(dedup_key, length('fee_charge:') + 1) AS INTEGER))
+            ELSE CAST(substr(dedup_key, instr(dedup_key, ':') + 1) AS INTEGER)
+        END
+        WHERE student_id IS NULL
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_student ON outbox(student_id) "
+                 "WHERE status IN ('pending', 'failed')")
+
+
+# (version, name, function) -- append only, never renumber
+MIGRATIONS = [
+    (1, "create base tables", create_base_tables),
+    (2, "reconcile fees amount columns", reconcile_fees),
+    (3, "reconcile exams/results marks columns", reconcile_exams_results),
+    (4, "reconcile books copy counts", reconcile_books),
+    (5, "add hot path indexes", add_hot_path_indexes),
+    (6, "unique attendance per student and day", unique_attendance_per_day),
+    (7, "add class/section roster index", add_roster_index),
+    (8, "add student full-text search index", add_student_search_index),
+    (9, "add list sort indexes", add_list_sort_indexes),
+    (10, "unique result per student and exam", unique_result_per_exam),
+    (11, "add fee ledger and student balances", add_fee_ledger),
+    (12, "track exam results version", add_exam_results_version),
+    (13, "add attendance rollups", add_attendance_rollups),
+    (14, "add library circulation columns and catalog search", add_library_circulation),
+    (15, "add timetable sections, slot constraints and subject periods", add_timetable_constraints),
+    (16, "add background jobs", add_jobs),
+    (17, "add academic year archives", add_archives),
+    (18, "add notification outbox", add_outbox),
+    (19, "track student row version", add_student_version),
+    (20, "add timetable conflicts table", add_timetable_conflicts),
+    (21, "drop legacy fees table", drop_legacy_fees),
+    (22, "track the student of outbox messages", add_outbox_student),
+]
+
+
+def current_version(conn):
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn):
+    """Bring ``conn`` up to the latest schema version; return that version."""
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TEXT NOT NULL
+    )''')
+    conn.commit()
+    if current_version(conn) >= MIGRATIONS[-1][0]:
+        return current_version(conn)
+    for version, name, step in MIGRATIONS:
+        # BEGIN IMMEDIATE takes the write lock up front, so when two
+        # processes start together only one of them applies each step.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if current_version(conn) < version:
+                step(conn)
+                conn.execute("INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                             (version, name, datetime.now().isoformat(timespec="seconds")))
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+    return current_version(conn)
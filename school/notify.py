@@ -0,0 +1,464 @@
+"""SMS to parents through a transactional outbox.
+
+Writes that parents should hear about add ``outbox`` rows in the same
+transaction: :func:`enqueue_absences` from an attendance save,
+:func:`enqueue_charges` from a fee charge, and :func:`remind_overdue` for
+balances past their due date. If the write rolls back, nothing is sent;
+once it commits, the message goes out eventually. The save only pays for
+the inserts, never for a gateway. Each row has a ``dedup_key`` (the
+student and date of an absence, the ledger entry of a charge), so a
+re-saved form or a reminder run twice adds nothing.
+
+:func:`dispatch` drains the outbox on asyncio, one task per channel's
+:class:`Gateway`: claim up to ``batch_size`` due messages, wait for the
+gateway's rate limit, send, record each outcome. A failed message is tried
+again after ``BACKOFF_SECONDS``, doubling each time, and is marked failed
+after ``MAX_ATTEMPTS`` (or at once if the gateway says retrying is
+pointless). A claim is a lease: claimed rows are ``sending`` until
+``LEASE_SECONDS`` have passed, so a dispatcher that dies mid-batch leaves
+them for the next one. Gateways get the outbox id as an idempotency key.
+
+``SCHOOL_SMS_GATEWAY`` picks the SMS gateway: ``file:PATH`` appends the
+messages to a JSON-lines file (the default, ``file:sms_outbox.jsonl``);
+an ``http://`` or ``https://`` URL posts batches to it (see
+:class:`HttpGateway`). ``python -m school.notify stub`` serves such a URL
+locally for testing.
+
+    python -m school.notify dispatch [--once]
+    python -m school.notify remind [--as-of 2026-11-10]
+    python -m school.notify status
+    python -m school.notify retry
+    python -m school.notify stub --port 8025 --fail-rate 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+from collections import Counter
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import pandas as pd
+
+from school import db
+from school.writer import queued
+
+GATEWAY = os.environ.get("SCHOOL_SMS_GATEWAY", "file:sms_outbox.jsonl")
+RATE = float(os.environ.get("SCHOOL_SMS_RATE", 10))  # messages a second, per gateway
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 6
+BACKOFF_SECONDS = 30  # 30s, 1m, 2m, 4m, 8m
+LEASE_SECONDS = 120
+POLL_SECONDS = 5.0
+HTTP_TIMEOUT = 30
+REMIND_EVERY_DAYS = 7
+KEEP_DAYS = 30
+
+HAS_PHONE = "trim(COALESCE(s.phone, '')) != ''"
+
+ABSENCE_SQL = f"""
+    INSERT INTO outbox (kind, recipient, body, dedup_key, student_id)
+    SELECT 'absence', trim(s.phone),
+           printf('%s (%s) was marked absent on %s.', s.name, s.roll_no, :day),
+           printf('absence:%d:%s', s.id, :day), s.id
+    FROM students s
+    WHERE s.id = :student AND {HAS_PHONE}
+    ON CONFLICT(dedup_key) DO NOTHING
+"""
+
+CANCEL_ABSENCE_SQL = "DELETE FROM outbox WHERE dedup_key = ? AND status IN ('pending', 'failed')"
+
+CHARGE_SQL = f"""
+    INSERT INTO outbox (kind, recipient, body, dedup_key, student_id)
+    SELECT 'fee_charge', trim(s.phone),
+           printf('Fee of Rs %.2f%s charged for %s (%s)%s.', f.amount,
+                  CASE WHEN f.description != '' THEN ' (' || f.description || ')' ELSE '' END,
+                  s.name, s.roll_no, CASE WHEN f.due_date IS NOT NULL THEN ', due by ' || f.due_date ELSE '' END),
+           'fee_charge:' || f.id, s.id
+    FROM fee_ledger f JOIN students s ON s.id = f.student_id
+    WHERE f.id = ? AND {HAS_PHONE}
+    ON CONFLICT(dedup_key) DO NOTHING
+"""
+
+# At most one reminder per student, unpaid due date and REMIND_EVERY_DAYS
+REMIND_SQL = f"""
+    INSERT INTO outbox (kind, recipient, body, dedup_key, student_id)
+    SELECT 'fee_overdue', trim(s.phone),
+           printf('Fees of Rs %.2f for %s (%s) are overdue since %s.', b.balance, s.name, s.roll_no,
+                  b.oldest_due_date),
+           printf('fee_overdue:%d:%s:%d', s.id, b.oldest_due_date,
+                  CAST((julianday(:as_of) - julianday(b.oldest_due_date)) / :every AS INTEGER)), s.id
+    FROM student_balances b JOIN students s ON s.id = b.student_id
+    WHERE b.balance > 0 AND b.oldest_due_date < :as_of AND {HAS_PHONE}
+    ON CONFLICT(dedup_key) DO NOTHING
+"""
+
+CLAIM_SQL = """
+    UPDATE outbox SET status = 'sending', attempts = attempts + 1, next_attempt_at = datetime('now', ?)
+    WHERE id IN (SELECT id FROM outbox
+                 WHERE channel = ? AND status IN ('pending', 'sending') AND next_attempt_at <= datetime('now')
+                 ORDER BY next_attempt_at, id LIMIT ?)
+    RETURNING id, recipient, body, attempts
+"""
+
+
+class Message(NamedTuple):
+    id: int
+    recipient: str
+    body: str
+    attempts: int
+
+
+class Receipt(NamedTuple):
+    """A gateway's answer for one message: ``ref`` once sent, or ``error``
+    and whether trying again could help."""
+    id: int
+    ref: Optional[str] = None
+    error: Optional[str] = None
+    retry: bool = True
+
+
+# ------------------------------------------------------------------
+# Enqueueing: call inside the transaction of the write being reported
+# ------------------------------------------------------------------
+
+def enqueue_absences(conn, marks):
+    """Add an absence SMS to the parent of each ``(student_id, date)``.
+    Call it inside the transaction that saves the attendance. Students
+    without a phone number are skipped."""
+    conn.executemany(ABSENCE_SQL, [{"student": int(student_id), "day": str(day)} for student_id, day in marks])
+
+
+def cancel_absences(conn, marks):
+    """Drop the unsent absence SMS of each ``(student_id, date)``, for
+    students re-marked present or late before it went out. Call it inside
+    the transaction that saves the attendance. Messages already being sent
+    are left alone."""
+    conn.executemany(CANCEL_ABSENCE_SQL, [(f"absence:{int(student_id)}:{day}",) for student_id, day in marks])
+
+
+def enqueue_charges(conn, ledger_ids):
+    """Add a fee notice for each charge in ``fee_ledger``, inside the
+    transaction that inserts the charges."""
+    conn.executemany(CHARGE_SQL, [(int(ledger_id),) for ledger_id in ledger_ids])
+
+
+@queued
+def remind_overdue(conn, as_of=None, every=REMIND_EVERY_DAYS):
+    """Add a reminder for every balance whose oldest unpaid charge was due
+    before ``as_of`` (default today), once every ``every`` days per due
+    date. Returns the number of reminders added."""
+    with db.transaction(conn):
+        return conn.execute(REMIND_SQL, {"as_of": str(as_of or date.today()), "every": int(every)}).rowcount
+
+
+# ------------------------------------------------------------------
+# Delivery
+# ------------------------------------------------------------------
+
+@queued
+def claim(conn, channel, limit, lease=LEASE_SECONDS):
+    """Lease up to ``limit`` due messages of ``channel`` for sending."""
+    with db.transaction(conn):
+        rows = conn.execute(CLAIM_SQL, (f"+{int(lease)} seconds", channel, int(limit))).fetchall()
+    return sorted(Message(*row) for row in rows)
+
+
+def backoff(attempts):
+    """Seconds to wait after failed attempt number ``attempts``."""
+    return BACKOFF_SECONDS * 2 ** (attempts - 1)
+
+
+@queued
+def record(conn, messages, receipts):
+    """Store the outcome of sending ``messages``. Returns a Counter of
+    ``sent``, ``retry`` and ``failed``."""
+    attempts = {message.id: message.attempts for message in messages}
+    sent, retry, failed = [], [], []
+    for receipt in receipts:
+        if receipt.id not in attempts:
+            continue
+        if receipt.error is None:
+            sent.append((receipt.ref, receipt.id))
+        elif receipt.retry and attempts[receipt.id] < MAX_ATTEMPTS:
+            retry.append((receipt.error, f"+{backoff(attempts[receipt.id])} seconds", receipt.id))
+        else:
+            failed.append((receipt.error, receipt.id))
+    with db.transaction(conn):
+        conn.executemany("UPDATE outbox SET status = 'sent', gateway_ref = ?, error = NULL, sent_at = datetime('now') "
+                         "WHERE id = ? AND status = 'sending'", sent)
+        conn.executemany("UPDATE outbox SET status = 'pending', error = ?, next_attempt_at = datetime('now', ?) "
+                         "WHERE id = ? AND status = 'sending'", retry)
+        conn.executemany("UPDATE outbox SET status = 'failed', error = ? WHERE id = ? AND status = 'sending'", failed)
+    return Counter(sent=len(sent), retry=len(retry), failed=len(failed))
+
+
+class RateLimiter:
+    """Token bucket: ``rate`` messages a second, in bursts of up to
+    ``burst``."""
+
+    def __init__(self, rate, burst):
+        self.rate, self.burst = float(rate), float(burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    async def acquire(self, n):
+        n = min(n, self.burst)
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= n:
+                self.tokens -= n
+                return
+            await asyncio.sleep((n - self.tokens) / self.rate)
+
+
+class Gateway:
+    """Where a channel's messages go. Subclasses implement :meth:`send`;
+    ``rate`` (messages a second) and ``batch_size`` apply per gateway."""
+
+    def __init__(self, rate=RATE, batch_size=BATCH_SIZE):
+        self.rate, self.batch_size = float(rate), int(batch_size)
+
+    async def send(self, messages):
+        """Send :class:`Message` rows and return a :class:`Receipt` for
+        each. Raising fails (and retries) the whole batch."""
+        raise NotImplementedError
+
+
+class FileGateway(Gateway):
+    """Appends messages to a JSON-lines file instead of sending them."""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = Path(path)
+
+    async def send(self, messages):
+        return await asyncio.to_thread(self._write, messages)
+
+    def _write(self, messages):
+        stamp = datetime.now().isoformat(timespec="seconds")
+        with self.path.open("a", encoding="utf-8") as out:
+            for message in messages:
+                out.write(json.dumps({"id": message.id, "to": message.recipient, "body": message.body,
+                                      "at": stamp}) + "\n")
+        return [Receipt(message.id, ref=f"file:{message.id}") for message in messages]
+
+
+class HttpGateway(Gateway):
+    """POSTs each batch to ``url`` as ``{"messages": [{"id", "to", "body"}]}``
+    and expects ``{"results": [{"id", "ref"}, or {"id", "error", "retry"}]}``.
+    ``id`` is the idempotency key: the gateway only sees an id again when
+    the answer to an earlier attempt was lost."""
+
+    def __init__(self, url, timeout=HTTP_TIMEOUT, **kwargs):
+        super().__init__(**kwargs)
+        self.url, self.timeout = url, timeout
+
+    async def send(self, messages):
+        return await asyncio.to_thread(self._post, messages)
+
+    def _post(self, messages):
+        payload = {"messages": [{"id": m.id, "to": m.recipient, "body": m.body} for m in messages]}
+        request = urllib.request.Request(self.url, json.dumps(payload).encode(),
+                                         {"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            results = {result["id"]: result for result in json.load(response)["results"]}
+        receipts = []
+        for message in messages:
+            result = results.get(message.id)
+            if result is None:
+                receipts.append(Receipt(message.id, error="No result from the gateway"))
+            elif result.get("error"):
+                receipts.append(Receipt(message.id, error=str(result["error"]), retry=bool(result.get("retry", True))))
+            else:
+                receipts.append(Receipt(message.id, ref=str(result.get("ref") or message.id)))
+        return receipts
+
+
+def gateway_from_spec(spec, **kwargs):
+    """A gateway from ``file:PATH`` or an ``http(s)://`` URL."""
+    if spec.startswith("file:"):
+        return FileGateway(spec[len("file:"):], **kwargs)
+    if spec.startswith(("http://", "https://")):
+        return HttpGateway(spec, **kwargs)
+    raise ValueError(f"SCHOOL_SMS_GATEWAY: expected file:PATH or an http(s) URL, got {spec!r}")
+
+
+def configured_gateways():
+    """``{channel: gateway}`` from the environment."""
+    return {"sms": gateway_from_spec(GATEWAY)}
+
+
+async def _drain(conn, channel, gateway, once, poll, progress):
+    limiter = RateLimiter(gateway.rate, gateway.batch_size)
+    totals = Counter()
+    while True:
+        batch = await asyncio.to_thread(claim, conn, channel, gateway.batch_size)
+        if not batch:
+            if once:
+                return totals
+            await asyncio.sleep(poll)
+            continue
+        await limiter.acquire(len(batch))
+        try:
+            receipts = await gateway.send(batch)
+        except Exception as exc:
+            receipts = [Receipt(message.id, error=f"{type(exc).__name__}: {exc}") for message in batch]
+        counts = await asyncio.to_thread(record, conn, batch, receipts)
+        totals.update(counts)
+        if progress:
+            progress(channel, counts)
+
+
+async def dispatch(conn, gateways=None, once=False, poll=POLL_SECONDS, progress=None):
+    """Send due messages through ``gateways`` (default
+    :func:`configured_gateways`), each channel on its own task, calling
+    ``progress(channel, counts)`` after each batch. With ``once``, return
+    when nothing is due (messages waiting out a backoff stay pending);
+    otherwise poll every ``poll`` seconds until cancelled. Returns
+    ``{channel: Counter}`` of sent, retry and failed."""
+    gateways = gateways or configured_gateways()
+    totals = await asyncio.gather(*(_drain(conn, channel, gateway, once, poll, progress)
+                                    for channel, gateway in gateways.items()))
+    return dict(zip(gateways, totals))
+
+
+# ------------------------------------------------------------------
+# Status for the Admin page and the CLI
+# ------------------------------------------------------------------
+
+def summary(conn):
+    """Messages per kind and status."""
+    counts = pd.read_sql_query("SELECT kind, status, COUNT(*) AS messages FROM outbox GROUP BY kind, status", conn)
+    return (counts.pivot_table(index="kind", columns="status", values="messages", fill_value=0)
+            .reindex(columns=["pending", "sending", "sent", "failed"], fill_value=0))
+
+
+def failures(conn, limit=20):
+    """The latest messages that will not be retried."""
+    return pd.read_sql_query("""
+        SELECT id, kind, recipient, body, attempts, error, created_at
+        FROM outbox WHERE status = 'failed' ORDER BY id DESC LIMIT ?
+    """, conn, params=(limit,))
+
+
+@queued
+def retry_failed(conn):
+    """Queue failed messages again, with fresh attempts. Returns how many."""
+    with db.transaction(conn):
+        return conn.execute("UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = datetime('now') "
+                            "WHERE status = 'failed'").rowcount
+
+
+@queued
+def purge(conn, days=KEEP_DAYS):
+    """Delete sent and failed messages older than ``days``. Returns how
+    many."""
+    with db.transaction(conn):
+        return conn.execute("DELETE FROM outbox WHERE status IN ('sent', 'failed') AND created_at < datetime('now', ?)",
+                            (f"-{int(days)} days",)).rowcount
+
+
+# ------------------------------------------------------------------
+# A local HTTP gateway for testing
+# ------------------------------------------------------------------
+
+def serve_stub(port=8025, path="sms_stub.jsonl", fail_rate=0.0, seed=None):
+    """Serve an :class:`HttpGateway` endpoint on localhost that writes
+    messages to ``path``. ``fail_rate`` of the messages get a retryable
+    error. An id it has already accepted gets its first ref back without
+    being written again."""
+    rng = random.Random(seed)
+    accepted = {}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            messages = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["messages"]
+            results = []
+            with lock, open(path, "a", encoding="utf-8") as out:
+                for message in messages:
+                    if message["id"] in accepted:
+                        results.append({"id": message["id"], "ref": accepted[message["id"]]})
+                    elif rng.random() < fail_rate:
+                        results.append({"id": message["id"], "error": "Stub failure", "retry": True})
+                    else:
+                        accepted[message["id"]] = f"stub-{len(accepted) + 1}"
+                        out.write(json.dumps(message) + "\n")
+                        results.append({"id": message["id"], "ref": accepted[message["id"]]})
+            body = json.dumps({"results": results}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"SMS stub on http://127.0.0.1:{port}/ writing to {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m school.notify", description=__doc__.split("\n")[0])
+    parser.add_argument("--db", default=db.DB_PATH, help="database file (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("dispatch", help="send due messages (until interrupted)")
+    command.add_argument("--once", action="store_true", help="stop when nothing is due")
+    command.add_argument("--poll", type=float, default=POLL_SECONDS, help="seconds between polls (default: %(default)s)")
+    command = commands.add_parser("remind", help="queue reminders for overdue fees")
+    command.add_argument("--as-of", type=date.fromisoformat, default=None, help="default: today")
+    commands.add_parser("status", help="messages per kind and status, and the latest failures")
+    commands.add_parser("retry", help="queue failed messages again")
+    command = commands.add_parser("purge", help="delete old sent and failed messages")
+    command.add_argument("--days", type=int, default=KEEP_DAYS)
+    command = commands.add_parser("stub", help="serve a local HTTP gateway for testing")
+    command.add_argument("--port", type=int, default=8025)
+    command.add_argument("--file", default="sms_stub.jsonl", help="where accepted messages go (default: %(default)s)")
+    command.add_argument("--fail-rate", type=float, default=0.0, help="share of messages to fail (default: none)")
+    args = parser.parse_args(argv)
+
+    if args.command == "stub":
+        serve_stub(args.port, args.file, args.fail_rate)
+        return 0
+    conn = db.get_connection(args.db)
+    if args.command == "dispatch":
+        report = lambda channel, counts: print(f"{channel}: {counts['sent']} sent, {counts['retry']} to retry, "
+                                               f"{counts['failed']} failed")
+        try:
+            asyncio.run(dispatch(conn, once=args.once, poll=args.poll, progress=report))
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "remind":
+        print(f"Queued {remind_overdue(conn, args.as_of)} reminder(s)")
+    elif args.command == "status":
+        with pd.option_context("display.width", 200):
+            print(summary(conn).to_string())
+            failed = failures(conn)
+            if not failed.empty:
+                print("\nLatest failures:")
+                print(failed.to_string(index=False))
+    elif args.command == "retry":
+        print(f"Queued {retry_failed(conn)} message(s) again")
+    else:
+        print(f"Deleted {purge(conn, args.days)} message(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,73 @@
+"""Keyset (seek) pagination for list views.
+
+Pages are fetched with ``WHERE (sort_col, id) > (last_sort_value, last_id)``
+instead of ``OFFSET``, so page 500 costs the same as page 1 and only one page
+is ever held in memory.
+"""
+import pandas as pd
+
+from school.cache import VersionedCache
+
+PAGE_SIZES = (25, 50, 100, 250)
+
+_counts = VersionedCache()
+
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def count_rows(conn, table):
+    """``COUNT(*)`` for ``table``, recomputed only after a write."""
+    return _counts.get(conn, table, lambda: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0])
+
+
+def _seek_clause(sort_by, descending, cursor):
+    # NULLs sort first ascending and last descending; spell the comparison
+    # out so rows with a NULL sort value are neither skipped nor repeated.
+    value, last_id = cursor
+    if sort_by == "id":
+        return ("id < ?" if descending else "id > ?"), [last_id]
+    if not descending:
+        if value is None:
+            return f"(({sort_by} IS NULL AND id > ?) OR {sort_by} IS NOT NULL)", [last_id]
+        return f"({sort_by} > ? OR ({sort_by} = ? AND id > ?))", [value, value, last_id]
+    if value is None:
+        return f"({sort_by} IS NULL AND id < ?)", [last_id]
+    return f"({sort_by} < ? OR ({sort_by} = ? AND id < ?) OR {sort_by} IS NULL)", [value, value, last_id]
+
+
+def fetch_page(conn, table, columns, sort_by="id", descending=False, cursor=None, page_size=50):
+    """Fetch one page of ``columns`` from ``table`` ordered by ``sort_by``.
+
+    ``cursor`` is the ``(sort_value, id)`` of the last row of the previous
+    page, or None for the first page. Returns ``(df, next_cursor)`` where
+    ``next_cursor`` is None on the last page. ``id`` is always included in
+    ``df``.
+    """
+    known = set(table_columns(conn, table))
+    unknown = (set(columns) | {sort_by}) - known
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table}: {', '.join(sorted(unknown))}")
+
+    selected = ["id"] + [col for col in columns if col != "id"]
+    direction = "DESC" if descending else "ASC"
+    order = "id " + direction if sort_by == "id" else f"{sort_by} {direction}, id {direction}"
+    where, params = "", []
+    if cursor is not None:
+        clause, params = _seek_clause(sort_by, descending, cursor)
+        where = "WHERE " + clause
+
+    # One extra row tells us whether there is a next page
+    df = pd.read_sql_query(
+        f"SELECT {', '.join(selected)} FROM {table} {where} ORDER BY {order} LIMIT ?",
+        conn, params=params + [page_size + 1],
+    )
+    next_cursor = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        last = df.iloc[-1]
+        value = last[sort_by]
+        next_cursor = (None if pd.isna(value) else value.item() if hasattr(value, "item") else value,
+                       int(last["id"]))
+    return df, next_cursor
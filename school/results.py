@@ -0,0 +1,189 @@
+"""Exam marks entry and vectorized result analysis.
+
+Marks for a whole exam are loaded and written as one batch, and totals,
+percentages, grades, ranks and percentiles are computed with pandas/NumPy
+over the whole cohort at once. Exam summaries are cached per exam and
+dropped when that exam's ``results_version`` moves (see migration 12).
+"""
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from school import db
+from school.cache import LRUCache
+from school.writer import queued
+
+EXAM_INSERT_SQL = "INSERT INTO exams (exam_name, class, subject, max_marks, date) VALUES (?, ?, ?, ?, ?)"
+
+UPSERT_SQL = """
+    INSERT INTO results (student_id, exam_id, marks_obtained) VALUES (?, ?, ?)
+    ON CONFLICT(exam_id, student_id) DO UPDATE SET marks_obtained = excluded.marks_obtained
+    WHERE results.marks_obtained IS NOT excluded.marks_obtained
+"""
+
+# (minimum percentage, grade), highest first
+GRADES = [(90, "A+"), (80, "A"), (70, "B"), (60, "C"), (50, "D"), (40, "E"), (0, "F")]
+PASS_PERCENT = 40
+
+_summaries = LRUCache(maxsize=64)
+
+
+class Exam(NamedTuple):
+    exam_name: str
+    class_name: Optional[str] = None
+    subject: Optional[str] = None
+    max_marks: int = 100
+    date: Optional[str] = None
+    id: Optional[int] = None
+
+
+def grade(percent):
+    """Vectorized letter grade for a Series of percentages (NaN -> None)."""
+    conditions = [percent >= cutoff for cutoff, _ in GRADES]
+    grades = np.select(conditions, [letter for _, letter in GRADES], default=None)
+    return pd.Series(grades, index=percent.index).where(percent.notna())
+
+
+@queued
+def create_exam(conn, exam):
+    """Insert one :class:`Exam` and return its id."""
+    if exam.max_marks is not None and exam.max_marks <= 0:
+        raise ValueError("Max marks must be positive")
+    with db.transaction(conn):
+        return conn.execute(EXAM_INSERT_SQL, (exam.exam_name, exam.class_name, exam.subject, exam.max_marks,
+                                              str(exam.date) if exam.date else None)).lastrowid
+
+
+def list_exams(conn):
+    """Every exam, latest first."""
+    return pd.read_sql_query("SELECT id, exam_name, class, subject, max_marks, date FROM exams "
+                             "ORDER BY date DESC, id DESC", conn)
+
+
+def exam_classes(conn):
+    return [row[0] for row in conn.execute("SELECT DISTINCT class FROM exams WHERE class IS NOT NULL ORDER BY class")]
+
+
+def get_exam(conn, exam_id):
+    row = conn.execute("SELECT id, exam_name, class, subject, COALESCE(max_marks, 100), date, results_version "
+                       "FROM exams WHERE id = ?", (int(exam_id),)).fetchone()
+    if row is None:
+        raise ValueError(f"No exam with id {exam_id}")
+    return dict(zip(("id", "exam_name", "class", "subject", "max_marks", "date", "results_version"), row))
+
+
+def marks_sheet(conn, exam_id, section=None):
+    """Students of the exam's class (optionally one section) with their
+    saved marks, ready for grid entry."""
+    exam = get_exam(conn, exam_id)
+    where, params = "s.class IS ?", [exam["class"]]
+    if section is not None:
+        where += " AND s.section IS ?"
+        params.append(section)
+    return pd.read_sql_query(f"""
+        SELECT s.id AS student_id, s.roll_no, s.name, s.section, r.marks_obtained
+        FROM students s
+        LEFT JOIN results r ON r.student_id = s.id AND r.exam_id = ?
+        WHERE {where}
+        ORDER BY s.section, s.roll_no
+    """, conn, params=[int(exam_id)] + params)
+
+
+def changed_marks(sheet, marks):
+    """``(student_id, marks)`` pairs where ``marks`` (aligned with ``sheet``)
+    differs from what is saved. Blank cells are never written."""
+    saved = sheet["marks_obtained"]
+    mask = marks.notna() & (saved.isna() | marks.ne(saved))
+    return list(zip(sheet.loc[mask, "student_id"].astype(int), marks[mask].astype(int)))
+
+
+@queued
+def save_marks(conn, exam_id, marks):
+    """Upsert ``(student_id, marks)`` pairs for one exam in a single
+    transaction. Raises ValueError if any mark is outside 0..max_marks."""
+    exam = get_exam(conn, exam_id)
+    rows = [(int(student_id), int(exam_id), int(mark)) for student_id, mark in marks]
+    out_of_range = [mark for _, _, mark in rows if not 0 <= mark <= exam["max_marks"]]
+    if out_of_range:
+        raise ValueError(f"Marks must be between 0 and {exam['max_marks']}")
+    with db.transaction(conn):
+        conn.executemany(UPSERT_SQL, rows)
+    return len(rows)
+
+
+def _rank(df, by, within):
+    ranks = df.groupby(within, dropna=False)[by].rank(method="min", ascending=False)
+    return ranks.astype("Int64")
+
+
+def exam_summary(conn, exam_id):
+    """Per-student marks, percentage, grade, class and section rank and
+    percentile for one exam. Cached until the exam's marks change."""
+    exam = get_exam(conn, exam_id)
+
+    def compute():
+        df = pd.read_sql_query("""
+            SELECT s.roll_no, s.name, s.class, s.section, r.marks_obtained
+            FROM results r JOIN students s ON s.id = r.student_id
+            WHERE r.exam_id = ?
+        """, conn, params=(int(exam_id),))
+        df["percent"] = (100 * df["marks_obtained"] / exam["max_marks"]).round(2)
+        df["grade"] = grade(df["percent"])
+        df["class_rank"] = _rank(df, "percent", "class")
+        df["section_rank"] = _rank(df, "percent", ["class", "section"])
+        df["percentile"] = (100 * df.groupby("class", dropna=False)["percent"].rank(pct=True, method="max")).round(1)
+        return df.sort_values(["class_rank", "roll_no"], ignore_index=True)
+
+    return _summaries.get((id(conn), int(exam_id), exam["results_version"]), compute)
+
+
+def exam_stats(summary):
+    """Headline numbers for an :func:`exam_summary` frame."""
+    percent = summary["percent"]
+    if percent.empty:
+        return {"students": 0, "mean": 0.0, "median": 0.0, "highest": 0.0, "pass_rate": 0.0}
+    return {
+        "students": len(summary),
+        "mean": round(float(percent.mean()), 1),
+        "median": round(float(percent.median()), 1),
+        "highest": round(float(percent.max()), 1),
+        "pass_rate": round(100 * float((percent >= PASS_PERCENT).mean()), 1),
+    }
+
+
+def report_cards(conn, class_name, start=None, end=None):
+    """One row per student of ``class_name`` covering every exam dated in
+    ``start``..``end``: per-subject percentages, overall total and
+    percentage, grade and class rank."""
+    where, params = "e.class IS ?", [class_name]
+    if start:
+        where += " AND e.date >= ?"
+        params.append(str(start))
+    if end:
+        where += " AND e.date <= ?"
+        params.append(str(end))
+    df = pd.read_sql_query(f"""
+        SELECT s.id AS student_id, s.roll_no, s.name, s.section,
+               COALESCE(e.subject, e.exam_name) AS subject,
+               r.marks_obtained, COALESCE(e.max_marks, 100) AS max_marks
+        FROM results r
+        JOIN exams e ON e.id = r.exam_id
+        JOIN students s ON s.id = r.student_id
+        WHERE {where}
+    """, conn, params=params)
+    if df.empty:
+        return df
+
+    df["section"] = df["section"].fillna("")  # NaN group keys would be dropped
+    keys = ["student_id", "roll_no", "name", "section"]
+    totals = df.groupby(keys)[["marks_obtained", "max_marks"]].sum()
+    by_subject = df.pivot_table(index=keys, columns="subject", values=["marks_obtained", "max_marks"],
+                                aggfunc="sum")
+    subject_pct = (100 * by_subject["marks_obtained"] / by_subject["max_marks"]).round(1)
+
+    cards = subject_pct.join(totals.rename(columns={"marks_obtained": "total", "max_marks": "out_of"}))
+    cards["percent"] = (100 * cards["total"] / cards["out_of"]).round(2)
+    cards["grade"] = grade(cards["percent"])
+    cards["class_rank"] = cards["percent"].rank(method="min", ascending=False).astype("Int64")
+    return cards.reset_index().sort_values(["class_rank", "roll_no"], ignore_index=True)
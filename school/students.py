@@ -0,0 +1,262 @@
+"""Student records and search."""
+from collections import Counter, defaultdict
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from school import db
+from school.writer import queued
+
+SEARCH_PAGE_SIZE = 50
+
+INSERT_SQL = "INSERT INTO students (name, roll_no, class, section, age, phone) VALUES (?, ?, ?, ?, ?, ?)"
+EDITABLE = ("name", "roll_no", "class", "section", "age", "phone")
+REQUIRED = ("name", "roll_no")
+
+
+class Student(NamedTuple):
+    name: str
+    roll_no: str
+    class_name: Optional[str] = None
+    section: Optional[str] = None
+    age: Optional[int] = None
+    phone: Optional[str] = None
+    id: Optional[int] = None
+
+
+@queued
+def add(conn, student):
+    """Insert one :class:`Student` and return its id. Raises
+    sqlite3.IntegrityError if the roll no is taken."""
+    with db.transaction(conn):
+        return conn.execute(INSERT_SQL, student[:6]).lastrowid
+
+
+@queued
+def add_many(conn, students):
+    """Insert :class:`Student` rows in one transaction; all or none are
+    added. Returns the number added."""
+    rows = [student[:6] for student in students]
+    with db.transaction(conn):
+        conn.executemany(INSERT_SQL, rows)
+    return len(rows)
+
+
+def get_by_roll_no(conn, roll_no):
+    row = conn.execute("SELECT name, roll_no, class, section, age, phone, id FROM students WHERE roll_no = ?",
+                       (roll_no,)).fetchone()
+    return Student(*row) if row else None
+
+
+def ids_by_roll_no(conn, roll_nos):
+    """``{roll_no: id}`` for those of ``roll_nos`` that exist."""
+    roll_nos = list(dict.fromkeys(roll_nos))
+    ids = {}
+    # Stay well under SQLite's bound-parameter limit
+    for start in range(0, len(roll_nos), 900):
+        batch = roll_nos[start:start + 900]
+        placeholders = ", ".join("?" * len(batch))
+        ids.update(conn.execute(f"SELECT roll_no, id FROM students WHERE roll_no IN ({placeholders})", batch))
+    return ids
+
+
+class Edit(NamedTuple):
+    id: int
+    version: int  # the row's version when it was loaded
+    changes: dict  # column -> new value
+
+
+class EditConflict(ValueError):
+    """Edits that cannot be saved. Nothing was written; ``conflicts`` holds
+    ``(student id, reason)`` pairs."""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__(f"{len(conflicts)} row(s) could not be saved")
+
+
+def _clean(column, values):
+    # Nullable, so a blank compares equal to a blank
+    if column == "age":
+        return np.trunc(pd.to_numeric(values, errors="coerce")).astype("Int64")
+    text = values.astype("string").str.strip()
+    if column in ("roll_no", "section"):
+        text = text.str.upper()
+    return text.replace("", pd.NA)
+
+
+def diff_edits(original, edited):
+    """:class:`Edit` rows for the cells that differ between ``original``
+    (rows as loaded, with ``id`` and ``version``) and ``edited`` (the same
+    rows after editing). Text is stripped, roll no and section upper-cased
+    and blanks become NULL before comparing."""
+    # Only cells whose raw value changed can differ once cleaned, so the
+    # cleaning runs on just those rows and columns
+    columns = [column for column in EDITABLE if column in edited]
+    before, now = original.loc[edited.index, columns].to_numpy(object), edited[columns].to_numpy(object)
+    touched = (before != now) & ~(pd.isna(before) & pd.isna(now))
+    rows, touched_columns = touched.any(axis=1), touched.any(axis=0)
+    if not rows.any():
+        return []
+    original, edited = original.loc[edited.index[rows]], edited[rows]
+    columns = [column for column, hit in zip(columns, touched_columns) if hit]
+    after, changed = [], []
+    for column in columns:
+        old, new = _clean(column, original[column]), _clean(column, edited[column])
+        after.append(new.astype(object).where(new.notna(), None).tolist())
+        changed.append((new.ne(old).fillna(False).astype(bool) | (new.isna() != old.isna())).to_numpy())
+    changed = np.column_stack(changed)
+    ids, versions = original["id"].tolist(), original["version"].tolist()
+    edits = []
+    for row in np.flatnonzero(changed.any(axis=1)):
+        edits.append(Edit(int(ids[row]), int(versions[row]),
+                          {column: after[i][row] for i, column in enumerate(columns) if changed[row, i]}))
+    return edits
+
+
+@queued
+def save_edits(conn, edits):
+    """Apply :class:`Edit` rows in one transaction, one batched UPDATE per
+    set of changed columns. Raises :class:`EditConflict`, writing nothing,
+    if a row was changed or deleted since it was loaded, a required field
+    was blanked, or a roll no would be taken twice. Returns the number of
+    rows updated."""
+    if not edits:
+        return 0
+    conflicts = [(edit.id, "Name and Roll No are required")
+                 for edit in edits if any(column in edit.changes and edit.changes[column] is None for column in REQUIRED)]
+    with db.transaction(conn):
+        versions = {}
+        ids = [edit.id for edit in edits]
+        for start in range(0, len(ids), 900):
+            batch = ids[start:start + 900]
+            versions.update(conn.execute(f"SELECT id, version FROM students WHERE id IN ({', '.join('?' * len(batch))})",
+                                         batch))
+        for edit in edits:
+            if edit.id not in versions:
+                conflicts.append((edit.id, "Deleted by someone else"))
+            elif versions[edit.id] != edit.version:
+                conflicts.append((edit.id, "Changed by someone else since it was loaded"))
+
+        # Roll nos are checked against the rows' final state, so two edited
+        # rows may swap theirs
+        new_rolls = {edit.id: edit.changes["roll_no"] for edit in edits if edit.changes.get("roll_no")}
+        repeated = Counter(new_rolls.values())
+        owners = ids_by_roll_no(conn, new_rolls.values())
+        moving = []
+        for student_id, roll_no in new_rolls.items():
+            owner = owners.get(roll_no)
+            if repeated[roll_no] > 1:
+                conflicts.append((student_id, f"Roll No {roll_no} is given to more than one row"))
+            elif owner not in (None, student_id):
+                if owner in new_rolls:
+                    moving.append(student_id)
+                else:
+                    conflicts.append((student_id, f"Roll No {roll_no} is already taken"))
+        if conflicts:
+            raise EditConflict(conflicts)
+        # A roll no passed from one edited row to another would collide half
+        # way through, so the rows giving theirs up let go of it first
+        # (which bumps their version once more)
+        released = {owners[new_rolls[student_id]] for student_id in moving}
+        conn.executemany("UPDATE students SET roll_no = '~' || id WHERE id = ?", [(owner,) for owner in released])
+
+        groups = defaultdict(list)
+        for edit in edits:
+            columns = tuple(column for column in EDITABLE if column in edit.changes)
+            version = edit.version + (edit.id in released)
+            groups[columns].append([edit.changes[column] for column in columns] + [edit.id, version])
+        updated = 0
+        for columns, rows in groups.items():
+            assignments = ", ".join(f"{column} = ?" for column in columns)
+            updated += conn.executemany(f"UPDATE students SET {assignments} WHERE id = ? AND version = ?",
+                                        rows).rowcount
+        if updated != len(edits):  # only if a version moved under us after the check
+            raise EditConflict([(edit.id, "Changed by someone else since it was loaded") for edit in edits])
+    return updated
+
+
+def delete(conn, student_id):
+    return delete_many(conn, [student_id])
+
+
+@queued
+def delete_many(conn, student_ids):
+    """Delete students with their attendance, fee ledger, results, returned
+    library loans and unsent SMS, in one transaction. Balances and the fee
+    summary are adjusted, and the attendance rollups by their triggers.
+    Years already archived (see :mod:`school.archive`) are left alone.
+    Raises ValueError, deleting nothing, if any of the students still has a
+    book out. Returns the number of students deleted."""
+    ids = [int(student_id) for student_id in dict.fromkeys(student_ids)]
+    deleted = 0
+    with db.transaction(conn):
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(ids), 900):
+            batch = ids[start:start + 900]
+            among = f"student_id IN ({', '.join('?' * len(batch))})"
+            borrowers = [roll_no for roll_no, in conn.execute(
+                f"SELECT DISTINCT s.roll_no FROM library_transactions t JOIN students s ON s.id = t.student_id "
+                f"WHERE t.{among} AND t.status = 'Issued'", batch)]
+            if borrowers:
+                raise ValueError(f"Return their library books first: {', '.join(sorted(borrowers))}")
+            charged, paid, owed = conn.execute(
+                f"SELECT COALESCE(SUM(total_charged), 0), COALESCE(SUM(total_paid), 0), "
+                f"COALESCE(SUM(MAX(balance, 0)), 0) FROM student_balances WHERE {among}", batch).fetchone()
+            conn.execute("UPDATE fee_summary SET total_charged = total_charged - ?, total_paid = total_paid - ?, "
+                         "outstanding = outstanding - ? WHERE id = 1", (charged, paid, owed))
+            # Attendance goes first: the rollup triggers look up the student's class
+            for table in ("attendance", "attendance_monthly_student", "student_balances", "fee_ledger", "results",
+                          "library_transactions"):
+                conn.execute(f"DELETE FROM {table} WHERE {among}", batch)
+            conn.execute(f"DELETE FROM outbox WHERE {among} AND status IN ('pending', 'failed')", batch)
+            deleted += conn.execute(f"DELETE FROM students WHERE id IN ({', '.join('?' * len(batch))})",
+                                    batch).rowcount
+    return deleted
+
+
+def directory(conn):
+    """``id, name, roll_no`` of every student, for pickers."""
+    return pd.read_sql_query("SELECT id, name, roll_no FROM students ORDER BY name, roll_no", conn)
+
+
+def classes(conn):
+    return [row[0] for row in conn.execute("SELECT DISTINCT class FROM students WHERE class IS NOT NULL ORDER BY class")]
+
+
+COLUMNS = "s.id, s.name, s.roll_no, s.class, s.section, s.age, s.phone, s.version"
+
+
+def fts_query(term):
+    """Turn free text into an FTS5 query that prefix-matches every word."""
+    words = term.replace('"', " ").split()
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def count_matches(conn, term):
+    query = fts_query(term or "")
+    if not query:
+        return conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+    return conn.execute("SELECT COUNT(*) FROM students_fts WHERE students_fts MATCH ?",
+                        (query,)).fetchone()[0]
+
+
+def search_students(conn, term, page=1, page_size=SEARCH_PAGE_SIZE):
+    """One page of students matching ``term``.
+
+    Matches are ranked by relevance (bm25) and prefix-matched against name,
+    roll no, class, section and phone. An empty term lists all students.
+    """
+    offset = (page - 1) * page_size
+    query = fts_query(term or "")
+    if not query:
+        return pd.read_sql_query(f"SELECT {COLUMNS} FROM students s ORDER BY s.id LIMIT ? OFFSET ?",
+                                 conn, params=(page_size, offset))
+    return pd.read_sql_query(f"""
+        SELECT {COLUMNS}
+        FROM students_fts f JOIN students s ON s.id = f.rowid
+        WHERE students_fts MATCH ?
+        ORDER BY f.rank
+        LIMIT ? OFFSET ?
+    """, conn, params=(query, page_size, offset))
@@ -0,0 +1,218 @@
+"""Seeded synthetic school data for load testing and benchmarks.
+
+At ``scale=1`` this writes about 10k students in 12 classes, 500 teachers,
+3M attendance rows (300 school days), a year of fee charges and payments,
+three terms of exams with results for every subject, 5k books with 20k
+loans, and a generated timetable. The same seed always produces the same
+school relative to ``today``. Rows go in through the normal schema, so the
+FTS, ledger, results-version and rollup triggers all fire.
+
+    python -m school.synthetic --db bench.db --scale 1
+"""
+import argparse
+import math
+import os
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from school import attendance, db, fees, library, results, students, teachers, timetable
+
+STUDENTS = 10_000
+TEACHERS = 500
+SCHOOL_DAYS = 300
+BOOKS = 5_000
+LOANS = 20_000
+CLASSES = [str(n) for n in range(1, 13)]
+CLASS_SIZE = 40
+MONTHLY_FEE = 2500.0
+
+# subject: periods per week (38 of a 40-period week)
+SUBJECTS = {"English": 6, "Maths": 7, "Science": 6, "Urdu": 5, "Social Studies": 4,
+            "Computer": 3, "Islamiat": 3, "Art": 2, "PE": 2}
+TERMS = ("Term 1", "Mid Term", "Final")
+
+FIRST_NAMES = ["Ali", "Ahmed", "Ayesha", "Fatima", "Hassan", "Hina", "Bilal", "Sana", "Usman", "Zainab",
+               "Omar", "Maryam", "Hamza", "Areeba", "Imran", "Noor", "Rahul", "Priya", "Arjun", "Ananya",
+               "Saad", "Mahnoor", "Danish", "Iqra", "Farhan", "Alishba", "Kashif", "Rabia", "Yusuf", "Sara"]
+LAST_NAMES = ["Khan", "Ahmed", "Malik", "Sheikh", "Qureshi", "Siddiqui", "Butt", "Chaudhry", "Raza", "Hussain",
+              "Sharma", "Patel", "Iqbal", "Mirza", "Javed", "Baig", "Aslam", "Rana", "Naqvi", "Zaidi"]
+TITLE_WORDS = ["History", "Garden", "Secret", "River", "Science", "Stars", "Journey", "Kingdom", "Numbers",
+               "Silent", "Golden", "Ocean", "Mountain", "Letters", "Island", "Machines", "Colours", "Night"]
+
+
+def _scaled(n, scale):
+    return max(1, int(round(n * scale)))
+
+
+def _school_days(today, n):
+    days, day = [], today
+    while len(days) < n:
+        if day.weekday() < 5:
+            days.append(day)
+        day -= timedelta(days=1)
+    return days[::-1]
+
+
+def _names(rng, n):
+    first = rng.choice(FIRST_NAMES, n)
+    last = rng.choice(LAST_NAMES, n)
+    return [f"{a} {b}" for a, b in zip(first, last)]
+
+
+def _students(conn, rng, n):
+    sections_per_class = min(26, max(1, math.ceil(n / len(CLASSES) / CLASS_SIZE)))
+    sections = [chr(ord("A") + i) for i in range(sections_per_class)]
+    class_idx = np.arange(n) * len(CLASSES) // n
+    rows = [(name, f"R{i + 1:05d}", CLASSES[c], sections[i % sections_per_class], 5 + int(c),
+             f"03{rng.integers(0, 10**9):09d}")
+            for i, (name, c) in enumerate(zip(_names(rng, n), class_idx))]
+    with db.transaction(conn):
+        conn.executemany(students.INSERT_SQL, rows)
+    return [(CLASSES[c], sections[i % sections_per_class]) for i, c in enumerate(class_idx)]
+
+
+def _teachers(conn, rng, n):
+    subjects = list(SUBJECTS)
+    weights = np.array(list(SUBJECTS.values()), dtype=float)
+    picks = rng.choice(len(subjects), n, p=weights / weights.sum())
+    rows = [(name, f"T{i + 1:04d}", subjects[s], f"03{rng.integers(0, 10**9):09d}", f"t{i + 1:04d}@school.edu")
+            for i, (name, s) in enumerate(zip(_names(rng, n), picks))]
+    with db.transaction(conn):
+        conn.executemany(teachers.INSERT_SQL, rows)
+
+
+def _attendance(conn, rng, student_ids, days, progress):
+    # Each student has their own absence rate; a few are chronically absent
+    absent_rate = rng.beta(1.2, 20, len(student_ids))
+    late_rate = rng.beta(1, 40, len(student_ids))
+    for start in range(0, len(days), 20):
+        with db.transaction(conn):
+            for day in days[start:start + 20]:
+                roll = rng.random(len(student_ids))
+                status = np.where(roll < absent_rate, "Absent",
+                                  np.where(roll < absent_rate + late_rate, "Late", "Present"))
+                conn.executemany("INSERT INTO attendance (student_id, date, status) VALUES (?, ?, ?)",
+                                 zip(student_ids.tolist(), [str(day)] * len(student_ids), status.tolist()))
+        progress(f"attendance: {min(start + 20, len(days))}/{len(days)} days")
+
+
+def _fees(conn, rng, student_ids, today):
+    rows = []
+    for months_ago in range(11, -1, -1):
+        year, month = divmod(today.year * 12 + today.month - 1 - months_ago, 12)
+        due = date(year, month + 1, 10)
+        billed = str(due - timedelta(days=9))
+        pays = rng.random(len(student_ids))
+        for student_id, roll in zip(student_ids.tolist(), pays):
+            rows.append((student_id, "charge", MONTHLY_FEE, billed, str(due), f"Tuition {due:%b %Y}"))
+            if roll < 0.85 or (months_ago > 2 and roll < 0.95):
+                paid_on = due + timedelta(days=int(roll * 20) - 8)
+                amount = MONTHLY_FEE if roll < 0.8 else MONTHLY_FEE / 2
+                rows.append((student_id, "payment", amount, str(min(paid_on, today)), None, None))
+    with db.transaction(conn):
+        conn.executemany(fees.INSERT_SQL, rows)
+    return len(rows)
+
+
+def _exams(conn, rng, student_ids, student_classes, days):
+    ability = rng.normal(0, 12, len(student_ids))
+    term_dates = [days[len(days) * (i + 1) // (len(TERMS) + 1)] for i in range(len(TERMS))]
+    classes = np.array([c for c, _ in student_classes])
+    exams = marked = 0
+    for term, exam_date in zip(TERMS, term_dates):
+        for class_name in CLASSES:
+            members = np.flatnonzero(classes == class_name)
+            for subject in SUBJECTS:
+                with db.transaction(conn):
+                    exam_id = conn.execute(results.EXAM_INSERT_SQL, (f"{term} {subject}", class_name, subject, 100,
+                                                                     str(exam_date))).lastrowid
+                    marks = np.clip(rng.normal(65, 12, len(members)) + ability[members], 0, 100).round().astype(int)
+                    conn.executemany(results.UPSERT_SQL, zip(student_ids[members].tolist(), [exam_id] * len(members),
+                                                             marks.tolist()))
+                exams += 1
+                marked += len(members)
+    return exams, marked
+
+
+def _library(conn, rng, student_ids, n_books, n_loans, days, today):
+    copies = rng.integers(1, 6, n_books)
+    titles = [" ".join(rng.choice(TITLE_WORDS, 3, replace=False)) for _ in range(n_books)]
+    with db.transaction(conn):
+        conn.executemany(library.BOOK_INSERT_SQL,
+                         [(title, author, f"978-{i:09d}", int(n), int(n))
+                          for i, (title, author, n) in enumerate(zip(titles, _names(rng, n_books), copies))])
+        book_ids = np.array([row[0] for row in conn.execute("SELECT id FROM books ORDER BY id")])
+        available = dict(zip(book_ids.tolist(), copies.tolist()))
+        rows = []
+        for book_id, student_id, day in zip(rng.choice(book_ids, n_loans).tolist(),
+                                            rng.choice(student_ids, n_loans).tolist(),
+                                            rng.integers(0, len(days), n_loans).tolist()):
+            issued = days[day]
+            due = issued + timedelta(days=14)
+            returned = rng.random() < 0.85 or not available[book_id]
+            if not returned:
+                available[book_id] -= 1
+            back = min(issued + timedelta(days=int(rng.integers(3, 25))), today) if returned else None
+            rows.append((book_id, student_id, str(issued), str(due), str(back) if back else None,
+                         "Returned" if returned else "Issued"))
+        conn.executemany("INSERT INTO library_transactions (book_id, student_id, issue_date, due_date, return_date, "
+                         "status) VALUES (?, ?, ?, ?, ?, ?)", rows)
+        conn.executemany("UPDATE books SET available_copies = ? WHERE id = ?",
+                         [(n, book_id) for book_id, n in available.items()])
+
+
+def _timetable(conn):
+    for class_name in CLASSES:
+        timetable.save_requirements(conn, class_name, SUBJECTS.items())
+    schedule = timetable.generate(conn, time_budget=20)
+    timetable.save_schedule(conn, schedule, attendance.class_sections(conn))
+    return len(schedule.lessons)
+
+
+def generate(conn, scale=1.0, seed=42, today=None, progress=print):
+    """Fill an empty database with a synthetic school. Returns row counts
+    per table."""
+    if conn.execute("SELECT EXISTS (SELECT 1 FROM students)").fetchone()[0]:
+        raise ValueError("Database already has students; generate into an empty file")
+    rng = np.random.default_rng(seed)
+    today = today or date.today()
+    days = _school_days(today, SCHOOL_DAYS)
+    started = time.perf_counter()
+
+    student_classes = _students(conn, rng, _scaled(STUDENTS, scale))
+    student_ids = np.array([row[0] for row in conn.execute("SELECT id FROM students ORDER BY id")])
+    _teachers(conn, rng, _scaled(TEACHERS, scale))
+    progress(f"students and teachers: {time.perf_counter() - started:.1f}s")
+    _attendance(conn, rng, student_ids, days, progress)
+    _fees(conn, rng, student_ids, today)
+    progress(f"fees: {time.perf_counter() - started:.1f}s")
+    _exams(conn, rng, student_ids, student_classes, days)
+    progress(f"exams: {time.perf_counter() - started:.1f}s")
+    _library(conn, rng, student_ids, _scaled(BOOKS, scale), _scaled(LOANS, scale), days, today)
+    _timetable(conn)
+    conn.execute("ANALYZE")
+    progress(f"done: {time.perf_counter() - started:.1f}s")
+    tables = ["students", "teachers", "attendance", "fee_ledger", "exams", "results", "books",
+              "library_transactions", "timetable"]
+    return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m school.synthetic", description=__doc__.split("\n")[0])
+    parser.add_argument("--db", default="bench.db", help="database file to create (default: %(default)s)")
+    parser.add_argument("--scale", type=float, default=1.0, help="fraction of the full volumes (default: 1)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--replace", action="store_true", help="delete the database file first")
+    args = parser.parse_args(argv)
+    if args.replace:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    counts = generate(db.get_connection(args.db), args.scale, args.seed)
+    print(", ".join(f"{table}: {n:,}" for table, n in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
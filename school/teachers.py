@@ -0,0 +1,40 @@
+"""Teacher records."""
+from typing import NamedTuple, Optional
+
+from school import db
+from school.writer import queued
+
+INSERT_SQL = "INSERT INTO teachers (name, teacher_id, subject, phone, email) VALUES (?, ?, ?, ?, ?)"
+
+
+class Teacher(NamedTuple):
+    name: str
+    teacher_id: str
+    subject: Optional[str] = None
+    phone: Optional[str] = None
+    email: Optional[str] = None
+    id: Optional[int] = None
+
+
+@queued
+def add(conn, teacher):
+    """Insert one :class:`Teacher` and return its id. Raises
+    sqlite3.IntegrityError if the teacher ID is taken."""
+    with db.transaction(conn):
+        return conn.execute(INSERT_SQL, teacher[:5]).lastrowid
+
+
+@queued
+def add_many(conn, teachers):
+    """Insert :class:`Teacher` rows in one transaction; all or none are
+    added. Returns the number added."""
+    rows = [teacher[:5] for teacher in teachers]
+    with db.transaction(conn):
+        conn.executemany(INSERT_SQL, rows)
+    return len(rows)
+
+
+def list_teachers(conn):
+    """Every teacher as a :class:`Teacher`, by name."""
+    return [Teacher(*row) for row in
+            conn.execute("SELECT name, teacher_id, subject, phone, email, id FROM teachers ORDER BY name, teacher_id")]
@@ -0,0 +1,365 @@
+"""SQL tracing, slow-query log and page render timing.
+
+Connections opened by :mod:`school.db` use :class:`TracedConnection`, whose
+cursors time every statement from ``execute`` through the last fetch and
+count the rows it returned or changed. Each statement is attributed to the
+first call site in this repository (page script line or ``school`` module)
+and to the page being rendered, and counted under its SQL with runs of
+placeholders (``IN (?, ?, ...)``) collapsed.
+
+Writer connections also get SQLite's trace callback, which captures each
+statement with its bound values for the slow-query log and counts the
+statements SQLite actually ran for it (one per parameter set of an
+``executemany``, plus every trigger program step). SQLite runs the
+callback while holding the connection's mutex, and the callback needs the
+GIL; a thread reading columns of the same connection holds the GIL and
+needs the mutex. So a connection with the callback lets one thread at a
+time into SQLite, which costs nothing on a writer's connection, used by
+its one thread. The shared connection every session reads through has no
+callback and no such lock: its slow-query log shows the bound values next
+to the SQL, and it counts one SQLite statement per parameter set.
+
+Statements slower than ``slow_query_ms`` (``SCHOOL_SLOW_QUERY_MS``,
+default 100) are kept in a rolling log. The apps wrap each page in
+:func:`start_page` / :meth:`PageRender.finish`. Everything is in-process
+and is exposed by :func:`snapshot`, :func:`to_json` and
+:func:`to_prometheus`. Set ``SCHOOL_TELEMETRY=0`` to open plain
+connections with no tracing at all.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import nullcontext
+from pathlib import Path
+
+import numpy as np
+
+ENABLED = os.environ.get("SCHOOL_TELEMETRY", "1") != "0"
+SLOW_LOG_SIZE = 200
+RENDER_SAMPLES = 500  # render times kept per page for percentiles
+SQL_LABEL_LENGTH = 120
+MAX_STATEMENTS = 1000  # distinct statements tracked; any more are pooled
+OTHER_STATEMENTS = "(other statements)"
+
+slow_query_ms = float(os.environ.get("SCHOOL_SLOW_QUERY_MS", 100))
+
+_REPO = str(Path(__file__).resolve().parent.parent) + os.sep
+_SKIP = {str(Path(__file__).resolve()), str(Path(__file__).resolve().with_name("db.py"))}
+
+_lock = threading.Lock()
+_local = threading.local()
+_queries = {}
+_pages = {}
+_slow = deque(maxlen=SLOW_LOG_SIZE)
+_placeholders = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+def _normalise(sql):
+    # One key per statement, however many values an IN list was given
+    return _placeholders.sub("?, …", re.sub(r"\s+", " ", sql).strip())
+
+
+def _call_site():
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_REPO) and filename not in _SKIP and "site-packages" not in filename:
+            return f"{filename[len(_REPO):]}:{frame.f_lineno}"
+        frame = frame.f_back
+    return "?"
+
+
+def _current_page():
+    render = getattr(_local, "page", None)
+    return render.key if render is not None else None
+
+
+class _Statement:
+    """One execution of a statement, updated as its rows are fetched."""
+
+    __slots__ = ("sql", "site", "page", "ms", "rows", "steps", "expanded", "params", "started", "logged")
+
+    def __init__(self, sql, site, page):
+        self.sql, self.site, self.page = sql, site, page
+        self.ms, self.rows, self.steps = 0.0, 0, 0
+        self.expanded = self.params = None
+        self.started = time.time()
+        self.logged = False
+
+    def add(self, ms, rows):
+        with _lock:
+            self.ms += ms
+            self.rows += rows
+            stats = _queries[self.sql]
+            stats["total_ms"] += ms
+            stats["rows"] += rows
+            stats["max_ms"] = max(stats["max_ms"], self.ms)
+            if self.page is not None and self.page in _pages:
+                _pages[self.page]["query_ms"] += ms
+            if not self.logged and self.ms >= slow_query_ms:
+                self.logged = True
+                _slow.append(self)
+
+    def as_dict(self):
+        return {"at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+                "ms": round(self.ms, 2), "rows": self.rows, "sqlite_statements": self.steps,
+                "page": " :: ".join(self.page) if self.page else None, "site": self.site,
+                "sql": self.expanded or self.sql,
+                "params": None if self.expanded or self.params is None else repr(self.params)}
+
+
+def _begin(sql):
+    statement = _Statement(_normalise(sql), _call_site(), _current_page())
+    with _lock:
+        if statement.sql not in _queries and len(_queries) >= MAX_STATEMENTS:
+            statement.sql = OTHER_STATEMENTS
+        stats = _queries.get(statement.sql)
+        if stats is None:
+            stats = _queries[statement.sql] = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0,
+                                               "sqlite_statements": 0, "sites": Counter()}
+        stats["calls"] += 1
+        stats["sites"][statement.site] += 1
+        if statement.page is not None and statement.page in _pages:
+            _pages[statement.page]["queries"] += 1
+    _local.statement = statement
+    return statement
+
+
+def _trace(sql):
+    # Called by SQLite with the expanded SQL of each statement it runs,
+    # including the implicit BEGIN and each trigger program step.
+    statement = getattr(_local, "statement", None)
+    if statement is not None and not sql.startswith("BEGIN"):
+        statement.steps += 1
+        if statement.expanded is None:
+            statement.expanded = sql
+
+
+def _counted(statement, seq_of_parameters):
+    for parameters in seq_of_parameters:
+        statement.steps += 1
+        yield parameters
+
+
+class TracedCursor(sqlite3.Cursor):
+    _statement = None
+
+    def _run(self, method, sql, parameters, many=False):
+        statement = _begin(sql)
+        if not self.connection.traced:
+            if many:
+                parameters = _counted(statement, parameters)
+            else:
+                statement.steps, statement.params = 1, parameters if len(parameters) else None
+        started = time.perf_counter()
+        try:
+            with self.connection.calls:
+                return method(sql, parameters)
+        finally:
+            _local.statement = None
+            with _lock:
+                _queries[statement.sql]["sqlite_statements"] += statement.steps
+            statement.add(1000 * (time.perf_counter() - started), max(self.rowcount, 0))
+            self._statement = statement
+
+    def execute(self, sql, parameters=()):
+        return self._run(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(super().executemany, sql, seq_of_parameters, many=True)
+
+    def _fetched(self, started, rows):
+        if self._statement is not None:
+            self._statement.add(1000 * (time.perf_counter() - started), rows)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        with self.connection.calls:
+            row = super().fetchone()
+        self._fetched(started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        with self.connection.calls:
+            rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        with self.connection.calls:
+            rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        with self.connection.calls:
+            row = super().__next__()
+        self._fetched(started, 1)
+        return row
+
+
+class TracedConnection(sqlite3.Connection):
+    """``sqlite3.Connection`` whose statements are timed and attributed."""
+
+    traced = False
+    calls = nullcontext()  # a lock once traced, see the module docstring
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute() would bypass the cursor subclass
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        if not self.in_transaction:
+            return super().commit()
+        statement = _begin("COMMIT")
+        started = time.perf_counter()
+        try:
+            with self.calls:
+                return super().commit()
+        finally:
+            statement.add(1000 * (time.perf_counter() - started), 0)
+            _local.statement = None
+
+    def rollback(self):
+        with self.calls:
+            return super().rollback()
+
+    @property
+    def total_changes(self):
+        with self.calls:
+            return sqlite3.Connection.total_changes.__get__(self)
+
+
+def connect(*args, trace=False, **kwargs):
+    """``sqlite3.connect`` with timing when telemetry is enabled. ``trace``
+    adds SQLite's trace callback; only for a connection one thread uses."""
+    if not ENABLED:
+        return sqlite3.connect(*args, **kwargs)
+    conn = sqlite3.connect(*args, factory=TracedConnection, **kwargs)
+    if trace:
+        conn.traced, conn.calls = True, threading.RLock()
+        conn.set_trace_callback(_trace)
+    return conn
+
+
+class PageRender:
+    def __init__(self, app, page):
+        self.key = (app, page)
+        self.started = time.perf_counter()
+        with _lock:
+            _pages.setdefault(self.key, {"renders": 0, "total_ms": 0.0, "queries": 0, "query_ms": 0.0,
+                                         "samples": deque(maxlen=RENDER_SAMPLES)})
+        _local.page = self
+
+    def finish(self):
+        ms = 1000 * (time.perf_counter() - self.started)
+        with _lock:
+            stats = _pages[self.key]
+            stats["renders"] += 1
+            stats["total_ms"] += ms
+            stats["samples"].append(ms)
+        if getattr(_local, "page", None) is self:
+            _local.page = None
+        return ms
+
+
+def start_page(app, page):
+    """Start timing a page render; call ``finish()`` on the result at the
+    end of the script. Renders cut short by ``st.rerun()`` or ``st.stop()``
+    are not counted, though their queries are."""
+    return PageRender(app, page)
+
+
+def set_slow_query_ms(ms):
+    global slow_query_ms
+    slow_query_ms = float(ms)
+
+
+def reset():
+    with _lock:
+        _queries.clear()
+        _pages.clear()
+        _slow.clear()
+
+
+def snapshot(top=50):
+    """Page render stats, the ``top`` statements by total time and the slow
+    query log, as plain data."""
+    with _lock:
+        pages = []
+        for (app, page), stats in _pages.items():
+            samples = np.array(stats["samples"]) if stats["samples"] else np.zeros(1)
+            renders = stats["renders"] or 1
+            pages.append({"app": app, "page": page, "renders": stats["renders"],
+                          "p50_ms": round(float(np.percentile(samples, 50)), 2),
+                          "p95_ms": round(float(np.percentile(samples, 95)), 2),
+                          "max_ms": round(float(samples.max()), 2),
+                          "total_ms": round(stats["total_ms"], 2),
+                          "queries_per_render": round(stats["queries"] / renders, 1),
+                          "query_ms_per_render": round(stats["query_ms"] / renders, 2)})
+        queries = [{"sql": sql, "calls": stats["calls"], "total_ms": round(stats["total_ms"], 2),
+                    "avg_ms": round(stats["total_ms"] / stats["calls"], 3), "max_ms": round(stats["max_ms"], 2),
+                    "rows": stats["rows"], "sqlite_statements": stats["sqlite_statements"],
+                    "top_site": stats["sites"].most_common(1)[0][0], "sites": dict(stats["sites"])}
+                   for sql, stats in _queries.items()]
+        slow = [statement.as_dict() for statement in reversed(_slow)]
+    queries.sort(key=lambda q: q["total_ms"], reverse=True)
+    pages.sort(key=lambda p: p["total_ms"], reverse=True)
+    return {"slow_query_ms": slow_query_ms, "pages": pages, "queries": queries[:top], "slow_queries": slow}
+
+
+def to_json(top=50):
+    return json.dumps(snapshot(top), indent=2, ensure_ascii=False)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _statement_id(sql):
+    # statement labels are cut short, so two statements can share one
+    return hashlib.sha1(sql.encode()).hexdigest()[:12]
+
+
+def to_prometheus(top=50):
+    """Prometheus text exposition of :func:`snapshot`."""
+    data = snapshot(top)
+    lines = [
+        "# HELP school_page_render_seconds Sidebar page render time.",
+        "# TYPE school_page_render_seconds summary",
+    ]
+    for page in data["pages"]:
+        labels = f'app="{_label(page["app"])}",page="{_label(page["page"])}"'
+        for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms")):
+            lines.append(f'school_page_render_seconds{{{labels},quantile="{quantile}"}} {page[key] / 1000:.6f}')
+        lines.append(f"school_page_render_seconds_sum{{{labels}}} {page['total_ms'] / 1000:.6f}")
+        lines.append(f"school_page_render_seconds_count{{{labels}}} {page['renders']}")
+    for name, key, help_text in (
+            ("school_query_seconds_total", "total_ms", "Time spent in SQL statements."),
+            ("school_query_calls_total", "calls", "SQL statement executions."),
+            ("school_query_rows_total", "rows", "Rows returned or changed."),
+            ("school_query_sqlite_statements_total", "sqlite_statements",
+             "Statements SQLite ran, including executemany rows and trigger steps.")):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for query in data["queries"]:
+            value = f"{query[key] / 1000:.6f}" if key == "total_ms" else query[key]
+            lines.append(f'{name}{{statement="{_label(query["sql"][:SQL_LABEL_LENGTH])}",'
+                         f'statement_id="{_statement_id(query["sql"])}"}} {value}')
+    lines += ["# HELP school_slow_queries Statements in the slow query log.", "# TYPE school_slow_queries gauge",
+              f"school_slow_queries {len(data['slow_queries'])}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,423 @@
+"""Timetable storage, clash detection and automatic generation.
+
+A week is a grid of slots numbered ``day_index * MAX_PERIODS + period - 1``.
+Each teacher's and each class-section's week is held as an int bitmap of
+occupied slots, so checking a placement is one shift-and-mask however large
+the school is. :func:`solve` builds whole weeks from per-class subject
+period requirements (``subject_periods``) and the subjects listed in
+``teachers.subject``.
+
+Timetable rows store the teacher's ``teacher_id`` code and use ``''``
+rather than NULL for a missing class or section (see migration 15).
+"""
+import random
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from school import attendance, db
+from school.cache import VersionedCache
+from school.writer import queued
+
+DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday")
+DAY_INDEX = {day: i for i, day in enumerate(DAYS)}
+MAX_PERIODS = 12
+SCHOOL_DAYS = 5
+PERIODS_PER_DAY = 8
+TIME_BUDGET = 30.0
+PROGRESS_INTERVAL = 0.5  # seconds between solve() progress callbacks
+
+DAY_MASKS = [((1 << MAX_PERIODS) - 1) << (i * MAX_PERIODS) for i in range(len(DAYS))]
+
+_occupancy = VersionedCache(maxsize=8)
+
+
+def slot(day, period):
+    return DAY_INDEX[day] * MAX_PERIODS + int(period) - 1
+
+
+def day_period(bit):
+    return DAYS[bit // MAX_PERIODS], bit % MAX_PERIODS + 1
+
+
+def week_mask(days=SCHOOL_DAYS, periods=PERIODS_PER_DAY):
+    """Bitmap of the usable slots of a ``days`` x ``periods`` week."""
+    day = (1 << periods) - 1
+    return sum(day << (i * MAX_PERIODS) for i in range(days))
+
+
+def _bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _subjects(text):
+    return {part.strip().casefold() for part in re.split(r"[,/;&]", text or "") if part.strip()}
+
+
+class Occupancy:
+    """Occupied-slot bitmaps per teacher and per ``(class, section)``."""
+
+    def __init__(self, rows=()):
+        self.teachers = defaultdict(int)
+        self.classes = defaultdict(int)
+        for class_name, section, day, period, teacher in rows:
+            if day in DAY_INDEX and 1 <= int(period) <= MAX_PERIODS:
+                self.add((class_name, section), teacher, slot(day, period))
+
+    def add(self, class_key, teacher, bit):
+        self.classes[class_key] |= 1 << bit
+        if teacher:
+            self.teachers[teacher] |= 1 << bit
+
+    def teacher_busy(self, teacher, bit):
+        return bool(teacher) and bool(self.teachers.get(teacher, 0) >> bit & 1)
+
+
+def load_occupancy(conn):
+    """Occupancy of the saved timetable, rebuilt only after a write. Shared
+    between callers; do not modify."""
+    return _occupancy.get(conn, "occupancy", lambda: Occupancy(
+        conn.execute("SELECT class, section, day, period, teacher FROM timetable")))
+
+
+def check_slot(conn, class_name, section, day, period, teacher):
+    """Reasons why ``teacher`` cannot take ``class_name``/``section`` in this
+    slot (empty if the slot is fine). Replacing the class's own lesson in
+    the slot is not a clash."""
+    if day not in DAY_INDEX or not 1 <= int(period) <= MAX_PERIODS:
+        return [f"{day} period {period} is outside the timetable"]
+    if not teacher or not load_occupancy(conn).teacher_busy(teacher, slot(day, period)):
+        return []
+    row = conn.execute("SELECT class, section, subject FROM timetable WHERE teacher = ? AND day = ? AND period = ?",
+                       (teacher, day, int(period))).fetchone()
+    if row is None or (row[0], row[1]) == (class_name or "", section or ""):
+        return []
+    other = f"{row[0]} {row[1]}".strip() or "another class"
+    return [f"{teacher} already teaches {row[2]} to {other} in period {period} on {day}"]
+
+
+@queued
+def set_slot(conn, class_name, section, day, period, subject, teacher=None):
+    """Put a lesson in a class's slot, replacing what was there. Raises
+    ValueError if the teacher is already booked elsewhere in that slot."""
+    clashes = check_slot(conn, class_name, section, day, period, teacher)
+    if clashes:
+        raise ValueError("; ".join(clashes))
+    with db.transaction(conn, immediate=True):
+        conn.execute("DELETE FROM timetable WHERE class = ? AND section = ? AND day = ? AND period = ?",
+                     (class_name or "", section or "", day, int(period)))
+        conn.execute("INSERT INTO timetable (class, section, day, period, subject, teacher) VALUES (?, ?, ?, ?, ?, ?)",
+                     (class_name or "", section or "", day, int(period), subject, teacher or None))
+
+
+@queued
+def clear_slot(conn, class_name, section, day, period):
+    with db.transaction(conn):
+        return conn.execute("DELETE FROM timetable WHERE class = ? AND section = ? AND day = ? AND period = ?",
+                            (class_name or "", section or "", day, int(period))).rowcount
+
+
+def conflicts(conn):
+    """Lessons set aside from double-booked slots, with the lesson that kept
+    each slot, for an admin to re-enter or dismiss."""
+    return pd.read_sql_query("""
+        SELECT c.id, c.class, c.section, c.day, c.period, c.subject, c.teacher, c.reason,
+               k.subject AS kept_subject, k.teacher AS kept_teacher
+        FROM timetable_conflicts c LEFT JOIN timetable k ON k.id = c.kept_id
+        ORDER BY c.class, c.section, c.day, c.period
+    """, conn)
+
+
+@queued
+def dismiss_conflicts(conn, ids):
+    with db.transaction(conn):
+        return conn.executemany("DELETE FROM timetable_conflicts WHERE id = ?",
+                                [(int(conflict_id),) for conflict_id in ids]).rowcount
+
+
+def requirements(conn, class_name):
+    return pd.read_sql_query("SELECT subject, periods_per_week FROM subject_periods WHERE class = ? ORDER BY subject",
+                             conn, params=(class_name or "",))
+
+
+@queued
+def save_requirements(conn, class_name, rows):
+    """Replace a class's ``(subject, periods_per_week)`` requirements."""
+    rows = [(class_name or "", subject.strip(), int(periods)) for subject, periods in rows
+            if isinstance(subject, str) and subject.strip() and pd.notna(periods) and int(periods) > 0]
+    with db.transaction(conn):
+        conn.execute("DELETE FROM subject_periods WHERE class = ?", (class_name or "",))
+        conn.executemany("INSERT INTO subject_periods (class, subject, periods_per_week) VALUES (?, ?, ?)", rows)
+    return len(rows)
+
+
+def teacher_subjects(conn):
+    """``teacher_id -> {subject, ...}`` from ``teachers.subject``, which may
+    list several subjects separated by commas or slashes."""
+    return {teacher_id: _subjects(subject)
+            for teacher_id, subject in conn.execute("SELECT teacher_id, subject FROM teachers")}
+
+
+@dataclass
+class Schedule:
+    """Result of :func:`solve`. ``lessons`` are ``(class, section, day,
+    period, subject, teacher)`` rows ready to save."""
+    lessons: list = field(default_factory=list)
+    unplaced: list = field(default_factory=list)
+    unassigned: list = field(default_factory=list)
+    moves: int = 0
+    seconds: float = 0.0
+
+    @property
+    def complete(self):
+        return not self.unplaced and not self.unassigned
+
+    def problems(self):
+        rows = [(c, s, subject, teacher, n, "no free slot") for c, s, subject, teacher, n in self.unplaced]
+        rows += [(c, s, subject, None, n, "no teacher for subject") for c, s, subject, n in self.unassigned]
+        return pd.DataFrame(rows, columns=["class", "section", "subject", "teacher", "periods", "problem"])
+
+
+def _assign_teachers(sections, requirements_by_class, subjects_by_teacher, capacity):
+    # Hardest demands first (fewest qualified teachers, most periods), each
+    # to the least loaded qualified teacher with room left.
+    candidates = defaultdict(list)
+    for teacher, subjects in sorted(subjects_by_teacher.items()):
+        for subject in subjects:
+            candidates[subject].append(teacher)
+    demands = [(key, subject, periods) for key in sections
+               for subject, periods in requirements_by_class.get(key[0], ())]
+    demands.sort(key=lambda d: (len(candidates[d[1].casefold()]), -d[2]))
+
+    load = defaultdict(int)
+    assigned, unassigned = [], []
+    for key, subject, periods in demands:
+        options = [t for t in candidates[subject.casefold()] if load[t] + periods <= capacity(t)]
+        if not options:
+            unassigned.append((*key, subject, periods))
+            continue
+        teacher = min(options, key=lambda t: (load[t], t))
+        load[teacher] += periods
+        assigned.append((key, subject, teacher, periods))
+    return assigned, load, unassigned
+
+
+class _Week:
+    """Mutable placement state for one solver attempt."""
+
+    def __init__(self, week, fixed, rng):
+        self.week = week
+        self.rng = rng
+        self.classes = defaultdict(int, fixed.classes)
+        self.teachers = defaultdict(int, fixed.teachers)
+        self.lesson_at = {}      # (class_key, bit) -> (subject, teacher)
+        self.class_at = {}       # (teacher, bit) -> class_key
+        self.subject_days = defaultdict(int)  # (class_key, subject) -> day masks used
+
+    def pick(self, mask):
+        return self.rng.choice(list(_bits(mask)))
+
+    def _shuffled(self, mask):
+        bits = list(_bits(mask))
+        self.rng.shuffle(bits)
+        return bits
+
+    def free(self, key, teacher):
+        return self.week & ~self.classes[key] & ~self.teachers[teacher]
+
+    def put(self, key, subject, teacher, bit):
+        self.classes[key] |= 1 << bit
+        self.teachers[teacher] |= 1 << bit
+        self.lesson_at[key, bit] = (subject, teacher)
+        self.class_at[teacher, bit] = key
+        self.subject_days[key, subject] |= DAY_MASKS[bit // MAX_PERIODS]
+
+    def take(self, key, bit):
+        subject, teacher = self.lesson_at.pop((key, bit))
+        del self.class_at[teacher, bit]
+        self.classes[key] &= ~(1 << bit)
+        self.teachers[teacher] &= ~(1 << bit)
+        day = DAY_MASKS[bit // MAX_PERIODS]
+        if not any(self.lesson_at.get((key, b), (None,))[0] == subject for b in _bits(self.classes[key] & day)):
+            self.subject_days[key, subject] &= ~day
+        return subject, teacher
+
+    def place(self, key, subject, teacher):
+        free = self.free(key, teacher)
+        if free:
+            # Spread a subject over the week before doubling up on a day
+            self.put(key, subject, teacher, self.pick(free & ~self.subject_days[key, subject] or free))
+            return True
+        return self.repair(key, subject, teacher)
+
+    def repair(self, key, subject, teacher):
+        # Free a slot by moving one lesson: either the class's own lesson in
+        # a slot where the teacher is free, or the teacher's lesson with
+        # another class in a slot where this class is free.
+        own = self.week & self.classes[key] & ~self.teachers[teacher]
+        for bit in self._shuffled(own):
+            if (key, bit) not in self.lesson_at:
+                continue
+            other_teacher = self.lesson_at[key, bit][1]
+            alternatives = self.free(key, other_teacher) & ~(1 << bit)
+            if alternatives:
+                moved = self.take(key, bit)
+                self.put(key, *moved, self.pick(alternatives))
+                self.put(key, subject, teacher, bit)
+                return True
+        theirs = self.week & ~self.classes[key] & self.teachers[teacher]
+        for bit in self._shuffled(theirs):
+            other_key = self.class_at.get((teacher, bit))
+            if other_key is None:
+                continue
+            alternatives = self.free(other_key, teacher) & ~(1 << bit)
+            if alternatives:
+                moved = self.take(other_key, bit)
+                self.put(other_key, *moved, self.pick(alternatives))
+                self.put(key, subject, teacher, bit)
+                return True
+        return False
+
+    def eject(self, key, subject, teacher):
+        # Place the lesson in a random slot where only one movable lesson
+        # is in the way and hand that lesson back.
+        options = []
+        for bit in _bits(self.week & ~self.classes[key]):
+            if (teacher, bit) in self.class_at:
+                options.append((self.class_at[teacher, bit], bit))
+        for bit in _bits(self.week & self.classes[key] & ~self.teachers[teacher]):
+            if (key, bit) in self.lesson_at:
+                options.append((key, bit))
+        if not options:
+            return None
+        other_key, bit = self.rng.choice(options)
+        bumped = self.take(other_key, bit)
+        self.put(key, subject, teacher, bit)
+        return (other_key, *bumped)
+
+
+def solve(sections, requirements_by_class, subjects_by_teacher, days=SCHOOL_DAYS, periods=PERIODS_PER_DAY,
+          time_budget=TIME_BUDGET, seed=0, fixed=None, progress=None):
+    """Build a weekly timetable.
+
+    ``sections`` are ``(class, section)`` keys, ``requirements_by_class``
+    maps a class to ``[(subject, periods_per_week), ...]`` and
+    ``subjects_by_teacher`` maps a teacher code to the subjects they teach.
+    Lessons in ``fixed`` (an :class:`Occupancy`, e.g. other classes' saved
+    timetables) are kept and worked around.
+
+    Teachers are assigned once, then lessons are placed greedily with
+    one-move repairs and whatever is left over is fitted in by ejection
+    chains until every lesson is placed or ``time_budget`` seconds have
+    passed. ``progress(placed, total)`` is called about every
+    ``PROGRESS_INTERVAL`` seconds while they run; it may raise to abort.
+    """
+    started = time.monotonic()
+    fixed = fixed or Occupancy()
+    week = week_mask(days, periods)
+    sections = [(c or "", s or "") for c, s in sections]
+
+    def capacity(teacher):
+        return bin(week & ~fixed.teachers.get(teacher, 0)).count("1")
+
+    assigned, load, unassigned = _assign_teachers(sections, requirements_by_class, subjects_by_teacher, capacity)
+    units = [(key, subject, teacher) for key, subject, teacher, n in assigned for _ in range(n)]
+
+    rng = random.Random(seed)
+    state = _Week(week, fixed, rng)
+    order = units[:]
+    rng.shuffle(order)
+    order.sort(key=lambda u: -load[u[2]])  # busiest teachers first
+    pending = [unit for unit in order if not state.place(*unit)]
+
+    # Ejection chains: put a pending lesson into a slot anyway, bumping
+    # whichever lesson was in the way, which then becomes pending itself.
+    # Every lesson placed directly shortens the chain, so this converges on
+    # packed weeks where restarting from scratch would not.
+    stuck, moves = [], 0
+    reported = started
+    while pending and time.monotonic() - started < time_budget:
+        if progress and time.monotonic() - reported >= PROGRESS_INTERVAL:
+            progress(len(units) - len(pending) - len(stuck), len(units))
+            reported = time.monotonic()
+        unit = pending.pop(rng.randrange(len(pending)))
+        if state.place(*unit):
+            continue
+        bumped = state.eject(*unit)
+        if bumped is None:
+            stuck.append(unit)
+        else:
+            pending.append(bumped)
+            moves += 1
+
+    missing = defaultdict(int)
+    for key, subject, teacher in pending + stuck:
+        missing[key, subject, teacher] += 1
+    lessons = [(*key, *day_period(bit), subject, teacher)
+               for (key, bit), (subject, teacher) in sorted(state.lesson_at.items())]
+    unplaced = [(*key, subject, teacher, n) for (key, subject, teacher), n in missing.items()]
+    return Schedule(lessons, unplaced, unassigned, moves, round(time.monotonic() - started, 2))
+
+
+def generate(conn, sections=None, days=SCHOOL_DAYS, periods=PERIODS_PER_DAY, time_budget=TIME_BUDGET, seed=0,
+             progress=None):
+    """Solve a week for ``sections`` (default: every class-section with
+    students) from the saved requirements. Other classes' saved lessons
+    stay fixed. Nothing is written; see :func:`save_schedule`."""
+    if sections is None:
+        sections = attendance.class_sections(conn)
+    sections = [(c or "", s or "") for c, s in sections]
+    by_class = defaultdict(list)
+    for class_name, subject, n in conn.execute("SELECT class, subject, periods_per_week FROM subject_periods"):
+        by_class[class_name].append((subject, n))
+    keys = set(sections)
+    fixed = Occupancy(row for row in conn.execute("SELECT class, section, day, period, teacher FROM timetable")
+                      if (row[0], row[1]) not in keys)
+    return solve(sections, by_class, teacher_subjects(conn), days, periods, time_budget, seed, fixed, progress)
+
+
+@queued
+def save_schedule(conn, schedule, sections):
+    """Replace the saved timetable of ``sections`` with ``schedule`` in one
+    transaction."""
+    with db.transaction(conn, immediate=True):
+        conn.executemany("DELETE FROM timetable WHERE class = ? AND section = ?",
+                         [(c or "", s or "") for c, s in sections])
+        conn.executemany("INSERT INTO timetable (class, section, day, period, subject, teacher) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", schedule.lessons)
+    return len(schedule.lessons)
+
+
+def _grid(df):
+    if df.empty:
+        return pd.DataFrame()
+    grid = df.pivot(index="day", columns="period", values="lesson")
+    days = list(DAYS[:max(SCHOOL_DAYS, max(DAY_INDEX.get(d, 0) for d in grid.index) + 1)])
+    days += [d for d in grid.index if d not in DAY_INDEX]
+    periods = range(1, max(PERIODS_PER_DAY, int(grid.columns.max())) + 1)
+    grid = grid.reindex(index=days, columns=periods).fillna("")
+    grid.columns = [f"P{p}" for p in grid.columns]
+    return grid
+
+
+def class_grid(conn, class_name, section):
+    """Days x periods grid of one class-section's lessons."""
+    return _grid(pd.read_sql_query("""
+        SELECT t.day, t.period, t.subject || COALESCE(' (' || COALESCE(tc.name, t.teacher) || ')', '') AS lesson
+        FROM timetable t LEFT JOIN teachers tc ON tc.teacher_id = t.teacher
+        WHERE t.class = ? AND t.section = ?
+    """, conn, params=(class_name or "", section or "")))
+
+
+def teacher_grid(conn, teacher):
+    """Days x periods grid of one teacher's lessons."""
+    return _grid(pd.read_sql_query("""
+        SELECT day, period, subject || COALESCE(' (' || NULLIF(TRIM(class || ' ' || section), '') || ')', '') AS lesson
+        FROM timetable WHERE teacher = ?
+    """, conn, params=(teacher,)))
@@ -0,0 +1,253 @@
+"""Streamlit widgets shared by the apps."""
+from datetime import date
+
+import pandas as pd
+import streamlit as st
+
+from school import attendance, campus, dashboard, fees, jobs, paging, teachers, telemetry, timetable
+
+JOB_POLL_SECONDS = 1
+JOB_ICONS = {"queued": "⏳", "running": "⚙️", "done": "✅", "failed": "❌", "cancelled": "🚫"}
+
+
+def query_param(name):
+    """A query parameter the session was opened with. Moving to another
+    page drops the URL's query string, so it is remembered for the session."""
+    value = st.query_params.get(name)
+    if value is not None:
+        st.session_state[f"query_{name}"] = value
+    return st.session_state.get(f"query_{name}")
+
+
+@st.cache_resource(show_spinner=False)
+def _campus_db(name):
+    # Opened and migrated once per process, then shared by every session.
+    # Jobs the last server process left behind are picked up now rather
+    # than at the next submit.
+    conn = campus.connection(name)
+    jobs.start(conn)
+    return conn
+
+
+def campus_connection():
+    """The campus this session works on and its connection. A ``?campus=``
+    link pins the session to that campus; otherwise, when there is more
+    than one, a sidebar picker chooses it. Call it from the app's main
+    script; its pages get the connection from :func:`connection`."""
+    names = campus.names()
+    pinned = query_param("campus")
+    if pinned in names:
+        name = pinned
+    elif len(names) == 1:
+        name = names[0]
+    else:
+        name = st.sidebar.selectbox("🏢 Campus", names, key="campus")
+    st.session_state["campus_name"] = name
+    return name, _campus_db(name)
+
+
+def connection():
+    """The connection of the campus chosen by :func:`campus_connection`
+    on this run."""
+    return _campus_db(st.session_state["campus_name"])
+
+
+def group_dashboard():
+    """Every campus's KPIs side by side with group totals, and the largest
+    balances across campuses. Campuses are read in parallel."""
+    st.title("🏢 Group Dashboard")
+    metrics = campus.group_metrics()
+    total = metrics.loc["Total"]
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Total Students", int(total["students"]))
+    col2.metric("Total Teachers", int(total["teachers"]))
+    col3.metric("Books in Library", int(total["books"]))
+    col4.metric("Pending Fees (₹)", total["due_fees"])
+    col5.metric("Present Today", int(total["present_today"]))
+
+    per_campus = metrics.drop(index="Total")
+    st.bar_chart(per_campus[["students", "present_today"]], stack=False)
+    st.dataframe(metrics, use_container_width=True)
+
+    st.subheader("💰 Largest Balances")
+    dues = campus.group_dues(20)
+    if dues.empty:
+        st.info("No dues outstanding.")
+    else:
+        st.dataframe(dues, use_container_width=True, hide_index=True)
+
+
+def paged_dataframe(conn, table, columns, key, empty_message="No records yet."):
+    """Render ``columns`` of ``table`` as a keyset-paginated dataframe with
+    sort and page-size controls. Only the visible page is loaded.
+
+    Returns the total row count."""
+    total = paging.count_rows(conn, table)
+    if not total:
+        st.info(empty_message)
+        return total
+
+    col1, col2, col3 = st.columns([2, 1, 1])
+    sort_by = col1.selectbox("Sort by", ["id"] + list(columns), key=f"{key}_sort",
+                             format_func=lambda col: "Date added" if col == "id" else col)
+    descending = col2.toggle("Descending", key=f"{key}_desc")
+    page_size = col3.selectbox("Rows per page", paging.PAGE_SIZES, index=1, key=f"{key}_size")
+
+    # Cursors of the pages visited so far; the last one is the current page.
+    # Changing the sort or page size starts again from the first page.
+    view = (sort_by, descending, page_size)
+    if st.session_state.get(f"{key}_view") != view:
+        st.session_state[f"{key}_view"] = view
+        st.session_state[f"{key}_cursors"] = [None]
+    cursors = st.session_state[f"{key}_cursors"]
+
+    df, next_cursor = paging.fetch_page(conn, table, columns, sort_by, descending,
+                                        cursors[-1], page_size)
+    st.dataframe(df[list(columns)], use_container_width=True, hide_index=True)
+
+    first_row = (len(cursors) - 1) * page_size + 1
+    col1, col2, col3 = st.columns([1, 1, 4])
+    if col1.button("◀ Previous", key=f"{key}_prev", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    if col2.button("Next ▶", key=f"{key}_next", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
+    col3.caption(f"Rows {first_row}–{first_row + len(df) - 1} of {total}")
+    return total
+
+
+def dues_table(conn, key, page_size=50):
+    """Students with an outstanding balance, largest first, with an
+    overdue-only filter. Reads the maintained balances, not the ledger."""
+    overdue = st.checkbox("Overdue only", key=f"{key}_overdue")
+    as_of = date.today() if overdue else None
+    total = fees.count_dues(conn, as_of)
+    if not total:
+        st.info("No overdue fees." if overdue else "No dues outstanding.")
+        return
+    pages = -(-total // page_size)
+    page_no = st.number_input(f"Page (of {pages})", 1, pages, key=f"{key}_page") if pages > 1 else 1
+    st.dataframe(fees.dues(conn, page_size, (page_no - 1) * page_size, as_of),
+                 use_container_width=True, hide_index=True)
+    st.caption(f"{total} students owe a total of ₹{fees.outstanding_total(conn):,.2f}")
+
+
+def dashboard_details(conn):
+    """Attendance trend and per-class breakdown for the dashboards."""
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        days = st.selectbox("Attendance trend", [7, 30, 90], index=1, format_func=lambda d: f"Last {d} days")
+        trend = dashboard.attendance_trend(conn, days)
+        if trend.empty:
+            st.info("No attendance recorded in this period.")
+        else:
+            st.line_chart(trend["present_pct"], y_label="Present %")
+    with col2:
+        st.markdown("**By class**")
+        st.dataframe(dashboard.class_breakdown(conn), use_container_width=True, hide_index=True)
+
+
+def timetable_grid(conn, key):
+    """Weekly grid for a chosen class-section or teacher."""
+    view = st.radio("View by", ["Class", "Teacher"], horizontal=True, key=f"{key}_view")
+    if view == "Class":
+        sections = attendance.class_sections(conn)
+        if not sections:
+            st.info("No classes yet.")
+            return
+        class_name, section = st.selectbox("Class", sections, key=f"{key}_class",
+                                           format_func=lambda cs: f"{cs[0] or ''} {cs[1] or ''}".strip())
+        grid = timetable.class_grid(conn, class_name, section)
+    else:
+        staff = teachers.list_teachers(conn)
+        if not staff:
+            st.info("No teachers yet.")
+            return
+        teacher = st.selectbox("Teacher", staff, key=f"{key}_teacher", format_func=lambda t: f"{t.name} ({t.teacher_id})")
+        grid = timetable.teacher_grid(conn, teacher.teacher_id)
+    if grid.empty:
+        st.info("Nothing scheduled yet.")
+    else:
+        st.dataframe(grid, use_container_width=True)
+
+
+def job_panel(conn, kind, key, show_result, describe=None, limit=3):
+    """The latest ``kind`` jobs with their progress, a cancel button while
+    they run and ``show_result(job)`` once they are done.
+
+    While any of them is unfinished the panel refreshes itself every
+    ``JOB_POLL_SECONDS`` without rerunning the rest of the page."""
+    active = any(not job.finished for job in jobs.recent(conn, kind, limit))
+
+    @st.fragment(run_every=JOB_POLL_SECONDS if active else None)
+    def panel():
+        recent = jobs.recent(conn, kind, limit)
+        if active and all(job.finished for job in recent):
+            st.rerun()  # rerender once without polling
+        for i, job in enumerate(recent):
+            label = f"{JOB_ICONS[job.status]} #{job.id} {describe(job) if describe else kind} ({job.status})"
+            with st.expander(label, expanded=i == 0):
+                st.caption(f"Submitted {job.created_at} UTC"
+                           + (f", finished {job.finished_at} UTC" if job.finished_at else ""))
+                if not job.finished:
+                    st.progress(job.progress, text=job.message or "Waiting for a worker...")
+                    if st.button("Cancel", key=f"{key}_cancel_{job.id}"):
+                        jobs.cancel(conn, job.id)
+                        st.rerun(scope="fragment")
+                elif job.status == "failed":
+                    st.error(f"❌ {job.error}")
+                elif job.status == "done":
+                    show_result(job)
+
+    panel()
+
+
+def job_download(job, file_name, key):
+    """Download button for the file a finished job wrote."""
+    try:
+        with open(job.result["file"], "rb") as f:
+            st.download_button(f"⬇️ Download {file_name}", f, file_name=file_name, key=f"{key}_download_{job.id}")
+    except FileNotFoundError:
+        st.warning("⚠️ The file for this job has been cleaned up; run it again.")
+
+
+def telemetry_admin():
+    """Page render times, the costliest statements and the slow query log
+    from :mod:`school.telemetry`, with JSON and Prometheus downloads."""
+    st.title("🛠️ Performance")
+    if not telemetry.ENABLED:
+        st.warning("Telemetry is off (SCHOOL_TELEMETRY=0).")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    threshold = col1.number_input("Slow query threshold (ms)", 1.0, 60000.0, telemetry.slow_query_ms, step=10.0)
+    if threshold != telemetry.slow_query_ms:
+        telemetry.set_slow_query_ms(threshold)
+    col2.download_button("⬇️ JSON", telemetry.to_json(), "telemetry.json", "application/json")
+    col3.download_button("⬇️ Prometheus", telemetry.to_prometheus(), "metrics.prom", "text/plain")
+    if col4.button("Reset counters"):
+        telemetry.reset()
+        st.rerun()
+
+    data = telemetry.snapshot(top=100)
+    tab1, tab2, tab3 = st.tabs(["📄 Pages", "🗄️ Queries", f"🐢 Slow queries ({len(data['slow_queries'])})"])
+    with tab1:
+        pages = pd.DataFrame(data["pages"])
+        if pages.empty:
+            st.info("No pages rendered yet.")
+        else:
+            st.bar_chart(pages.set_index("page")["query_ms_per_render"], y_label="SQL ms per render")
+            st.dataframe(pages, use_container_width=True, hide_index=True)
+    with tab2:
+        queries = pd.DataFrame(data["queries"])
+        if queries.empty:
+            st.info("No queries yet.")
+        else:
+            st.dataframe(queries.drop(columns="sites"), use_container_width=True, hide_index=True)
+    with tab3:
+        slow = pd.DataFrame(data["slow_queries"])
+        if slow.empty:
+            st.success(f"No statements over {telemetry.slow_query_ms:g} ms.")
+        else:
+            st.dataframe(slow, use_container_width=True, hide_index=True)
@@ -0,0 +1,150 @@
+"""One writer thread per database, committing queued writes in groups.
+
+Every Streamlit session runs on its own thread. Functions decorated with
+:func:`queued` do not write on the shared connection. The call is queued
+for the database's writer thread, which has a connection of its own. The
+writer takes every request waiting in the queue and runs them in one
+``BEGIN IMMEDIATE`` transaction, each in its own savepoint, then commits
+once. A request that raises is rolled back to its savepoint and its caller
+gets the exception (for example ``sqlite3.IntegrityError`` for a duplicate
+roll no); the rest of the group still commits. Callers block until the
+commit that holds their write, so a read straight afterwards sees it.
+
+With one writer per process, sessions never compete for SQLite's write
+lock, and one commit (one WAL sync) is shared by every write in the group.
+Reads stay on the shared connection and, under WAL, never wait for the
+writer. Set ``SCHOOL_WRITER=0`` to write on the calling thread instead.
+"""
+import functools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from school import db
+
+ENABLED = os.environ.get("SCHOOL_WRITER", "1") != "0"
+MAX_BATCH = 64  # requests per group commit
+
+_lock = threading.Lock()
+_writers = {}
+
+
+class _Request:
+    __slots__ = ("fn", "args", "kwargs", "future")
+
+    def __init__(self, fn, args, kwargs):
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+        self.future = Future()
+
+
+class Writer:
+    """The writer thread of one database file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = db.open_writer(path)
+        self.batches = self.requests = 0
+        self.busy_seconds = 0.0
+        self._queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._loop, name=f"school-writer:{path}", daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn(conn, *args, **kwargs)``; returns a ``Future``."""
+        request = _Request(fn, args, kwargs)
+        self._queue.put(request)
+        return request.future
+
+    def call(self, fn, *args, **kwargs):
+        """Run ``fn`` on the writer and return its result once committed,
+        or raise its exception."""
+        if threading.current_thread() is self.thread:
+            return fn(self.conn, *args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    def stats(self):
+        return {"batches": self.batches, "requests": self.requests,
+                "mean_batch": round(self.requests / self.batches, 2) if self.batches else 0.0,
+                "busy_seconds": round(self.busy_seconds, 3), "queued": self._queue.qsize()}
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            # Whatever queued up during the previous commit joins this one
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            started = time.perf_counter()
+            self._commit([request for request in batch if request.future.set_running_or_notify_cancel()])
+            self.busy_seconds += time.perf_counter() - started
+
+    def _commit(self, batch):
+        if not batch:
+            return
+        conn = self.conn
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for request in batch:
+                conn.execute("SAVEPOINT request")
+                try:
+                    value = request.fn(conn, *request.args, **request.kwargs)
+                except BaseException as exc:
+                    if not conn.in_transaction:
+                        raise  # SQLite abandoned the whole transaction
+                    conn.execute("ROLLBACK TO request")
+                    conn.execute("RELEASE request")
+                    outcomes.append((request.future, None, exc))
+                else:
+                    conn.execute("RELEASE request")
+                    outcomes.append((request.future, value, None))
+            conn.commit()
+        except BaseException as exc:
+            # Nothing in the group was committed; everyone gets the error.
+            # sqlite3.Error from BEGIN/COMMIT (e.g. another process held the
+            # write lock past busy_timeout) lands here too.
+            if conn.in_transaction:
+                conn.rollback()
+            outcomes = [(request.future, None, exc) for request in batch]
+        for future, value, exc in outcomes:
+            if exc is None:
+                future.set_result(value)
+            else:
+                future.set_exception(exc)
+        self.batches += 1
+        self.requests += len(batch)
+
+
+def writer_for(path=None):
+    """The writer of the database at ``path`` (default ``db.DB_PATH``),
+    started on first use."""
+    path = path or db.DB_PATH
+    with _lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = Writer(path)
+    return writer
+
+
+def queued(fn):
+    """Decorate a ``fn(conn, ...)`` that writes: called with a shared
+    connection it runs on that database's writer instead and returns once
+    its write is committed. Its ``db.transaction`` blocks become savepoints.
+    """
+    @functools.wraps(fn)
+    def wrapper(conn, *args, **kwargs):
+        path = db.path_of(conn)
+        if not ENABLED or path is None:  # already the writer's connection, or a private one
+            return fn(conn, *args, **kwargs)
+        return writer_for(path).call(fn, *args, **kwargs)
+    return wrapper
+
+
+def stats():
+    """Group commit counters per database."""
+    with _lock:
+        return {path: writer.stats() for path, writer in _writers.items()}